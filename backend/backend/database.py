@@ -0,0 +1,68 @@
+import os
+from pathlib import Path
+
+
+def database_config(prefix: str = "DB_", default_name: str = "db.sqlite3") -> dict:
+    """
+    Builds a ``DATABASES`` entry from ``<prefix>*`` environment variables.
+
+    ``<prefix>ENGINE`` selects ``sqlite`` (the default) or ``postgresql``.
+
+    PostgreSQL connections either use Django's native connection pool
+    (``<prefix>POOL=True``, needs ``psycopg[pool]``) or stay open for
+    ``<prefix>CONN_MAX_AGE`` seconds; Django refuses to combine the two.
+    Persistent connections are health-checked before reuse.
+
+    SQLite connections switch to WAL, so readers no longer block on the
+    writer, with ``synchronous=NORMAL`` (durable at every checkpoint
+    instead of every commit) and wait up to ``<prefix>SQLITE_BUSY_TIMEOUT``
+    milliseconds for the write lock instead of failing with "database is
+    locked". Transactions start as IMMEDIATE so that a read turning into
+    a write cannot deadlock with another writer.
+    """
+    def env(name: str, default: str = "") -> str:
+        return os.getenv(f"{prefix}{name}", default)
+
+    base_dir = Path(__file__).resolve().parent.parent
+    engine = env("ENGINE", "sqlite")
+
+    if engine == "postgresql":
+        config = {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": env("NAME", "users"),
+            "USER": env("USER", "postgres"),
+            "PASSWORD": env("PASSWORD"),
+            "HOST": env("HOST", "localhost"),
+            "PORT": env("PORT", "5432"),
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {},
+        }
+        if env("POOL", "False") == "True":
+            config["CONN_MAX_AGE"] = 0
+            config["OPTIONS"]["pool"] = {
+                "min_size": int(env("POOL_MIN_SIZE", "2")),
+                "max_size": int(env("POOL_MAX_SIZE", "10")),
+                "timeout": float(env("POOL_TIMEOUT", "10")),
+            }
+        else:
+            config["CONN_MAX_AGE"] = int(env("CONN_MAX_AGE", "60"))
+        return config
+
+    if engine != "sqlite":
+        raise ValueError(f"Unsupported {prefix}ENGINE '{engine}'")
+
+    pragmas = [
+        f"PRAGMA journal_mode={env('SQLITE_JOURNAL_MODE', 'WAL')}",
+        "PRAGMA synchronous=NORMAL",
+        f"PRAGMA busy_timeout={int(env('SQLITE_BUSY_TIMEOUT', '5000'))}",
+    ]
+    return {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": env("NAME") or base_dir / default_name,
+        "CONN_MAX_AGE": int(env("CONN_MAX_AGE", "60")),
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": {
+            "init_command": ";".join(pragmas),
+            "transaction_mode": "IMMEDIATE",
+        },
+    }
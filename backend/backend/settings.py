@@ -5,6 +5,8 @@ from pathlib import Path
 from datetime import timedelta
 from dotenv import load_dotenv
 
+from backend.database import database_config
+
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 ENV_FILE = BASE_DIR / ".env.dev"
@@ -33,6 +35,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "users.metrics.ServerTimingMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -67,12 +70,58 @@ WSGI_APPLICATION = "backend.wsgi.application"
 
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
+# Configured from DB_* environment variables (see backend/database.py):
+# SQLite with WAL by default, DB_ENGINE=postgresql for production.
 
 DATABASES = {
+    "default": database_config(),
+}
+
+# Optional read replica, configured from DB_REPLICA_* variables. The
+# read-only lookups of the auth path are routed to it (see
+# users/routers.py); a user's reads stay on the primary for PIN_SECONDS
+# after they write, which should exceed the replication lag. The pin is
+# stored in PIN_CACHE_ALIAS, which must reach every worker process, so
+# that a write handled by one worker pins the reads of all of them.
+# Each authenticated read looks the pin up, so prefer Redis or
+# Memcached over the database-backed "shared" cache there.
+if os.getenv("DB_REPLICA_ENGINE"):
+    DATABASES["replica"] = database_config(
+        "DB_REPLICA_",
+        default_name="db.replica.sqlite3"
+    )
+
+# Caches. "default" lives inside each worker process. Features that
+# coordinate workers (the refresh grace window, permission cache
+# versions, read pins) need an alias every process reaches: "shared" is
+# backed by the database (create it with `manage.py createcachetable`)
+# unless SHARED_CACHE_BACKEND/SHARED_CACHE_LOCATION point it at Redis
+# or Memcached. WORKER_PROCESSES follows WEB_CONCURRENCY, which gunicorn
+# reads too; above 1, `manage.py check` rejects per-process caches for
+# those features (see users/checks.py).
+WORKER_PROCESSES = int(os.getenv("WEB_CONCURRENCY", "1"))
+CACHES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
-    }
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "shared": {
+        "BACKEND": os.getenv(
+            "SHARED_CACHE_BACKEND",
+            "django.core.cache.backends.db.DatabaseCache"
+        ),
+        "LOCATION": os.getenv("SHARED_CACHE_LOCATION", "shared_cache"),
+    },
+}
+COORDINATION_CACHE_ALIAS = "shared" if WORKER_PROCESSES > 1 else "default"
+
+DATABASE_ROUTERS = ["users.routers.ReplicaRouter"]
+DATABASE_ROUTING = {
+    "REPLICAS": [alias for alias in DATABASES if alias != "default"],
+    "PIN_SECONDS": 5,
+    "PIN_CACHE_ALIAS": os.getenv(
+        "DB_PIN_CACHE_ALIAS",
+        COORDINATION_CACHE_ALIAS
+    ),
 }
 
 
@@ -116,6 +165,30 @@ USE_TZ = True
 
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
+# Uploaded avatars are cropped to square WebP/JPEG thumbnails of each
+# size on a background pool (see users/avatars.py). DEFAULT_SIZE is the
+# one returned as "avatar"; WORKERS = 0 processes uploads inline.
+AVATARS = {
+    "SIZES": (64, 128, 256),
+    "FORMATS": ("webp", "jpeg"),
+    "DEFAULT_SIZE": 256,
+    "QUALITY": 82,
+    "MAX_UPLOAD_SIZE": 10 * 1024 * 1024,
+    "MAX_PIXELS": 40_000_000,
+    "WORKERS": int(os.getenv("AVATAR_WORKERS", "2")),
+}
+
+# Avatars are served by users.views.AvatarView. With BACKEND "nginx"
+# (X-Accel-Redirect) the proxy needs an internal location, e.g.
+#   location /protected-media/ { internal; alias /app/backend/media/; }
+# "apache" uses X-Sendfile (mod_xsendfile); "django" sends the file itself.
+MEDIA_SERVING = {
+    "BACKEND": os.getenv("MEDIA_SERVING_BACKEND", "django"),
+    "ACCEL_PREFIX": "/protected-media/",
+    "REQUIRE_AUTH": os.getenv("MEDIA_REQUIRE_AUTH", "False") == "True",
+    "MAX_AGE": 60 * 60 * 24 * 365,
+}
+
 STATIC_URL = "/static/"
 STATIC_ROOT = BASE_DIR / "collected_static"
 
@@ -123,22 +196,76 @@ STATIC_ROOT = BASE_DIR / "collected_static"
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 
+# EmailBackend extends ModelBackend, so a second backend would only
+# repeat the lookup and the password hash for every failed login.
 AUTHENTICATION_BACKENDS = [
    "users.backends.EmailBackend",
-   "django.contrib.auth.backends.ModelBackend",
 ]
 AUTH_USER_MODEL = "users.CustomUsers"
 
+# Password hashing runs on a bounded worker pool (see users/hashing.py).
+# Requests beyond WORKERS + MAX_QUEUE are rejected with 503.
+PASSWORD_HASHING_POOL = {
+    "ENABLED": os.getenv("PASSWORD_HASHING_POOL_ENABLED", "True") == "True",
+    "WORKERS": int(os.getenv("PASSWORD_HASHING_WORKERS", "2")),
+    "MAX_QUEUE": int(os.getenv("PASSWORD_HASHING_MAX_QUEUE", "32")),
+    "TIMEOUT": 10,
+}
+
+# Per-endpoint and per-phase latency histograms, served on /metrics
+# in the Prometheus text format (see users/metrics.py). SERVER_TIMING
+# also sends the phase timings to clients in a Server-Timing header.
+METRICS = {
+    "ENABLED": os.getenv("METRICS_ENABLED", "True") == "True",
+    "SERVER_TIMING": os.getenv("SERVER_TIMING", str(DEBUG)) == "True",
+    "AUTH_TOKEN": os.getenv("METRICS_AUTH_TOKEN") or None,
+    "BUCKETS": (
+        0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+        0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+    ),
+}
 
+# Token bucket throttles of the login, registration and refresh
+# endpoints (see users/throttling.py). BURST requests are allowed at
+# once, refilled at RATE. Set CACHE_ALIAS to a shared cache (Redis,
+# Memcached) to enforce the limits across processes as well.
+THROTTLING = {
+    "ENABLED": os.getenv("THROTTLING_ENABLED", "True") == "True",
+    "CACHE_ALIAS": os.getenv("THROTTLE_CACHE_ALIAS") or None,
+    "MAX_KEYS": 100_000,
+    "RATES": {
+        "login_ip": {"RATE": "30/min", "BURST": 10},
+        "login_email": {"RATE": "10/min", "BURST": 5},
+        "registration_ip": {"RATE": "10/hour", "BURST": 5},
+        "refresh_ip": {"RATE": "120/min", "BURST": 30},
+    },
+}
 
 REST_FRAMEWORK = {
+    # Use "users.authentication.CookieJWTClaimsAuthentication" to build
+    # request.user from token claims without a database query.
     "DEFAULT_AUTHENTICATION_CLASSES": (
         "users.authentication.CookieJWTAuthentication",
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
-
+    # Number of trusted reverse proxies in front of the app. The
+    # throttles key clients by REMOTE_ADDR unless it is set, in which
+    # case the address that many hops back in X-Forwarded-For is used;
+    # a client-supplied header is never trusted beyond that.
+    "NUM_PROXIES": int(os.getenv("NUM_PROXIES", "0")),
+    # JSON is encoded and decoded with orjson when it is installed and
+    # with the standard library otherwise (see users/renderers.py).
+    "DEFAULT_RENDERER_CLASSES": (
+        "users.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "users.parsers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ),
 }
 
 SIMPLE_JWT = {
@@ -146,11 +273,111 @@ SIMPLE_JWT = {
     "REFRESH_TOKEN_LIFETIME": timedelta(days=14),
     "ROTATE_REFRESH_TOKENS": True,
     "BLACKLIST_AFTER_ROTATION": True,
-    "ALGORITHM": "HS256",
+    # HS256 signs with SECRET_KEY. RS256/EdDSA sign with the keys
+    # in JWT_KEYS and publish them on /.well-known/jwks.json.
+    "ALGORITHM": os.getenv("JWT_ALGORITHM", "HS256"),
     "AUTH_HEADER_TYPES": ("Bearer",),
     "USER_ID_FIELD": "id",
     "USER_ID_CLAIM": "user_id",
-    "AUTH_TOKEN_CLASSES": ("rest_framework_simplejwt.tokens.AccessToken",),
+    "AUTH_TOKEN_CLASSES": ("users.tokens.UserAccessToken",),
+}
+
+# Private keys for asymmetric token signing, one "<kid>.pem" per key
+# (see users/keys.py and the generate_jwt_key management command).
+JWT_KEYS = {
+    "KEYS_DIR": Path(os.getenv("JWT_KEYS_DIR", BASE_DIR / "keys")),
+    "ACTIVE_KID": os.getenv("JWT_ACTIVE_KID") or None,
+}
+
+# Server-side registry of refresh tokens (see users/token_store.py),
+# used for rotation, reuse detection and logout. Expired records are
+# removed by the sweep_refresh_tokens management command.
+# Refreshes of the same token within GRACE_WINDOW seconds get the same
+# rotated pair. GRACE_CACHE_ALIAS must be shared by every worker
+# process, otherwise the losing workers see the refresh as token reuse
+# and revoke the family; it defaults to "shared" with several workers.
+REFRESH_TOKEN_STORE = {
+    "NEGATIVE_CACHE_SIZE": 100_000,
+    "GRACE_WINDOW": 10,
+    "GRACE_CACHE_ALIAS": os.getenv(
+        "REFRESH_GRACE_CACHE_ALIAS",
+        COORDINATION_CACHE_ALIAS
+    ),
+    # Users whose access tokens are rejected until they expire (deleted
+    # accounts). Every worker reads them from REVOCATION_CACHE_ALIAS at
+    # most once per REVOCATION_SYNC_INTERVAL seconds and checks tokens
+    # in memory.
+    "REVOCATION_CACHE_ALIAS": os.getenv(
+        "REVOCATION_CACHE_ALIAS",
+        COORDINATION_CACHE_ALIAS
+    ),
+    "REVOCATION_SYNC_INTERVAL": 1.0,
+}
+
+# Deleted accounts are deactivated in the request and purged on a
+# background pool after commit (see users/deletion.py): related rows are
+# deleted BATCH_SIZE at a time, sleeping PAUSE seconds between chunks.
+# WORKERS = 0 purges inline after commit. Interrupted purges are
+# finished by the purge_deleted_accounts management command.
+ACCOUNT_DELETION = {
+    "BATCH_SIZE": 1000,
+    "PAUSE": 0.0,
+    "WORKERS": int(os.getenv("ACCOUNT_DELETION_WORKERS", "1")),
+}
+
+# Cache of users resolved by CookieJWTAuthentication (see users/cache.py).
+# Set SHARED_CACHE_ALIAS to a key of CACHES to share entries between
+# processes. Saves publish the user's updated_at in VERSION_CACHE_ALIAS,
+# so that other workers stop serving the old row; it is only needed (and
+# only costs a lookup per request) with several worker processes.
+USER_CACHE = {
+    "ENABLED": os.getenv("USER_CACHE_ENABLED", "True") == "True",
+    "MAX_SIZE": 10_000,
+    "TTL": 60,
+    "SHARED_CACHE_ALIAS": os.getenv("USER_CACHE_ALIAS") or None,
+    "SHARED_TTL": 60 * 15,
+    "VERSION_CACHE_ALIAS": os.getenv("USER_CACHE_VERSION_ALIAS") or (
+        COORDINATION_CACHE_ALIAS if WORKER_PROCESSES > 1 else None
+    ),
+}
+
+# Cache of access tokens already verified by CookieJWTAuthentication.
+# Entries expire at the token's "exp" claim.
+TOKEN_CACHE = {
+    "ENABLED": os.getenv("TOKEN_CACHE_ENABLED", "True") == "True",
+    "MAX_SIZE": 10_000,
+}
+
+# Serialized responses of the current user endpoint, keyed by the
+# user's ETag (see users/cache.py). Entries are never invalidated,
+# a profile update changes the key instead.
+REPRESENTATION_CACHE = {
+    "ENABLED": os.getenv("REPRESENTATION_CACHE_ENABLED", "True") == "True",
+    "CACHE_ALIAS": os.getenv("REPRESENTATION_CACHE_ALIAS", "default"),
+    "TTL": 60 * 15,
+}
+
+# Permission sets of users for has_perm checks in the admin and DRF
+# permission classes (see users/cache.py). Disabled unless
+# PERMISSION_CACHE_ENABLED=True: a revoked permission is only seen by
+# every worker if the entries and their version live in a cache shared
+# by all processes, which `manage.py check` enforces above one worker.
+PERMISSION_CACHE = {
+    "ENABLED": os.getenv("PERMISSION_CACHE_ENABLED", "False") == "True",
+    "CACHE_ALIAS": os.getenv(
+        "PERMISSION_CACHE_ALIAS",
+        COORDINATION_CACHE_ALIAS
+    ),
+    "TTL": 60 * 5,
+}
+
+# Admin changelist of the users table. LARGE_TABLE_MODE switches to
+# estimated counts, indexed prefix search and keyset pagination for
+# tables with millions of rows (see users/changelist.py). Filtered
+# results are counted exactly up to EXACT_COUNT_LIMIT rows.
+USERS_ADMIN = {
+    "LARGE_TABLE_MODE": os.getenv("USERS_ADMIN_LARGE_TABLE_MODE") == "True",
+    "EXACT_COUNT_LIMIT": 10_000,
 }
 
 CORS_ALLOW_CREDENTIALS = True
@@ -4,11 +4,21 @@ from django.views.i18n import set_language
 from django.conf import settings
 from django.conf.urls.static import static
 
+from users.avatars import AVATAR_DIR
+from users.views import AvatarView, JWKSView, MetricsView
+
 
 urlpatterns = [
      path('admin/', admin.site.urls),
      path('api/auth/', include('users.urls')),
-     path("set_language/", set_language, name="set_language")
+     path("set_language/", set_language, name="set_language"),
+     path(".well-known/jwks.json", JWKSView.as_view(), name="jwks"),
+     path("metrics", MetricsView.as_view(), name="metrics"),
+     path(
+         f"{settings.MEDIA_URL.strip('/')}/{AVATAR_DIR}/<path:name>",
+         AvatarView.as_view(),
+         name="avatar"
+     ),
 ]
 
 if settings.DEBUG:
@@ -1,13 +1,68 @@
+from django.conf import settings
 from django.contrib import admin
+
+from users.changelist import EstimatedCountPaginator, KeysetChangeList
 from users.models import CustomUsers
 
 
+def large_table_mode() -> bool:
+    return getattr(settings, "USERS_ADMIN", {}).get("LARGE_TABLE_MODE", False)
+
+
 @admin.register(CustomUsers)
 class CustomUsersAdmin(admin.ModelAdmin):
     """
     A class for configuring the display
     of the user's model in the admin panel.
+
+    With ``USERS_ADMIN["LARGE_TABLE_MODE"]`` the changelist stays fast on
+    tables with millions of users: counts are estimated, the search
+    matches email and username prefixes through their indexes, pages
+    are fetched by primary key and only the displayed columns are
+    loaded (see ``users.changelist``).
     """
     list_display = ["id", "email", "first_name", "last_name"]
     search_fields = ["email", "first_name", "last_name"]
 
+    @property
+    def show_full_result_count(self) -> bool:
+        return not large_table_mode()
+
+    @property
+    def search_help_text(self):
+        if large_table_mode():
+            return "Start of an email or username, or a full email address."
+        return None
+
+    def get_changelist(self, request, **kwargs):
+        if large_table_mode():
+            return KeysetChangeList
+        return super().get_changelist(request, **kwargs)
+
+    def get_paginator(self, request, queryset, per_page, orphans=0,
+                      allow_empty_first_page=True):
+        if not large_table_mode():
+            return super().get_paginator(
+                request, queryset, per_page, orphans, allow_empty_first_page
+            )
+        return EstimatedCountPaginator(
+            queryset,
+            per_page,
+            orphans,
+            allow_empty_first_page,
+            exact_limit=settings.USERS_ADMIN.get("EXACT_COUNT_LIMIT", 10_000),
+        )
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Looks up a complete email address through the case-insensitive
+        email index instead of a substring scan over every column.
+        In large table mode other terms match email and username
+        prefixes, also through their indexes.
+        """
+        term = search_term.strip()
+        if "@" in term and not any(c.isspace() for c in term):
+            return queryset.filter_by_email(term), False
+        if large_table_mode() and term:
+            return queryset.filter_by_prefix(term), False
+        return super().get_search_results(request, queryset, search_term)
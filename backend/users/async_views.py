@@ -0,0 +1,337 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.http import JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.exceptions import (
+    APIException,
+    AuthenticationFailed,
+    NotAuthenticated,
+    Throttled,
+    ValidationError
+)
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from users.authentication import AsyncCookieJWTAuthentication
+from users.backends import EmailBackend
+from users.cache import get_representation_cache
+from users.metrics import timed
+from users.serializers import UserSerializer
+from users.throttling import (
+    LoginEmailThrottle,
+    LoginIPThrottle,
+    RefreshIPThrottle
+)
+from users.tokens import UserRefreshToken, decode_refresh_cookie
+from users.token_store import (
+    get_refresh_grace_window,
+    get_refresh_token_store
+)
+from users.views import get_not_modified_response, set_user_validators
+
+
+User = get_user_model()
+
+
+def set_auth_cookies(response, access_token: str, refresh_token: str) -> None:
+    """Sets the HttpOnly access and refresh token cookies."""
+    response.set_cookie(
+        key='access_token',
+        value=access_token,
+        httponly=settings.COOKIE_SETTINGS['httponly'],
+        secure=settings.COOKIE_SETTINGS['secure'],
+        samesite=settings.COOKIE_SETTINGS['samesite'],
+        max_age=settings.COOKIE_SETTINGS['access_max_age'],
+    )
+    response.set_cookie(
+        key='refresh_token',
+        value=refresh_token,
+        httponly=settings.COOKIE_SETTINGS['httponly'],
+        secure=settings.COOKIE_SETTINGS['secure'],
+        samesite=settings.COOKIE_SETTINGS['samesite'],
+        max_age=settings.COOKIE_SETTINGS['refresh_max_age'],
+    )
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncAPIView(View):
+    """
+    Base class for the async auth endpoints.
+
+    DRF's APIView is sync-only, so under ASGI every request to it pays a
+    sync-to-async thread hop. These views are plain async Django views
+    that reproduce the small part of DRF the auth endpoints rely on:
+    cookie authentication, token bucket throttling, JSON/form parsing
+    and rendering of ``APIException`` errors.
+    """
+    authentication_required = True
+    throttle_classes: list = []
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            await self.check_throttles(request)
+            if self.authentication_required:
+                result = await AsyncCookieJWTAuthentication().authenticate(
+                    request
+                )
+                if result is None:
+                    raise NotAuthenticated()
+                request.user, request.auth = result
+            return await super().dispatch(request, *args, **kwargs)
+        except APIException as e:
+            response = JsonResponse(
+                e.detail if isinstance(e.detail, (dict, list))
+                else {"detail": e.detail},
+                status=e.status_code,
+                safe=False
+            )
+            if getattr(e, "wait", None):
+                response["Retry-After"] = str(int(e.wait))
+            return response
+
+    async def check_throttles(self, request) -> None:
+        """
+        Raises:
+            Throttled: If any of the view's throttles denies the request.
+        """
+        waits = []
+        for throttle_class in self.throttle_classes:
+            throttle = throttle_class()
+            if not await throttle.aallow_request(request, self):
+                waits.append(throttle.wait())
+        if waits:
+            raise Throttled(wait=max(waits))
+
+    @staticmethod
+    def get_data(request) -> dict:
+        """
+        Parses a JSON or form encoded request body.
+
+        Raises:
+            ValidationError: If the body is not a JSON object.
+        """
+        if request.content_type == "application/json":
+            try:
+                data = json.loads(request.body or b"{}")
+            except ValueError:
+                raise ValidationError({"detail": "Malformed JSON body"})
+            if not isinstance(data, dict):
+                raise ValidationError({"detail": "JSON body must be an object"})
+            return data
+        return request.POST
+
+
+class AsyncLoginView(AsyncAPIView):
+    """
+    Async counterpart of LoginView.
+
+    Authenticates the user with the async ORM, checks the password
+    on the hashing pool and sets HttpOnly cookies for the token pair.
+    """
+    authentication_required = False
+    throttle_classes = [LoginIPThrottle, LoginEmailThrottle]
+
+    async def post(self, request, *args, **kwargs) -> JsonResponse:
+        """
+        Handles user login.
+
+        Args:
+          request: The HTTP request object containing user credentials.
+
+        Returns:
+          JsonResponse: A JSON response with a success message and status 200,
+                        along with HttpOnly cookies for access and refresh tokens.
+        """
+        data = self.get_data(request)
+        email = data.get("email")
+        password = data.get("password")
+
+        if not email or not password:
+            raise AuthenticationFailed("Email and password is required")
+
+        user = await EmailBackend().aauthenticate(
+            request,
+            email=email,
+            password=password
+        )
+        if not user:
+            raise AuthenticationFailed("Invalid credentials")
+
+        with timed("token_mint"):
+            refresh = await UserRefreshToken.afor_user(user)
+            access_token, refresh_token = str(refresh.access_token), str(refresh)
+
+        response = JsonResponse(
+            {"success": True, "message": "Login successful"},
+            status=status.HTTP_200_OK
+        )
+        set_auth_cookies(response, access_token, refresh_token)
+        return response
+
+
+class AsyncRefreshTokenView(AsyncAPIView):
+    """
+    Async counterpart of RefreshTokenView.
+
+    Validates the refresh token from cookies and rotates the token pair.
+    """
+    authentication_required = False
+    throttle_classes = [RefreshIPThrottle]
+
+    async def post(self, request, *args, **kwargs) -> JsonResponse:
+        """
+        Refreshes tokens.
+
+        Args:
+            request: The HTTP request object.
+
+        Returns:
+            JsonResponse: A JSON response with a success message and status
+                          200, along with updated HttpOnly cookies
+                          for access and refresh tokens.
+        """
+        token_from_cookie = request.COOKIES.get('refresh_token')
+
+        if not token_from_cookie:
+            return JsonResponse(
+                {"error": "No refresh token provided"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            with timed("token_decode"):
+                refresh = UserRefreshToken(token_from_cookie)  # pyright: ignore
+            tokens = await get_refresh_grace_window().arun(
+                refresh,
+                lambda: self.rotate(refresh)
+            )
+        except TokenError as e:
+            raise InvalidToken(e.args[0])
+
+        response = JsonResponse(
+            {"success": True, "message": "Token successfully refreshed"},
+            status=status.HTTP_200_OK
+        )
+        set_auth_cookies(response, tokens["access"], tokens["refresh"])
+        return response
+
+    @staticmethod
+    async def rotate(refresh) -> dict:
+        store = get_refresh_token_store()
+        await store.arotate(refresh)
+        try:
+            with timed("user_fetch"):
+                user = await User.objects.aget(id=refresh.get("user_id"))
+        except User.DoesNotExist:
+            raise AuthenticationFailed("User not found")
+        if not user.is_active:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+
+        with timed("token_mint"):
+            new_refresh = await UserRefreshToken.afor_user(
+                user,
+                family=refresh.get(store.family_claim)
+            )
+            return {
+                "access": str(new_refresh.access_token),
+                "refresh": str(new_refresh),
+            }
+
+
+class AsyncLogoutView(AsyncAPIView):
+    """
+    Async counterpart of LogoutView.
+
+    Revokes the refresh token family and deletes
+    the 'access_token' and 'refresh_token' cookies.
+    Like LogoutView, it does not require a valid access token.
+    """
+    authentication_required = False
+
+    async def post(self, request, *args, **kwargs) -> JsonResponse:
+        """
+        Logs out the user.
+
+        Args:
+            request: The HTTP request object.
+
+        Returns:
+            JsonResponse: A JSON response with a success message and status 200.
+        """
+        refresh = decode_refresh_cookie(request)
+        if refresh is not None:
+            await get_refresh_token_store().arevoke_family(refresh)
+
+        response = JsonResponse(
+            {"success": True, "message": "You have successfully logged out"},
+            status=status.HTTP_200_OK
+        )
+        response.delete_cookie('access_token')
+        response.delete_cookie('refresh_token')
+        return response
+
+
+class AsyncCurrentUserView(AsyncAPIView):
+    """
+    Async counterpart of CurrentUserView.
+
+    Reads are served entirely on the event loop; updates run the
+    sync serializer and file storage in a worker thread.
+    """
+    async def get(self, request, *args, **kwargs) -> JsonResponse:
+        """
+        Retrieves the authenticated user's data.
+
+        Args:
+            request: The HTTP request object.
+
+        Returns:
+            JsonResponse: A JSON response containing
+                          the user's data with status 200, or an empty
+                          response with status 304 if the client's copy
+                          is still current.
+        """
+        user = request.user
+        not_modified = get_not_modified_response(request, user)
+        if not_modified is not None:
+            return not_modified
+
+        def serialize() -> dict:
+            return UserSerializer(user, context={"request": request}).data
+
+        cache = get_representation_cache()
+        data = (
+            await cache.aget_or_set(user, request, serialize)
+            if cache is not None else serialize()
+        )
+        response = JsonResponse(data, status=status.HTTP_200_OK)
+        set_user_validators(response, user)
+        return response
+
+    async def put(self, request, *args, **kwargs) -> JsonResponse:
+        """
+        Update the authenticated user's data.
+        """
+        data = await sync_to_async(self._update)(request)
+        response = JsonResponse(data, status=status.HTTP_200_OK)
+        set_user_validators(response, request.user)
+        return response
+
+    @staticmethod
+    def _update(request) -> dict:
+        if request.content_type == "multipart/form-data":
+            # Django only parses multipart bodies of POST requests.
+            post, files = request.parse_file_upload(request.META, request)
+            data = post.copy()
+            data.update(files)
+        else:
+            data = AsyncAPIView.get_data(request)
+        serializer = UserSerializer(request.user, data=data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return serializer.data
@@ -1,7 +1,15 @@
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
 from rest_framework.exceptions import AuthenticationFailed
 
+from users.cache import get_token_cache, get_user_cache
+from users.metrics import timed
+from users.models import ClaimsUser
+from users.routers import aread_from_replica, read_from_replica
+from users.token_store import get_refresh_token_store
+from users.tokens import USER_CLAIMS
+
 
 class CookieJWTAuthentication(JWTAuthentication):
     """
@@ -34,8 +42,205 @@ class CookieJWTAuthentication(JWTAuthentication):
             return None
 
         try:
-            validated_token = self.get_validated_token(access_token)
+            with timed("token_decode"):
+                validated_token = self.get_validated_token(access_token)
+        except InvalidToken as e:
+            raise AuthenticationFailed(f"Invalid token: {e}")
+
+        with timed("user_fetch"):
+            return self.get_user(validated_token), validated_token
+
+    def get_validated_token(self, raw_token):
+        """
+        Validates the raw access token, reusing earlier validations.
+
+        Tokens that were already verified by this process are served from
+        the token cache until their ``exp`` claim, skipping the signature
+        check and payload decoding. Tokens of users revoked by the refresh
+        token store (e.g. deleted accounts) are rejected; that check is
+        made in memory.
+
+        Args:
+            raw_token: The encoded access token from the cookie.
+
+        Returns:
+            Token: The validated access token.
+
+        Raises:
+            InvalidToken: If the token is invalid or its user is revoked.
+        """
+        get_refresh_token_store().load_revoked_users()
+        return self._validate(raw_token)
+
+    def _validate(self, raw_token):
+        cache = get_token_cache()
+        if cache is None:
+            validated_token = super().get_validated_token(raw_token)
+        else:
+            validated_token = cache.get(raw_token)
+            if validated_token is None:
+                validated_token = super().get_validated_token(raw_token)
+                cache.set(raw_token, validated_token)
+
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if get_refresh_token_store().is_user_revoked(user_id):
+            raise InvalidToken("Token is revoked")
+        return validated_token
+
+    def get_user(self, validated_token):
+        """
+        Resolves the token's user through the user cache.
+
+        On a cache miss the user is loaded from a read replica by the
+        parent class (which also rejects unknown and inactive users) and
+        stored in the cache for subsequent requests.
+
+        Args:
+            validated_token: The validated access token.
+
+        Returns:
+            CustomUsers: The user the token was issued for.
+        """
+        cache = get_user_cache()
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+
+        if cache is None or user_id is None:
+            with read_from_replica(user_id):
+                return super().get_user(validated_token)
+
+        user = cache.get(user_id)
+        if user is not None and user.is_active:
+            return user
+
+        with read_from_replica(user_id):
+            user = super().get_user(validated_token)
+        cache.set(user_id, user)
+        return user
+
+
+class CookieJWTClaimsAuthentication(CookieJWTAuthentication):
+    """
+    Stateless variant of CookieJWTAuthentication.
+
+    Builds a ``ClaimsUser`` from the claims embedded by ``UserRefreshToken``
+    instead of loading the user from the database. The real row is only
+    fetched if a view reads an attribute that is not part of the token.
+    Tokens issued before the claims were embedded fall back to the
+    regular (cached) database lookup.
+
+    Note that a deactivated user keeps access until the access token
+    expires, since the ``is_active`` flag comes from the token.
+    """
+    def get_user(self, validated_token):
+        """
+        Builds the request user from the access token claims.
+
+        Args:
+            validated_token: The validated access token.
+
+        Returns:
+            ClaimsUser: A user backed by the token claims.
+
+        Raises:
+            AuthenticationFailed: If the token belongs to an inactive user.
+        """
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            raise InvalidToken("Token contained no recognizable user identification")
+
+        if any(claim not in validated_token for claim in USER_CLAIMS):
+            return super().get_user(validated_token)
+
+        if not validated_token["is_active"]:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+
+        return ClaimsUser(
+            id=user_id,
+            **{claim: validated_token[claim] for claim in USER_CLAIMS}
+        )
+
+
+class AsyncCookieJWTAuthentication(CookieJWTAuthentication):
+    """
+    Async counterpart of CookieJWTAuthentication for the async views.
+
+    Token validation is cheap (and usually served from the token cache),
+    so it runs inline; the user lookup goes through the async user cache
+    and the async ORM.
+    """
+    async def authenticate(self, request):
+        """
+        Authenticates the user using the JWT access token from cookies.
+
+        Args:
+            request: The HTTP request object containing cookies.
+
+        Returns:
+            Tuple: A tuple containing the authenticated user
+                   and the validated token, or None if the token is missing.
+
+        Raises:
+            AuthenticationFailed: If the token is invalid
+                                  or cannot be validated.
+        """
+        access_token = request.COOKIES.get('access_token')
+
+        if not access_token:
+            return None
+
+        try:
+            with timed("token_decode"):
+                validated_token = await self.aget_validated_token(access_token)
         except InvalidToken as e:
             raise AuthenticationFailed(f"Invalid token: {e}")
 
-        return self.get_user(validated_token), validated_token
+        with timed("user_fetch"):
+            return await self.get_user(validated_token), validated_token
+
+    async def aget_validated_token(self, raw_token):
+        """
+        Async counterpart of CookieJWTAuthentication.get_validated_token.
+
+        Args:
+            raw_token: The encoded access token from the cookie.
+
+        Returns:
+            Token: The validated access token.
+        """
+        await get_refresh_token_store().aload_revoked_users()
+        return self._validate(raw_token)
+
+    async def get_user(self, validated_token):
+        """
+        Async counterpart of CookieJWTAuthentication.get_user.
+
+        Args:
+            validated_token: The validated access token.
+
+        Returns:
+            CustomUsers: The user the token was issued for.
+        """
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            raise InvalidToken("Token contained no recognizable user identification")
+
+        cache = get_user_cache()
+        if cache is not None:
+            user = await cache.aget(user_id)
+            if user is not None and user.is_active:
+                return user
+
+        try:
+            async with aread_from_replica(user_id):
+                user = await self.user_model.objects.aget(
+                    **{api_settings.USER_ID_FIELD: user_id}
+                )
+        except self.user_model.DoesNotExist:
+            raise AuthenticationFailed("User not found", code="user_not_found")
+
+        if not user.is_active:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+
+        if cache is not None:
+            await cache.aset(user_id, user)
+        return user
@@ -0,0 +1,388 @@
+import hashlib
+import logging
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from io import BytesIO
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+
+logger = logging.getLogger(__name__)
+
+AVATAR_DIR = "avatars"
+VARIANT_RE = re.compile(
+    rf"^{AVATAR_DIR}/(?P<key>[0-9a-f]+)/(?P<size>\d+)\.(?P<format>\w+)$"
+)
+SAVE_OPTIONS = {
+    "webp": {"format": "WEBP", "method": 4},
+    "jpeg": {"format": "JPEG", "optimize": True, "progressive": True},
+}
+
+
+def variant_name(name: str, size: int, image_format: str) -> str:
+    """
+    Returns the storage name of one size and format of an avatar.
+
+    Avatars uploaded before the pipeline existed have no variants,
+    so their original name is returned unchanged.
+    """
+    match = VARIANT_RE.match(name)
+    if match is None:
+        return name
+    return f"{AVATAR_DIR}/{match['key']}/{size}.{image_format}"
+
+
+def is_image(upload) -> bool:
+    """
+    Checks that the upload starts with a known image header.
+
+    ``Image.open`` only parses the header, the pixels are not decoded.
+    """
+    try:
+        with Image.open(upload):
+            return True
+    except (UnidentifiedImageError, OSError):
+        return False
+    finally:
+        upload.seek(0)
+
+
+class AvatarProcessor:
+    """
+    Turns avatar uploads into fixed-size thumbnails off the request thread.
+
+    The request thread only copies the upload to a staging file, chunk by
+    chunk. Decoding, EXIF orientation, cropping and encoding run on a
+    small worker pool (Pillow releases the GIL while it decodes and
+    resizes). Every size is written as WebP and JPEG under
+    ``avatars/<key>/<size>.<format>`` without any metadata, and the user's
+    ``avatar`` is switched to the new files once they all exist, so
+    clients keep seeing the previous avatar until then.
+
+    The key is the SHA-256 of the uploaded bytes, so identical uploads
+    share one set of thumbnails and are only decoded once. Since files
+    may be shared, replaced avatars are not deleted on the spot;
+    ``sweep`` removes the ones no user references any more.
+    """
+    def __init__(
+        self,
+        sizes: Iterable[int] = (64, 128, 256),
+        formats: Iterable[str] = ("webp", "jpeg"),
+        default_size: int = 256,
+        quality: int = 82,
+        max_pixels: int = 40_000_000,
+        workers: int = 2,
+    ) -> None:
+        self.sizes = sorted(sizes, reverse=True)
+        self.formats = tuple(formats)
+        self.default_size = default_size
+        self.quality = quality
+        self.max_pixels = max_pixels
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers,
+            thread_name_prefix="avatars"
+        ) if workers else None
+        self._lock = threading.Lock()
+        self._latest: Dict[Any, str] = {}
+
+    def default_name(self, key: str) -> str:
+        """Storage name saved in ``CustomUsers.avatar``."""
+        return f"{AVATAR_DIR}/{key}/{self.default_size}.jpeg"
+
+    def variant_names(self, key: str) -> List[str]:
+        """Storage names of every size and format of an avatar."""
+        return [
+            f"{AVATAR_DIR}/{key}/{size}.{image_format}"
+            for size in self.sizes
+            for image_format in self.formats
+        ]
+
+    def submit(self, user_id: Any, upload) -> None:
+        """
+        Stages the upload and schedules its processing for the user.
+
+        Processing starts once the current transaction commits. A later
+        upload for the same user supersedes any that is still pending.
+        """
+        path, key = self._stage(upload)
+        with self._lock:
+            self._latest[user_id] = key
+
+        def process() -> None:
+            if self._executor is None:
+                self._process(user_id, key, path)
+            else:
+                self._executor.submit(self._process, user_id, key, path)
+
+        transaction.on_commit(process)
+
+    @staticmethod
+    def _stage(upload) -> Tuple[str, str]:
+        """Copies the upload to a staging file and returns its path and hash."""
+        digest = hashlib.sha256()
+        fd, path = tempfile.mkstemp(
+            prefix="avatar-",
+            dir=settings.FILE_UPLOAD_TEMP_DIR
+        )
+        with os.fdopen(fd, "wb") as f:
+            for chunk in upload.chunks():
+                digest.update(chunk)
+                f.write(chunk)
+        return path, digest.hexdigest()
+
+    def _process(self, user_id: Any, key: str, path: str) -> None:
+        close_old_connections()
+        try:
+            names = self._render(key, path)
+            self._apply(user_id, key, names, path)
+        except Exception:
+            logger.exception("Failed to process avatar for user %s", user_id)
+            with self._lock:
+                if self._latest.get(user_id) == key:
+                    del self._latest[user_id]
+        finally:
+            os.unlink(path)
+            close_old_connections()
+
+    def _render(self, key: str, path: str) -> list:
+        names = self.variant_names(key)
+        if all(default_storage.exists(name) for name in names):
+            # Same bytes uploaded before, possibly by another user. The
+            # files look new again, so ``sweep`` and ``discard`` keep
+            # them until ``_apply`` references them.
+            self._touch(key)
+            return names
+
+        with Image.open(path) as image:
+            if image.width * image.height > self.max_pixels:
+                raise ValueError(f"Image too large: {image.size}")
+            # Lets the JPEG decoder downscale while decoding.
+            image.draft("RGB", (self.sizes[0], self.sizes[0]))
+            image = ImageOps.exif_transpose(image)
+            has_alpha = image.mode in ("RGBA", "LA", "PA") or (
+                image.mode == "P" and "transparency" in image.info
+            )
+            image = image.convert("RGBA" if has_alpha else "RGB")
+
+        thumbnail = image
+        for size in self.sizes:
+            # Each size is cropped from the previous, larger one.
+            thumbnail = ImageOps.fit(
+                thumbnail,
+                (size, size),
+                Image.Resampling.LANCZOS
+            )
+            thumbnail.info.clear()
+            for image_format in self.formats:
+                self._save(thumbnail, key, size, image_format)
+        return names
+
+    def _save(self, image, key: str, size: int, image_format: str) -> None:
+        name = f"{AVATAR_DIR}/{key}/{size}.{image_format}"
+        if default_storage.exists(name):
+            return
+        if image_format == "jpeg" and image.mode == "RGBA":
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+        buffer = BytesIO()
+        image.save(
+            buffer,
+            quality=self.quality,
+            **SAVE_OPTIONS[image_format]
+        )
+        default_storage.save(name, ContentFile(buffer.getvalue()))
+
+    @staticmethod
+    def _touch(key: str) -> None:
+        directory = default_storage.path(f"{AVATAR_DIR}/{key}")
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    os.utime(entry.path)
+            os.utime(directory)
+        except FileNotFoundError:
+            pass
+
+    def _apply(self, user_id: Any, key: str, names: list, path: str) -> None:
+        with self._lock:
+            current = self._latest.get(user_id) == key
+            if current:
+                del self._latest[user_id]
+
+        User = get_user_model()
+        user = User.objects.filter(pk=user_id).first() if current else None
+        if user is None:
+            # Left for ``sweep``, another user may share the files.
+            return
+
+        if not all(default_storage.exists(name) for name in names):
+            # Deleted as unreferenced since ``_render`` checked them.
+            self._render(key, path)
+        user.avatar.name = self.default_name(key)
+        user.save(update_fields=["avatar", "updated_at"])
+
+    def discard(self, name: str, min_age: float = 3600) -> bool:
+        """
+        Deletes an avatar unless another user still references it.
+
+        Identical uploads share their files, so the avatar of a deleted
+        account is only removed once no remaining user points at any
+        of its variants. Like in ``sweep``, files modified less than
+        ``min_age`` seconds ago are kept, since an upload of the same
+        bytes may be about to reference them; ``sweep`` removes them
+        later.
+
+        Returns:
+            bool: Whether the avatar was deleted.
+        """
+        match = VARIANT_RE.match(name)
+        if match is None:
+            path = default_storage.path(name)
+            names = [name]
+        else:
+            directory = f"{AVATAR_DIR}/{match['key']}"
+            path = default_storage.path(directory)
+            names = [
+                f"{directory}/{entry}"
+                for entry in (os.listdir(path) if os.path.isdir(path) else [])
+            ]
+
+        try:
+            paths = [default_storage.path(name) for name in names]
+            modified = max((os.stat(p).st_mtime for p in paths), default=0)
+        except FileNotFoundError:
+            return False
+        if modified >= time.time() - min_age:
+            return False
+
+        User = get_user_model()
+        if User.objects.filter(avatar__in=names).exists():
+            return False
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        elif os.path.isfile(path):
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                return False
+        else:
+            return False
+        return True
+
+    def sweep(
+        self,
+        batch_size: int = 1000,
+        min_age: float = 3600,
+        dry_run: bool = False
+    ) -> int:
+        """
+        Deletes avatars that no user references.
+
+        The avatar directory is read with ``os.scandir`` and checked
+        against the database ``batch_size`` files at a time, so memory
+        use does not grow with the number of users or files. Avatars
+        modified less than ``min_age`` seconds ago are kept, since their
+        upload may still be processing.
+
+        Returns:
+            int: The number of deleted (or, with ``dry_run``, orphaned)
+                 avatars. Each avatar is one directory of variants, or a
+                 single file for avatars uploaded before the pipeline.
+        """
+        root = default_storage.path(AVATAR_DIR)
+        if not os.path.isdir(root):
+            return 0
+
+        deleted = 0
+        batch: List[Tuple[str, List[str]]] = []
+        batch_files = 0
+        for path, names in self._scan(root, time.time() - min_age):
+            batch.append((path, names))
+            batch_files += len(names)
+            if batch_files >= batch_size:
+                deleted += self._sweep_batch(batch, dry_run)
+                batch, batch_files = [], 0
+        if batch:
+            deleted += self._sweep_batch(batch, dry_run)
+        return deleted
+
+    @staticmethod
+    def _scan(
+        root: str,
+        cutoff: float
+    ) -> Iterator[Tuple[str, List[str]]]:
+        """Yields each avatar older than ``cutoff`` with its storage names."""
+        with os.scandir(root) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    with os.scandir(entry.path) as variants:
+                        files = [f for f in variants if f.is_file()]
+                    names = [
+                        f"{AVATAR_DIR}/{entry.name}/{f.name}" for f in files
+                    ]
+                    mtimes = [f.stat().st_mtime for f in files]
+                elif entry.is_file(follow_symlinks=False):
+                    names = [f"{AVATAR_DIR}/{entry.name}"]
+                    mtimes = [entry.stat().st_mtime]
+                else:
+                    continue
+                if max(mtimes, default=0) < cutoff:
+                    yield entry.path, names
+
+    @staticmethod
+    def _sweep_batch(
+        batch: List[Tuple[str, List[str]]],
+        dry_run: bool
+    ) -> int:
+        User = get_user_model()
+        referenced = set(
+            User.objects
+            .filter(avatar__in=[name for _, names in batch for name in names])
+            .values_list("avatar", flat=True)
+        )
+        deleted = 0
+        for path, names in batch:
+            if referenced.intersection(names):
+                continue
+            deleted += 1
+            if dry_run:
+                continue
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    # Deleted by ``discard`` or another sweep meanwhile.
+                    pass
+        return deleted
+
+
+@lru_cache(maxsize=None)
+def get_avatar_processor() -> AvatarProcessor:
+    """
+    Returns the process-wide avatar processor
+    configured by ``settings.AVATARS``.
+    """
+    config = getattr(settings, "AVATARS", {})
+    return AvatarProcessor(
+        sizes=config.get("SIZES", (64, 128, 256)),
+        formats=config.get("FORMATS", ("webp", "jpeg")),
+        default_size=config.get("DEFAULT_SIZE", 256),
+        quality=config.get("QUALITY", 82),
+        max_pixels=config.get("MAX_PIXELS", 40_000_000),
+        workers=config.get("WORKERS", 2),
+    )
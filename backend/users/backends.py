@@ -1,13 +1,24 @@
-from django.contrib.auth.backends import BaseBackend
+from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth import get_user_model
 
+from users.cache import get_permission_cache
+from users.metrics import timed
+from users.routers import read_from_replica
+
 User = get_user_model()
 
 
-class EmailBackend(BaseBackend):
+class EmailBackend(ModelBackend):
     """
         We have created our own backend
         for email and password authentication along with username.
+
+        It is the only configured backend: every attempt costs exactly one
+        lookup on the case-insensitive email index and one password hash,
+        whether the user exists, the password is wrong or the login
+        succeeds. Permission checks are inherited from ModelBackend, with
+        the permission sets served from the permission cache across
+        requests.
     """
     def authenticate(self,
                      request,
@@ -15,12 +26,81 @@ class EmailBackend(BaseBackend):
                      password=None,
                      *args, **kwargs):
         """Authenticating the user."""
-        user = User.objects.filter(email=email).first()
+        if email is None:
+            # The admin login form passes the email as ``username``.
+            email = kwargs.get("username", kwargs.get(User.USERNAME_FIELD))
+        if email is None or password is None:
+            return None
+
+        with timed("user_fetch"):
+            user = User.objects.filter_by_email(email).first()
+
+        with timed("password_check"):
+            if user is None:
+                # Run the hasher once so that unknown emails cost
+                # as much as wrong passwords.
+                User().set_password(password)
+                return None
+            password_valid = user.check_password(password)
 
-        if user and user.check_password(password):
+        if password_valid and self.user_can_authenticate(user):
+            return user
+        return None
+
+    async def aauthenticate(self,
+                            request,
+                            email=None,
+                            password=None,
+                            *args, **kwargs):
+        """Async counterpart of ``authenticate``, used by the async views."""
+        if email is None:
+            email = kwargs.get("username", kwargs.get(User.USERNAME_FIELD))
+        if email is None or password is None:
+            return None
+
+        with timed("user_fetch"):
+            user = await User.objects.filter_by_email(email).afirst()
+
+        with timed("password_check"):
+            if user is None:
+                await User().aset_password(password)
+                return None
+            password_valid = await user.acheck_password(password)
+
+        if password_valid and self.user_can_authenticate(user):
             return user
         return None
 
     def get_user(self, user_id):
-        """Getting the user's model object."""
-        return User.objects.filter(pk=user_id).first()
+        """Getting the user's model object, from a read replica."""
+        with read_from_replica(user_id):
+            return User.objects.filter(pk=user_id).first()
+
+    def _get_permissions(self, user_obj, obj, from_name):
+        """
+        Returns the user's ``user`` or ``group`` permissions.
+
+        Both sets are loaded together through the permission cache and
+        then kept on the instance, like ModelBackend does, so a warm
+        request makes no permission queries.
+        """
+        cache = get_permission_cache()
+        if (cache is None or not user_obj.is_active
+                or user_obj.is_anonymous or obj is not None):
+            return super()._get_permissions(user_obj, obj, from_name)
+
+        perm_cache_name = f"_{from_name}_perm_cache"
+        if not hasattr(user_obj, perm_cache_name):
+            permissions = cache.get_or_set(
+                user_obj.pk,
+                lambda: {
+                    name: super(EmailBackend, self)._get_permissions(
+                        user_obj, None, name
+                    )
+                    for name in ("user", "group")
+                },
+                updated_at=getattr(user_obj, "updated_at", None)
+            )
+            user_obj._user_perm_cache = permissions["user"]
+            user_obj._group_perm_cache = permissions["group"]
+        return getattr(user_obj, perm_cache_name)
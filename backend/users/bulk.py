@@ -0,0 +1,381 @@
+import csv
+import json
+from concurrent.futures import Executor
+from datetime import datetime
+from itertools import islice
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.contrib.auth.hashers import (
+    identify_hasher,
+    is_password_usable,
+    make_password,
+)
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Lower
+
+from users.models import CustomUsers
+from users.routers import read_from_replica
+
+
+FORMATS = ("csv", "jsonl")
+EXPORT_FIELDS = (
+    "id", "email", "username", "first_name", "last_name",
+    "is_active", "is_staff", "last_login", "updated_at"
+)
+# Never written back, e.g. to the file of rejected records.
+PASSWORD_FIELDS = ("password", "password_hash")
+TRUE_VALUES = {"1", "true", "yes", "y", "t"}
+FALSE_VALUES = {"0", "false", "no", "n", "f", ""}
+
+
+def detect_format(path: str, file_format: Optional[str] = None) -> str:
+    """Returns ``file_format``, or the format named by the file extension."""
+    if file_format:
+        return file_format
+    extension = path.rsplit(".", 1)[-1].lower()
+    if extension == "json":
+        extension = "jsonl"
+    if extension not in FORMATS:
+        raise ValueError(
+            f"Cannot tell the format of '{path}', pass one of {FORMATS}."
+        )
+    return extension
+
+
+def read_records(stream: IO[str], file_format: str) -> Iterator[Dict[str, Any]]:
+    """Yields the records of a CSV or JSON Lines stream one at a time."""
+    if file_format == "csv":
+        yield from csv.DictReader(stream)
+        return
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            raise ValueError(f"Line {line_number} is not valid JSON: {e}")
+        if not isinstance(record, dict):
+            raise ValueError(f"Line {line_number} is not a JSON object")
+        yield record
+
+
+class RecordWriter:
+    """Writes records as CSV (with a header row) or JSON Lines."""
+    def __init__(
+        self,
+        stream: IO[str],
+        file_format: str,
+        fields: Iterable[str]
+    ) -> None:
+        self.stream = stream
+        self.file_format = file_format
+        self.fields = list(fields)
+        self._csv = None
+        if file_format == "csv":
+            self._csv = csv.DictWriter(
+                stream,
+                fieldnames=self.fields,
+                extrasaction="ignore"
+            )
+            self._csv.writeheader()
+
+    def write(self, record: Dict[str, Any]) -> None:
+        if self._csv is not None:
+            self._csv.writerow({
+                key: "" if value is None else value
+                for key, value in record.items()
+            })
+        else:
+            self.stream.write(
+                json.dumps(record, ensure_ascii=False, default=str) + "\n"
+            )
+
+
+def batched(iterable: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def parse_bool(value: Any, default: bool) -> bool:
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    raise ValueError(f"'{value}' is not a boolean")
+
+
+def hash_raw_password(raw_password: str, hasher: str) -> str:
+    """Runs in the worker processes of the import."""
+    return make_password(raw_password, hasher=hasher)
+
+
+class ImportResult:
+    """Counters of an import."""
+    def __init__(self) -> None:
+        self.read = 0
+        self.created = 0
+        self.invalid = 0
+        self.conflicts = 0
+
+    def as_dict(self) -> dict:
+        return {
+            "read": self.read,
+            "created": self.created,
+            "invalid": self.invalid,
+            "conflicts": self.conflicts,
+        }
+
+
+class UserImporter:
+    """
+    Imports users from records in batches with ``bulk_create``.
+
+    Every record needs an ``email`` and a ``username`` and may carry
+    ``first_name``, ``last_name``, ``is_active`` and ``is_staff``. The
+    password is given as ``password_hash`` (an encoded hash, e.g. from
+    ``export_users --with-password-hashes``) or as a raw ``password``,
+    which is hashed on ``executor`` (a process pool, since the hashers
+    hold the GIL); records with neither get an unusable password.
+
+    Uniqueness is checked per batch with one query for the emails
+    (case-insensitively, on the ``users_email_lower_uniq`` index) and one
+    for the usernames, against the database and the batch still being
+    inserted. Duplicates are rejected before their passwords are hashed.
+    While the pool hashes the passwords of one batch the previous batch
+    is inserted, and only two batches are held in memory at a time.
+
+    Rejected records are passed to ``reject(record, reason)``.
+    """
+    def __init__(
+        self,
+        executor: Optional[Executor] = None,
+        batch_size: int = 1000,
+        hasher: str = "default",
+        dry_run: bool = False,
+        reject=None
+    ) -> None:
+        self.executor = executor
+        self.batch_size = batch_size
+        self.hasher = hasher
+        self.dry_run = dry_run
+        self.reject = reject or (lambda record, reason: None)
+        self.result = ImportResult()
+
+    def run(self, records: Iterable[Dict[str, Any]]) -> ImportResult:
+        pending = None
+        for batch in batched(records, self.batch_size):
+            self.result.read += len(batch)
+            users = self._validate(batch)
+            users = self._drop_conflicts(users, pending)
+            hashes = self._submit_hashes(users)
+            if pending is not None:
+                self._insert(*pending)
+            pending = (users, hashes)
+        if pending is not None:
+            self._insert(*pending)
+        return self.result
+
+    def _validate(
+        self,
+        batch: List[Dict[str, Any]]
+    ) -> List[Tuple[Dict[str, Any], CustomUsers, Optional[str]]]:
+        users = []
+        emails, usernames = set(), set()
+        for record in batch:
+            try:
+                user, raw_password = self._build(record)
+            except (ValueError, ValidationError) as e:
+                self.result.invalid += 1
+                self.reject(record, "; ".join(getattr(e, "messages", [str(e)])))
+                continue
+            email_lower = user.email.lower()
+            if email_lower in emails or user.username in usernames:
+                self.result.conflicts += 1
+                self.reject(record, "duplicate in file")
+                continue
+            emails.add(email_lower)
+            usernames.add(user.username)
+            users.append((record, user, raw_password))
+        return users
+
+    def _build(self, record: Dict[str, Any]) -> Tuple[CustomUsers, Optional[str]]:
+        email = CustomUsers.objects.normalize_email(
+            (record.get("email") or "").strip()
+        )
+        username = (record.get("username") or "").strip()
+        if not email or not username:
+            raise ValueError("email and username are required")
+        validate_email(email)
+
+        values = {
+            "email": email,
+            "username": username,
+            "first_name": record.get("first_name") or "",
+            "last_name": record.get("last_name") or "",
+            "is_active": parse_bool(record.get("is_active"), True),
+            "is_staff": parse_bool(record.get("is_staff"), False),
+        }
+        for name in ("email", "username", "first_name", "last_name"):
+            max_length = CustomUsers._meta.get_field(name).max_length
+            if len(values[name]) > max_length:
+                raise ValueError(f"{name} is longer than {max_length}")
+        user = CustomUsers(**values)
+
+        password_hash = record.get("password_hash")
+        raw_password = record.get("password")
+        if password_hash:
+            if is_password_usable(password_hash):
+                identify_hasher(password_hash)  # ValueError when unknown
+            user.password = password_hash
+            return user, None
+        if raw_password:
+            return user, raw_password
+        user.password = make_password(None)
+        return user, None
+
+    def _drop_conflicts(self, users, pending) -> list:
+        """Drops the users whose email or username is already taken."""
+        if not users:
+            return users
+        taken_emails, taken_usernames = self._taken(
+            {user.email.lower() for _, user, _ in users},
+            {user.username for _, user, _ in users}
+        )
+        if pending is not None:
+            taken_emails |= {user.email.lower() for _, user, _ in pending[0]}
+            taken_usernames |= {user.username for _, user, _ in pending[0]}
+
+        kept = []
+        for record, user, raw_password in users:
+            if user.email.lower() in taken_emails:
+                self.result.conflicts += 1
+                self.reject(record, "email already exists")
+            elif user.username in taken_usernames:
+                self.result.conflicts += 1
+                self.reject(record, "username already exists")
+            else:
+                kept.append((record, user, raw_password))
+        return kept
+
+    @staticmethod
+    def _taken(emails: set, usernames: set) -> Tuple[set, set]:
+        return (
+            set(
+                CustomUsers.objects
+                .annotate(email_lower=Lower("email"))
+                .filter(email_lower__in=emails)
+                .values_list("email_lower", flat=True)
+            ),
+            set(
+                CustomUsers.objects
+                .filter(username__in=usernames)
+                .values_list("username", flat=True)
+            ),
+        )
+
+    def _submit_hashes(self, users) -> Optional[Iterator[str]]:
+        passwords = [raw for _, _, raw in users if raw is not None]
+        if not passwords or self.dry_run:
+            return None
+        if self.executor is None:
+            return iter([hash_raw_password(raw, self.hasher) for raw in passwords])
+        return self.executor.map(
+            hash_raw_password,
+            passwords,
+            [self.hasher] * len(passwords),
+            chunksize=max(1, len(passwords) // 64)
+        )
+
+    def _insert(self, users, hashes: Optional[Iterator[str]]) -> None:
+        if self.dry_run:
+            self.result.created += len(users)
+            return
+        if hashes is not None:
+            for _, user, raw_password in users:
+                if raw_password is not None:
+                    user.password = next(hashes)
+        try:
+            self._bulk_create(users)
+        except IntegrityError:
+            # Rows were created by someone else since the batch was
+            # checked: check again and insert the rest. If rows keep
+            # appearing, insert one at a time and reject the conflicts.
+            users = self._drop_conflicts(users, None)
+            try:
+                self._bulk_create(users)
+            except IntegrityError:
+                users = self._insert_each(users)
+        self.result.created += len(users)
+
+    def _bulk_create(self, users) -> None:
+        try:
+            with transaction.atomic():
+                CustomUsers.objects.bulk_create(
+                    [user for _, user, _ in users],
+                    batch_size=self.batch_size
+                )
+        except IntegrityError:
+            # The keys given to the rows inserted before the failure
+            # were rolled back with them.
+            for _, user, _ in users:
+                user.pk = None
+            raise
+
+    def _insert_each(self, users) -> list:
+        """Inserts the users one at a time, rejecting the conflicts."""
+        created = []
+        for record, user, raw_password in users:
+            try:
+                with transaction.atomic():
+                    CustomUsers.objects.bulk_create([user])
+            except IntegrityError:
+                user.pk = None
+                self.result.conflicts += 1
+                self.reject(record, "email or username already exists")
+            else:
+                created.append((record, user, raw_password))
+        return created
+
+
+def iter_user_rows(
+    batch_size: int = 2000,
+    with_password_hashes: bool = False
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yields every user as a dict of ``EXPORT_FIELDS``, in primary key
+    order.
+
+    Pages are fetched with ``WHERE id > <last id>`` instead of OFFSET,
+    so every page costs the same however deep into the table it is, and
+    only one page is held in memory. Reads go to a replica when one is
+    configured.
+    """
+    fields = list(EXPORT_FIELDS)
+    if with_password_hashes:
+        fields.append("password")
+    last_pk = None
+    while True:
+        queryset = CustomUsers.objects.order_by("pk")
+        if last_pk is not None:
+            queryset = queryset.filter(pk__gt=last_pk)
+        with read_from_replica():
+            page = list(queryset.values_list(*fields)[:batch_size])
+        if not page:
+            return
+        for row in page:
+            record = dict(zip(fields, row))
+            if with_password_hashes:
+                record["password_hash"] = record.pop("password")
+            for name, value in record.items():
+                if isinstance(value, datetime):
+                    record[name] = value.isoformat()
+            yield record
+        last_pk = page[-1][0]
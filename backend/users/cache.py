@@ -0,0 +1,466 @@
+import copy
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+
+
+class UserCache:
+    """
+    Two-level cache of user model instances keyed by ``user_id``.
+
+    The first level is an in-process LRU with a TTL. The optional second
+    level is any Django cache backend (Redis, Memcached, ...) shared between
+    worker processes. Entries are dropped by the ``users.signals`` handlers
+    whenever a user row is saved or deleted.
+
+    Those drops only reach the process that saved the user. With a
+    ``version_alias`` shared by the workers, ``invalidate`` also publishes
+    the user's new ``updated_at`` there, and entries of any other
+    ``updated_at`` are misses in every process. That costs one lookup in
+    the version cache per ``get``. Cached users are copies that may be
+    stale either way, so writes must save them with ``update_fields``.
+    """
+    key_prefix = "users:user:"
+    version_prefix = "users:user-version:"
+
+    def __init__(
+        self,
+        max_size: int = 10_000,
+        ttl: float = 300,
+        shared_alias: Optional[str] = None,
+        shared_ttl: Optional[float] = None,
+        version_alias: Optional[str] = None,
+    ) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.shared_alias = shared_alias
+        self.shared_ttl = shared_ttl if shared_ttl is not None else ttl
+        self.version_alias = version_alias
+        self._entries: "OrderedDict[Any, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.shared_hits = 0
+        self.evictions = 0
+
+    @property
+    def shared(self):
+        if self.shared_alias is None:
+            return None
+        return caches[self.shared_alias]
+
+    @property
+    def versions(self):
+        if self.version_alias is None:
+            return None
+        return caches[self.version_alias]
+
+    def _key(self, user_id: Any) -> str:
+        return f"{self.key_prefix}{user_id}"
+
+    def _version_key(self, user_id: Any) -> str:
+        return f"{self.version_prefix}{user_id}"
+
+    @staticmethod
+    def _is_current(user, version: Any) -> bool:
+        # No published version: the user was not saved within the TTL.
+        return version is None or user.updated_at == version
+
+    def get(self, user_id: Any):
+        """
+        Returns a copy of the cached user, or None on a miss.
+
+        A copy is returned so that views mutating ``request.user``
+        never leak changes into other requests served by this process.
+        """
+        now = time.monotonic()
+        versions = self.versions
+        version = (
+            versions.get(self._version_key(user_id))
+            if versions is not None else None
+        )
+        user = self._get_local(user_id, now, version)
+        if user is not None:
+            return user
+
+        shared = self.shared
+        if shared is not None:
+            user = shared.get(self._key(user_id))
+            if user is not None and self._is_current(user, version):
+                self._store_local(user_id, user, now)
+                with self._lock:
+                    self.hits += 1
+                    self.shared_hits += 1
+                return copy.copy(user)
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def _get_local(self, user_id: Any, now: float, version: Any = None):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            expires_at, user = entry
+            if expires_at <= now or not self._is_current(user, version):
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return copy.copy(user)
+
+    async def aget(self, user_id: Any):
+        """Async counterpart of ``get``."""
+        now = time.monotonic()
+        versions = self.versions
+        version = (
+            await versions.aget(self._version_key(user_id))
+            if versions is not None else None
+        )
+        user = self._get_local(user_id, now, version)
+        if user is not None:
+            return user
+
+        shared = self.shared
+        if shared is not None:
+            user = await shared.aget(self._key(user_id))
+            if user is not None and self._is_current(user, version):
+                self._store_local(user_id, user, now)
+                with self._lock:
+                    self.hits += 1
+                    self.shared_hits += 1
+                return copy.copy(user)
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, user_id: Any, user) -> None:
+        """Stores the user in every configured cache level."""
+        self._store_local(user_id, user, time.monotonic())
+        shared = self.shared
+        if shared is not None:
+            shared.set(self._key(user_id), user, self.shared_ttl)
+
+    async def aset(self, user_id: Any, user) -> None:
+        """Async counterpart of ``set``."""
+        self._store_local(user_id, user, time.monotonic())
+        shared = self.shared
+        if shared is not None:
+            await shared.aset(self._key(user_id), user, self.shared_ttl)
+
+    def _store_local(self, user_id: Any, user, now: float) -> None:
+        with self._lock:
+            self._entries[user_id] = (now + self.ttl, copy.copy(user))
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, user_id: Any, updated_at: Any = None) -> None:
+        """
+        Drops the user from every configured cache level.
+
+        Args:
+            user_id: The id of the saved or deleted user.
+            updated_at: The user's ``updated_at`` after the save, or None
+                        when it was deleted, which no entry matches.
+        """
+        with self._lock:
+            self._entries.pop(user_id, None)
+        shared = self.shared
+        if shared is not None:
+            shared.delete(self._key(user_id))
+        versions = self.versions
+        if versions is not None:
+            versions.set(
+                self._version_key(user_id),
+                updated_at if updated_at is not None else uuid.uuid4().hex,
+                max(self.ttl, self.shared_ttl)
+            )
+
+    def clear(self) -> None:
+        """Empties the local level and resets the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.shared_hits = self.evictions = 0
+
+    def stats(self) -> dict:
+        """Returns hit and miss counters for monitoring."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "shared_hits": self.shared_hits,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class TokenCache:
+    """
+    Bounded LRU of already validated access tokens.
+
+    Keyed by a SHA-256 digest of the raw cookie value, so the token itself
+    is never kept as a key. Each entry expires at the token's ``exp`` claim,
+    which means a cached token is never accepted for longer than the token
+    itself would have been.
+    """
+    def __init__(self, max_size: int = 10_000) -> None:
+        self.max_size = max_size
+        self._entries: "OrderedDict[bytes, tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def _key(raw_token) -> bytes:
+        if isinstance(raw_token, str):
+            raw_token = raw_token.encode()
+        return hashlib.sha256(raw_token).digest()
+
+    def get(self, raw_token):
+        """Returns the validated token for the raw value, or None."""
+        key = self._key(raw_token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, token = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return token
+
+    def set(self, raw_token, token) -> None:
+        """Stores a validated token until its ``exp`` claim."""
+        expires_at = token.get("exp")
+        if expires_at is None:
+            return
+        key = self._key(raw_token)
+        with self._lock:
+            self._entries[key] = (float(expires_at), token)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Empties the cache and resets the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def stats(self) -> dict:
+        """Returns hit, miss and eviction counters for monitoring."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "size": len(self._entries),
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+
+class RepresentationCache:
+    """
+    Serialized user representations keyed by the user's ETag.
+
+    The ETag changes with every save, so entries never need to be
+    invalidated: a stale entry is simply never looked up again and ages
+    out of the backing Django cache. The origin of the request is part of
+    the key because the avatar is rendered as an absolute URL.
+    """
+    key_prefix = "users:representation:"
+
+    def __init__(self, alias: str = "default", ttl: float = 900) -> None:
+        self.alias = alias
+        self.ttl = ttl
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _key(self, user, request) -> str:
+        origin = f"{request.scheme}://{request.get_host()}"
+        digest = hashlib.sha256(f"{user.etag}{origin}".encode()).hexdigest()
+        return f"{self.key_prefix}{user.pk}:{digest[:32]}"
+
+    def get_or_set(self, user, request, serialize: Callable[[], dict]) -> dict:
+        """Returns the cached representation, serializing it on a miss."""
+        key = self._key(user, request)
+        data = self.cache.get(key)
+        if data is None:
+            data = dict(serialize())
+            self.cache.set(key, data, self.ttl)
+        return data
+
+    async def aget_or_set(
+        self,
+        user,
+        request,
+        serialize: Callable[[], dict]
+    ) -> dict:
+        """Async counterpart of ``get_or_set``."""
+        key = self._key(user, request)
+        data = await self.cache.aget(key)
+        if data is None:
+            data = dict(serialize())
+            await self.cache.aset(key, data, self.ttl)
+        return data
+
+
+class PermissionCache:
+    """
+    Permission sets of users, shared between requests.
+
+    ModelBackend only caches permissions on the user instance, and every
+    request loads a new instance, so each ``has_perm`` check of a request
+    costs two join queries. Entries hold the ``user`` and ``group``
+    permission sets keyed by user id, tagged with a global permissions
+    version and the user's ``updated_at``. Changes to a user's groups or
+    direct permissions drop that user's entry; changes that may affect
+    many users (a group's permissions, deleted groups or permissions)
+    replace the version, which invalidates every entry at once. Saving
+    the user (e.g. revoking ``is_superuser``) changes ``updated_at``, so
+    the entry is not used again even if its invalidation was lost.
+
+    Invalidations only reach every worker process when ``alias`` is a
+    cache they share; ``manage.py check`` rejects per-process caches
+    when there are several workers (see users/checks.py).
+    """
+    key_prefix = "users:permissions:"
+    version_key = "users:permissions:version"
+
+    def __init__(self, alias: str = "default", ttl: float = 300) -> None:
+        self.alias = alias
+        self.ttl = ttl
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _key(self, user_id: Any) -> str:
+        return f"{self.key_prefix}{user_id}"
+
+    def _current_version(self, version: Optional[str]) -> str:
+        if version is not None:
+            return version
+        # A lost version key must not revive entries of older versions.
+        version = uuid.uuid4().hex
+        if not self.cache.add(self.version_key, version, None):
+            version = self.cache.get(self.version_key) or version
+        return version
+
+    def get_or_set(
+        self,
+        user_id: Any,
+        compute: Callable[[], Dict[str, set]],
+        updated_at: Optional[datetime] = None
+    ) -> Dict[str, set]:
+        """
+        Returns the user's permission sets, computing them on a miss.
+
+        The entry and the version are read in one round trip. The version
+        read before computing is stored with the result, so a concurrent
+        invalidation is never overwritten by stale sets. Entries stored
+        for another ``updated_at`` of the user are misses.
+        """
+        key = self._key(user_id)
+        found = self.cache.get_many([key, self.version_key])
+        version = self._current_version(found.get(self.version_key))
+        entry = found.get(key)
+        if entry is not None and entry[:2] == (version, updated_at):
+            return entry[2]
+        permissions = compute()
+        self.cache.set(key, (version, updated_at, permissions), self.ttl)
+        return permissions
+
+    def invalidate(self, user_ids: Iterable[Any]) -> None:
+        """Drops the entries of the given users."""
+        self.cache.delete_many([self._key(user_id) for user_id in user_ids])
+
+    def invalidate_all(self) -> None:
+        """Invalidates every entry by replacing the permissions version."""
+        self.cache.set(self.version_key, uuid.uuid4().hex, None)
+
+
+@lru_cache(maxsize=None)
+def get_user_cache() -> Optional[UserCache]:
+    """
+    Returns the process-wide user cache configured by
+    ``settings.USER_CACHE``, or None when caching is disabled.
+    """
+    config = getattr(settings, "USER_CACHE", {})
+    if not config.get("ENABLED", False):
+        return None
+    return UserCache(
+        max_size=config.get("MAX_SIZE", 10_000),
+        ttl=config.get("TTL", 300),
+        shared_alias=config.get("SHARED_CACHE_ALIAS"),
+        shared_ttl=config.get("SHARED_TTL"),
+        version_alias=config.get("VERSION_CACHE_ALIAS"),
+    )
+
+
+@lru_cache(maxsize=None)
+def get_token_cache() -> Optional[TokenCache]:
+    """
+    Returns the process-wide validated token cache configured by
+    ``settings.TOKEN_CACHE``, or None when it is disabled.
+    """
+    config = getattr(settings, "TOKEN_CACHE", {})
+    if not config.get("ENABLED", False):
+        return None
+    return TokenCache(max_size=config.get("MAX_SIZE", 10_000))
+
+
+@lru_cache(maxsize=None)
+def get_representation_cache() -> Optional[RepresentationCache]:
+    """
+    Returns the cache of serialized users configured by
+    ``settings.REPRESENTATION_CACHE``, or None when it is disabled.
+    """
+    config = getattr(settings, "REPRESENTATION_CACHE", {})
+    if not config.get("ENABLED", False):
+        return None
+    return RepresentationCache(
+        alias=config.get("CACHE_ALIAS", "default"),
+        ttl=config.get("TTL", 900),
+    )
+
+
+@lru_cache(maxsize=None)
+def get_permission_cache() -> Optional[PermissionCache]:
+    """
+    Returns the cache of permission sets configured by
+    ``settings.PERMISSION_CACHE``, or None when it is disabled.
+    """
+    config = getattr(settings, "PERMISSION_CACHE", {})
+    if not config.get("ENABLED", False):
+        return None
+    return PermissionCache(
+        alias=config.get("CACHE_ALIAS", "default"),
+        ttl=config.get("TTL", 300),
+    )
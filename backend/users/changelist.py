@@ -0,0 +1,158 @@
+from typing import List, Optional
+
+from django.contrib.admin.views.main import ChangeList
+from django.core.exceptions import FieldDoesNotExist
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max
+from django.utils.functional import cached_property
+
+
+AFTER_VAR = "_after"
+BEFORE_VAR = "_before"
+
+
+def estimate_count(queryset, exact_limit: int) -> int:
+    """
+    Returns the number of rows of ``queryset`` without a full COUNT(*).
+
+    An unfiltered queryset is estimated from the planner statistics on
+    PostgreSQL and from the highest primary key on SQLite. A filtered one
+    is counted up to ``exact_limit`` rows and reported as that many when
+    there are more. Small tables (below ``exact_limit``) are counted
+    exactly.
+    """
+    if not queryset.query.where:
+        estimate = estimate_table_rows(queryset)
+        if estimate is not None and estimate > exact_limit:
+            return estimate
+    return queryset.order_by()[:exact_limit + 1].count()
+
+
+def estimate_table_rows(queryset) -> Optional[int]:
+    connection = connections[queryset.db]
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                [queryset.model._meta.db_table]
+            )
+            row = cursor.fetchone()
+        # -1 until the table was analyzed for the first time.
+        return row[0] if row and row[0] >= 0 else None
+    if connection.vendor == "sqlite":
+        return queryset.aggregate(last=Max("pk"))["last"] or 0
+    return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator counting with ``estimate_count``."""
+    def __init__(self, *args, exact_limit: int = 10_000, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.exact_limit = exact_limit
+
+    @cached_property
+    def count(self) -> int:
+        return estimate_count(self.object_list, self.exact_limit)
+
+
+class KeysetChangeList(ChangeList):
+    """
+    Changelist that pages by primary key instead of OFFSET.
+
+    In the default order (newest first) the next page is the rows below
+    the last primary key shown (``?_after=<pk>``) and the previous page
+    the rows above the first one (``?_before=<pk>``), so every page is an
+    index range scan however deep it is. Sorting by a column falls back
+    to numbered pages. Only the model fields shown in ``list_display``
+    are loaded.
+    """
+    def __init__(self, request, *args, **kwargs):
+        self.after = self._parse_pk(request.GET.get(AFTER_VAR))
+        self.before = self._parse_pk(request.GET.get(BEFORE_VAR))
+        super().__init__(request, *args, **kwargs)
+
+    @staticmethod
+    def _parse_pk(value: Optional[str]) -> Optional[int]:
+        try:
+            return int(value) if value else None
+        except ValueError:
+            return None
+
+    def get_queryset(self, request, exclude_parameters=None):
+        # Like the page number, the position is not a filter and is not
+        # carried over to the sorting, filter and search links.
+        for name in (AFTER_VAR, BEFORE_VAR):
+            self.params.pop(name, None)
+            self.filter_params.pop(name, None)
+        queryset = super().get_queryset(request, exclude_parameters)
+        fields = self.list_display_fields()
+        return queryset.only(*fields) if fields else queryset
+
+    def list_display_fields(self) -> List[str]:
+        fields = []
+        for name in self.list_display:
+            try:
+                field = self.lookup_opts.get_field(name)
+            except (FieldDoesNotExist, TypeError):
+                continue
+            if field.concrete and not field.many_to_many:
+                fields.append(field.name)
+        return fields
+
+    @property
+    def keyset(self) -> bool:
+        return list(self.queryset.query.order_by) == ["-pk"] and not self.show_all
+
+    def get_results(self, request):
+        if not self.keyset:
+            return super().get_results(request)
+
+        per_page = self.list_per_page
+        if self.before is not None:
+            rows = list(
+                self.queryset.filter(pk__gt=self.before)
+                .reverse()[:per_page + 1]
+            )
+            self.has_previous = len(rows) > per_page
+            self.has_next = True
+            rows = rows[:per_page][::-1]
+        else:
+            queryset = self.queryset
+            if self.after is not None:
+                queryset = queryset.filter(pk__lt=self.after)
+            rows = list(queryset[:per_page + 1])
+            self.has_previous = self.after is not None
+            self.has_next = len(rows) > per_page
+            rows = rows[:per_page]
+
+        paginator = self.model_admin.get_paginator(
+            request, self.queryset, per_page
+        )
+        self.result_count = paginator.count
+        self.show_full_result_count = self.model_admin.show_full_result_count
+        self.full_result_count = (
+            self.root_queryset.count()
+            if self.show_full_result_count else None
+        )
+        self.show_admin_actions = True
+        self.result_list = rows
+        self.can_show_all = False
+        self.multi_page = self.has_previous or self.has_next
+        self.paginator = paginator
+
+    def previous_page_query(self) -> Optional[str]:
+        if not self.has_previous or not self.result_list:
+            return None
+        return self.get_query_string(
+            {BEFORE_VAR: self.result_list[0].pk},
+            remove=[AFTER_VAR, "p"]
+        )
+
+    def next_page_query(self) -> Optional[str]:
+        if not self.has_next or not self.result_list:
+            return None
+        return self.get_query_string(
+            {AFTER_VAR: self.result_list[-1].pk},
+            remove=[BEFORE_VAR, "p"]
+        )
@@ -0,0 +1,87 @@
+from django.conf import settings
+from django.core.checks import Error, Tags, register
+
+
+PROCESS_LOCAL_BACKENDS = {
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+}
+
+
+def is_process_local(alias: str) -> bool:
+    """Whether the cache behind ``alias`` is private to each process."""
+    backend = settings.CACHES.get(alias, {}).get("BACKEND", "")
+    return backend in PROCESS_LOCAL_BACKENDS
+
+
+@register(Tags.caches)
+def check_shared_caches(app_configs, **kwargs):
+    """
+    Rejects per-process caches for features that coordinate worker
+    processes when ``WORKER_PROCESSES`` is above one.
+    """
+    if getattr(settings, "WORKER_PROCESSES", 1) <= 1:
+        return []
+
+    errors = []
+    store = getattr(settings, "REFRESH_TOKEN_STORE", {})
+    alias = store.get("GRACE_CACHE_ALIAS", "default")
+    if store.get("GRACE_WINDOW", 10) and is_process_local(alias):
+        errors.append(Error(
+            f"REFRESH_TOKEN_STORE['GRACE_CACHE_ALIAS'] ('{alias}') is "
+            "private to each process, so concurrent refreshes handled by "
+            "different workers revoke the token family.",
+            hint="Point it at a cache shared by every worker, e.g. "
+                 "'shared', or set GRACE_WINDOW to 0.",
+            id="users.E001",
+        ))
+
+    routing = getattr(settings, "DATABASE_ROUTING", {})
+    alias = routing.get("PIN_CACHE_ALIAS", "default")
+    if routing.get("REPLICAS") and is_process_local(alias):
+        errors.append(Error(
+            f"DATABASE_ROUTING['PIN_CACHE_ALIAS'] ('{alias}') is private "
+            "to each process, so a write only pins the user's reads in "
+            "the worker that handled it.",
+            hint="Point it at a cache shared by every worker, e.g. "
+                 "'shared'.",
+            id="users.E002",
+        ))
+
+    permissions = getattr(settings, "PERMISSION_CACHE", {})
+    alias = permissions.get("CACHE_ALIAS", "default")
+    if permissions.get("ENABLED", False) and is_process_local(alias):
+        errors.append(Error(
+            f"PERMISSION_CACHE['CACHE_ALIAS'] ('{alias}') is private to "
+            "each process, so permissions revoked through one worker "
+            "stay cached in the others.",
+            hint="Point it at a cache shared by every worker, e.g. "
+                 "'shared', or disable the permission cache.",
+            id="users.E003",
+        ))
+
+    alias = store.get("REVOCATION_CACHE_ALIAS", "default")
+    if is_process_local(alias):
+        errors.append(Error(
+            f"REFRESH_TOKEN_STORE['REVOCATION_CACHE_ALIAS'] ('{alias}') is "
+            "private to each process, so the access tokens of deleted "
+            "accounts are only rejected by the worker that deleted them.",
+            hint="Point it at a cache shared by every worker, e.g. "
+                 "'shared'.",
+            id="users.E004",
+        ))
+
+    users = getattr(settings, "USER_CACHE", {})
+    alias = users.get("VERSION_CACHE_ALIAS")
+    if users.get("ENABLED", False) and (
+        alias is None or is_process_local(alias)
+    ):
+        errors.append(Error(
+            f"USER_CACHE['VERSION_CACHE_ALIAS'] ({alias!r}) is not shared "
+            "by the worker processes, so the others keep serving a user "
+            "saved through one of them until the TTL runs out.",
+            hint="Point it at a cache shared by every worker, e.g. "
+                 "'shared', or disable the user cache.",
+            id="users.E005",
+        ))
+    return errors
@@ -0,0 +1,185 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Iterator, Optional
+
+from django.conf import settings
+from django.db import close_old_connections, models, transaction
+from django.utils import timezone
+
+from users.avatars import get_avatar_processor
+from users.models import CustomUsers
+from users.token_store import get_refresh_token_store
+
+
+logger = logging.getLogger(__name__)
+
+
+def cascading_querysets(user_id: Any) -> Iterator[models.QuerySet]:
+    """
+    Yields the rows of every relation that cascades from a user.
+
+    Covers reverse foreign keys declared with ``on_delete=CASCADE``,
+    including the hidden ones of many-to-many through tables (groups,
+    permissions), so relations added later are purged without changes
+    here. Other ``on_delete`` behaviours are left to ``delete()``.
+    """
+    for relation in CustomUsers._meta.get_fields(include_hidden=True):
+        if not relation.auto_created or relation.concrete:
+            continue
+        if not (relation.one_to_many or relation.one_to_one):
+            continue
+        if relation.on_delete is not models.CASCADE:
+            continue
+        yield relation.related_model._base_manager.filter(
+            **{relation.field.name: user_id}
+        )
+
+
+class AccountDeleter:
+    """
+    Deletes accounts without making the request wait for it.
+
+    ``schedule`` only deactivates the account and records when its
+    deletion was requested, which takes one UPDATE however much data the
+    user owns. Its tokens are rejected from then on: the refresh token
+    store revokes its refresh tokens and, in every process, its access
+    tokens until they expire, even where the user is still cached.
+
+    Once the transaction commits, ``purge`` runs on a small worker pool.
+    The rows of every relation cascading from the user are deleted
+    ``batch_size`` at a time by primary key, so no statement locks or
+    loads more than one chunk; then the user row goes, and its avatar
+    unless another user shares the files or they were written within
+    the last hour (``sweep_avatars`` removes those). Purging is
+    idempotent, and accounts whose purge did not finish (e.g. the
+    process restarted) are picked up by ``purge_pending``.
+    """
+    def __init__(
+        self,
+        batch_size: int = 1000,
+        pause: float = 0.0,
+        workers: int = 1
+    ) -> None:
+        self.batch_size = batch_size
+        self.pause = pause
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers,
+            thread_name_prefix="account-deletion"
+        ) if workers else None
+
+    def schedule(self, user) -> None:
+        """Deactivates the account and purges it after the commit."""
+        user.is_active = False
+        user.deletion_requested_at = timezone.now()
+        user.save(
+            update_fields=["is_active", "deletion_requested_at", "updated_at"]
+        )
+        user_id = user.pk
+        get_refresh_token_store().revoke_user(user_id)
+
+        def purge() -> None:
+            if self._executor is None:
+                self._run(user_id)
+            else:
+                self._executor.submit(self._run, user_id)
+
+        transaction.on_commit(purge)
+
+    def _run(self, user_id: Any) -> None:
+        close_old_connections()
+        try:
+            self.purge(user_id)
+        except Exception:
+            logger.exception("Failed to purge account %s", user_id)
+        finally:
+            close_old_connections()
+
+    def purge(self, user_id: Any) -> bool:
+        """
+        Deletes an account scheduled for deletion and everything it owns.
+
+        Returns:
+            bool: False if the account is not pending deletion,
+                  e.g. because it was already purged.
+        """
+        user = CustomUsers.objects.filter(
+            pk=user_id,
+            deletion_requested_at__isnull=False
+        ).first()
+        if user is None:
+            return False
+
+        for queryset in cascading_querysets(user_id):
+            self._delete_in_chunks(queryset)
+
+        avatar = user.avatar.name if user.avatar else None
+        user.delete()
+        if avatar:
+            get_avatar_processor().discard(avatar)
+        return True
+
+    def _delete_in_chunks(self, queryset: models.QuerySet) -> int:
+        deleted = 0
+        manager = queryset.model._base_manager
+        while True:
+            pks = list(queryset.values_list("pk", flat=True)[:self.batch_size])
+            if not pks:
+                return deleted
+            count, _ = manager.filter(pk__in=pks).delete()
+            deleted += count
+            if self.pause:
+                time.sleep(self.pause)
+
+    def purge_pending(self, limit: Optional[int] = None) -> int:
+        """
+        Purges accounts scheduled for deletion, oldest request first.
+
+        An account that fails to purge is logged and skipped, so it
+        cannot hold up the others; the next run retries it.
+
+        Returns:
+            int: The number of purged accounts.
+        """
+        purged = 0
+        pending = (
+            CustomUsers.objects
+            .filter(deletion_requested_at__isnull=False)
+            .order_by("deletion_requested_at", "pk")
+            .values_list("deletion_requested_at", "pk")
+        )
+        page_filter = models.Q()
+        while limit is None or purged < limit:
+            page = list(pending.filter(page_filter)[:self.batch_size])
+            if not page:
+                break
+            for _, user_id in page:
+                if limit is not None and purged >= limit:
+                    break
+                try:
+                    if self.purge(user_id):
+                        purged += 1
+                except Exception:
+                    logger.exception("Failed to purge account %s", user_id)
+            # Continue after the last account of the page, past the
+            # ones that failed.
+            requested_at, user_id = page[-1]
+            page_filter = models.Q(deletion_requested_at__gt=requested_at) | (
+                models.Q(deletion_requested_at=requested_at, pk__gt=user_id)
+            )
+        return purged
+
+
+@lru_cache(maxsize=None)
+def get_account_deleter() -> AccountDeleter:
+    """
+    Returns the process-wide account deleter
+    configured by ``settings.ACCOUNT_DELETION``.
+    """
+    config = getattr(settings, "ACCOUNT_DELETION", {})
+    return AccountDeleter(
+        batch_size=config.get("BATCH_SIZE", 1000),
+        pause=config.get("PAUSE", 0.0),
+        workers=config.get("WORKERS", 1),
+    )
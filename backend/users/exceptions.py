@@ -0,0 +1,15 @@
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class HashingPoolBusy(APIException):
+    """
+    Raised when the password hashing pool cannot accept more work.
+
+    DRF renders it as a 503 response, so clients can retry later
+    instead of piling up on the request workers.
+    """
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _("Too many authentication requests, try again later.")
+    default_code = "hashing_pool_busy"
@@ -0,0 +1,199 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from functools import lru_cache
+from typing import Callable, Optional, TypeVar
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import hashers
+
+from users.exceptions import HashingPoolBusy
+
+
+T = TypeVar("T")
+
+
+class HashingPool:
+    """
+    Size-limited worker pool for password hashing.
+
+    At most ``workers`` hashes run at the same time and at most
+    ``max_queue`` more wait for a worker. Anything beyond that is
+    rejected immediately with ``HashingPoolBusy`` (HTTP 503), so a burst
+    of logins cannot monopolise the request workers. PBKDF2 from hashlib
+    releases the GIL, which lets the workers run in parallel with the
+    request threads.
+    """
+    def __init__(
+        self,
+        workers: int = 2,
+        max_queue: int = 32,
+        timeout: float = 10.0
+    ) -> None:
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers,
+            thread_name_prefix="password-hashing"
+        )
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.hash_time_total = 0.0
+        self.hash_time_max = 0.0
+
+    def run(self, func: Callable[..., T], *args) -> T:
+        """
+        Runs ``func(*args)`` on a pool worker and waits for the result.
+
+        Raises:
+            HashingPoolBusy: If the queue is full or the work does not
+                             finish within the configured timeout.
+        """
+        future = self._submit(func, *args)
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            with self._lock:
+                self.rejected += 1
+            raise HashingPoolBusy()
+
+    async def arun(self, func: Callable[..., T], *args) -> T:
+        """
+        Async counterpart of ``run``: awaits the worker without
+        blocking the event loop.
+
+        Raises:
+            HashingPoolBusy: If the queue is full or the work does not
+                             finish within the configured timeout.
+        """
+        future = self._submit(func, *args)
+        try:
+            return await asyncio.wait_for(
+                asyncio.shield(asyncio.wrap_future(future)),
+                timeout=self.timeout
+            )
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.rejected += 1
+            raise HashingPoolBusy()
+
+    def _submit(self, func: Callable[..., T], *args) -> "Future[T]":
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise HashingPoolBusy()
+
+        with self._lock:
+            self.pending += 1
+        try:
+            return self._executor.submit(self._timed, func, *args)
+        except BaseException:
+            self._done()
+            raise
+
+    def _timed(self, func: Callable[..., T], *args) -> T:
+        with self._lock:
+            self.running += 1
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+                self.hash_time_total += elapsed
+                self.hash_time_max = max(self.hash_time_max, elapsed)
+            self._done()
+
+    def _done(self) -> None:
+        with self._lock:
+            self.pending -= 1
+        self._slots.release()
+
+    def stats(self) -> dict:
+        """Returns queue depth and hash time metrics for monitoring."""
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "queue_depth": self.pending - self.running,
+                "running": self.running,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "hash_time_total": self.hash_time_total,
+                "hash_time_avg": (
+                    self.hash_time_total / self.completed
+                    if self.completed else 0.0
+                ),
+                "hash_time_max": self.hash_time_max,
+            }
+
+
+@lru_cache(maxsize=None)
+def get_hashing_pool() -> Optional[HashingPool]:
+    """
+    Returns the process-wide hashing pool configured by
+    ``settings.PASSWORD_HASHING_POOL``, or None when it is disabled.
+    """
+    config = getattr(settings, "PASSWORD_HASHING_POOL", {})
+    if not config.get("ENABLED", False):
+        return None
+    return HashingPool(
+        workers=config.get("WORKERS", 2),
+        max_queue=config.get("MAX_QUEUE", 32),
+        timeout=config.get("TIMEOUT", 10.0),
+    )
+
+
+def hash_password(raw_password: str) -> str:
+    """Hashes a password, on the hashing pool when it is enabled."""
+    pool = get_hashing_pool()
+    if pool is None:
+        return hashers.make_password(raw_password)
+    return pool.run(hashers.make_password, raw_password)
+
+
+def verify_password(raw_password: str, encoded: str) -> tuple[bool, bool]:
+    """
+    Checks a password against its hash, on the hashing pool when it is
+    enabled.
+
+    Returns:
+        Tuple: Whether the password is correct and whether
+               the stored hash must be upgraded.
+    """
+    pool = get_hashing_pool()
+    if pool is None:
+        return hashers.verify_password(raw_password, encoded)
+    return pool.run(hashers.verify_password, raw_password, encoded)
+
+
+async def ahash_password(raw_password: str) -> str:
+    """Async counterpart of ``hash_password``; never hashes on the loop."""
+    pool = get_hashing_pool()
+    if pool is None:
+        return await sync_to_async(
+            hashers.make_password, thread_sensitive=False
+        )(raw_password)
+    return await pool.arun(hashers.make_password, raw_password)
+
+
+async def averify_password(
+    raw_password: str,
+    encoded: str
+) -> tuple[bool, bool]:
+    """Async counterpart of ``verify_password``; never hashes on the loop."""
+    pool = get_hashing_pool()
+    if pool is None:
+        return await sync_to_async(
+            hashers.verify_password, thread_sensitive=False
+        )(raw_password, encoded)
+    return await pool.arun(hashers.verify_password, raw_password, encoded)
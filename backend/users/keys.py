@@ -0,0 +1,150 @@
+import hashlib
+import json
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import jwt
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from jwt import algorithms
+from rest_framework_simplejwt.backends import ALLOWED_ALGORITHMS, TokenBackend
+from rest_framework_simplejwt.exceptions import TokenBackendError
+from rest_framework_simplejwt.settings import api_settings
+
+
+ASYMMETRIC_ALGORITHMS = {
+    "RS256": algorithms.RSAAlgorithm,
+    "RS384": algorithms.RSAAlgorithm,
+    "RS512": algorithms.RSAAlgorithm,
+    "EdDSA": algorithms.OKPAlgorithm,
+} if algorithms.has_crypto else {}
+
+
+class KeyRing:
+    """
+    Set of ``kid``-tagged signing keys loaded from ``JWT_KEYS["KEYS_DIR"]``.
+
+    Every ``<kid>.pem`` file in the directory holds a private key. Tokens
+    are signed with the ``ACTIVE_KID`` key and verified with whichever key
+    their ``kid`` header names, so keys can be rotated by adding a new
+    file, switching ``ACTIVE_KID`` and deleting the old file once the
+    tokens it signed have expired.
+    """
+    def __init__(
+        self,
+        algorithm: str,
+        keys_dir: Path,
+        active_kid: Optional[str] = None
+    ) -> None:
+        if algorithm not in ASYMMETRIC_ALGORITHMS:
+            raise ImproperlyConfigured(
+                f"Unsupported asymmetric JWT algorithm '{algorithm}' "
+                "(is cryptography installed?)"
+            )
+        self.algorithm = algorithm
+        self.private_keys: Dict[str, Any] = {}
+        self.public_keys: Dict[str, Any] = {}
+
+        for path in sorted(Path(keys_dir).glob("*.pem")):
+            private_key = algorithms.get_default_algorithms()[
+                algorithm
+            ].prepare_key(path.read_bytes())
+            self.private_keys[path.stem] = private_key
+            self.public_keys[path.stem] = private_key.public_key()
+
+        if not self.private_keys:
+            raise ImproperlyConfigured(f"No signing keys found in {keys_dir}")
+
+        self.active_kid = active_kid or max(self.private_keys)
+        if self.active_kid not in self.private_keys:
+            raise ImproperlyConfigured(
+                f"Active JWT key '{self.active_kid}' not found in {keys_dir}"
+            )
+
+        self.jwks_json = json.dumps(
+            {"keys": [self.public_jwk(kid) for kid in self.public_keys]},
+            separators=(",", ":"),
+            sort_keys=True
+        ).encode()
+        self.jwks_etag = f'"{hashlib.sha256(self.jwks_json).hexdigest()[:32]}"'
+
+    def public_jwk(self, kid: str) -> dict:
+        """Returns the public key as a JWK dictionary."""
+        jwk = ASYMMETRIC_ALGORITHMS[self.algorithm].to_jwk(
+            self.public_keys[kid],
+            as_dict=True
+        )
+        return {**jwk, "kid": kid, "alg": self.algorithm, "use": "sig"}
+
+
+class KeyRingTokenBackend(TokenBackend):
+    """
+    simplejwt token backend that signs with the active key of a KeyRing
+    and verifies with the key named by the token's ``kid`` header.
+    """
+    def __init__(self, key_ring: KeyRing) -> None:
+        self.key_ring = key_ring
+        super().__init__(
+            key_ring.algorithm,
+            key_ring.private_keys[key_ring.active_kid],
+            audience=api_settings.AUDIENCE,
+            issuer=api_settings.ISSUER,
+            leeway=api_settings.LEEWAY,
+            json_encoder=api_settings.JSON_ENCODER,
+        )
+
+    def _validate_algorithm(self, algorithm: str) -> None:
+        if algorithm not in ALLOWED_ALGORITHMS | set(ASYMMETRIC_ALGORITHMS):
+            super()._validate_algorithm(algorithm)
+
+    def get_verifying_key(self, token):
+        try:
+            kid = jwt.get_unverified_header(token).get("kid")
+        except jwt.InvalidTokenError as ex:
+            raise TokenBackendError("Token is invalid or expired") from ex
+        try:
+            return self.key_ring.public_keys[kid]
+        except KeyError:
+            raise TokenBackendError("Token is invalid or expired")
+
+    def encode(self, payload: Dict[str, Any]) -> str:
+        jwt_payload = payload.copy()
+        if self.audience is not None:
+            jwt_payload["aud"] = self.audience
+        if self.issuer is not None:
+            jwt_payload["iss"] = self.issuer
+
+        return jwt.encode(
+            jwt_payload,
+            self.signing_key,
+            algorithm=self.algorithm,
+            headers={"kid": self.key_ring.active_kid},
+            json_encoder=self.json_encoder,
+        )
+
+
+@lru_cache(maxsize=None)
+def get_key_ring() -> Optional[KeyRing]:
+    """
+    Returns the key ring for ``SIMPLE_JWT["ALGORITHM"]``, or None
+    when tokens are signed with a shared secret (HS*).
+    """
+    if api_settings.ALGORITHM.startswith("HS"):
+        return None
+    config = getattr(settings, "JWT_KEYS", {})
+    return KeyRing(
+        api_settings.ALGORITHM,
+        config["KEYS_DIR"],
+        config.get("ACTIVE_KID")
+    )
+
+
+@lru_cache(maxsize=None)
+def get_token_backend() -> TokenBackend:
+    """Returns the token backend used by the token classes."""
+    key_ring = get_key_ring()
+    if key_ring is None:
+        from rest_framework_simplejwt.state import token_backend
+        return token_backend
+    return KeyRingTokenBackend(key_ring)
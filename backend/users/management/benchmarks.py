@@ -0,0 +1,130 @@
+import platform
+import subprocess
+import threading
+from contextlib import ExitStack, contextmanager
+from datetime import datetime, timezone
+from statistics import mean
+from typing import Dict, List, Optional, Sequence
+
+import django
+from django.conf import settings
+from django.db import connection, connections
+
+
+FAST_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
+
+
+def in_process_hosts() -> List[str]:
+    """
+    ``ALLOWED_HOSTS`` plus ``testserver``, the host of Django's test
+    clients, so in-process requests are not rejected as disallowed hosts.
+    """
+    return [*settings.ALLOWED_HOSTS, "testserver"]
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    """Returns the nearest-rank percentile of ``values``."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize_latencies(seconds: Sequence[float]) -> dict:
+    """Returns mean and p50/p95/p99 of ``seconds`` in milliseconds."""
+    return {
+        "mean_ms": mean(seconds) * 1000 if seconds else 0.0,
+        "p50_ms": percentile(seconds, 50) * 1000,
+        "p95_ms": percentile(seconds, 95) * 1000,
+        "p99_ms": percentile(seconds, 99) * 1000,
+    }
+
+
+class QueryCounter:
+    """
+    Counts the SQL queries run by the current thread.
+
+    Unlike ``CaptureQueriesContext`` it does not need DEBUG cursors
+    and is safe to use from many threads at once, since every thread
+    has its own database connections and counter.
+    """
+    def __init__(self) -> None:
+        self._local = threading.local()
+
+    @property
+    def count(self) -> int:
+        return getattr(self._local, "count", 0)
+
+    def _wrapper(self, execute, sql, params, many, context):
+        self._local.count = self.count + 1
+        return execute(sql, params, many, context)
+
+    @contextmanager
+    def counting(self):
+        """Yields a callable returning the queries run inside the block."""
+        start = self.count
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(
+                    connections[alias].execute_wrapper(self._wrapper)
+                )
+            yield lambda: self.count - start
+
+
+def describe_database() -> str:
+    if connection.vendor != "sqlite":
+        return connection.vendor
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA journal_mode")
+        return f"sqlite ({cursor.fetchone()[0]})"
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment() -> Dict[str, Optional[str]]:
+    """Describes what a benchmark ran on, to tell runs apart."""
+    return {
+        "revision": git_revision(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "database": describe_database(),
+        "password_hasher": settings.PASSWORD_HASHERS[0].rsplit(".", 1)[-1],
+    }
+
+
+def compare(
+    current: Dict[str, dict],
+    baseline: Dict[str, dict],
+    keys: List[str]
+) -> List[str]:
+    """
+    Formats the relative change of ``keys`` for every result present
+    in both runs (positive means slower or more).
+    """
+    lines = []
+    for name, result in current.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        changes = []
+        for key in keys:
+            old, new = previous.get(key), result.get(key)
+            if not old or new is None:
+                continue
+            changes.append(f"{key} {(new - old) / old * 100:+6.1f}%")
+        if changes:
+            lines.append(f"{name:<16} " + "  ".join(changes))
+    return lines
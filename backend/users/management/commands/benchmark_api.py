@@ -0,0 +1,312 @@
+import json
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import urlencode
+
+import requests
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client, override_settings
+
+from users.management.benchmarks import (
+    FAST_HASHERS,
+    QueryCounter,
+    compare,
+    environment,
+    summarize_latencies,
+    in_process_hosts,
+)
+from users.models import CustomUsers
+from users.throttling import get_token_bucket
+
+
+REGISTER_URL = "/api/auth/v1/register/"
+LOGIN_URL = "/api/auth/v1/login/"
+USERS_URL = "/api/auth/v1/users/"
+REFRESH_URL = "/api/auth/v1/refresh/"
+LOGOUT_URL = "/api/auth/v1/logout/"
+FORM_CONTENT = "application/x-www-form-urlencoded"
+
+# (step, method, url, expected status), in the order a client runs them.
+FLOW = [
+    ("register", "POST", REGISTER_URL, 201),
+    ("login", "POST", LOGIN_URL, 200),
+    ("users_get", "GET", USERS_URL, 200),
+    ("users_put", "PUT", USERS_URL, 200),
+    ("refresh", "POST", REFRESH_URL, 200),
+    ("logout", "POST", LOGOUT_URL, 200),
+]
+COMPARED_KEYS = ["p50_ms", "p95_ms", "p99_ms", "queries"]
+
+
+class InProcessClient:
+    """Sends requests through Django's WSGI handler, counting queries."""
+    def __init__(self, counter: QueryCounter) -> None:
+        self.client = Client(raise_request_exception=False)
+        self.counter = counter
+
+    def send(
+        self,
+        method: str,
+        url: str,
+        json_data: Optional[dict] = None,
+        form_data: Optional[dict] = None
+    ) -> Tuple[int, Optional[int]]:
+        if json_data is not None:
+            kwargs = {
+                "data": json.dumps(json_data),
+                "content_type": "application/json",
+            }
+        elif form_data is not None:
+            kwargs = {"data": urlencode(form_data), "content_type": FORM_CONTENT}
+        else:
+            kwargs = {}
+        with self.counter.counting() as queries:
+            response = self.client.generic(method, url, **kwargs)
+        return response.status_code, queries()
+
+    def close(self) -> None:
+        # Every worker thread opened its own connections.
+        connections.close_all()
+
+
+class RemoteClient:
+    """Sends requests to a running server, keeping its cookies."""
+    def __init__(self, base_url: str) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.session = requests.Session()
+
+    def send(
+        self,
+        method: str,
+        url: str,
+        json_data: Optional[dict] = None,
+        form_data: Optional[dict] = None
+    ) -> Tuple[int, Optional[int]]:
+        response = self.session.request(
+            method,
+            self.base_url + url,
+            json=json_data,
+            data=form_data,
+        )
+        return response.status_code, None
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class Command(BaseCommand):
+    """
+    Load tests the complete auth flow: register, login, GET and PUT
+    ``/v1/users/``, refresh and logout.
+
+    ``--clients`` concurrent clients each run the flow ``--iterations``
+    times with a fresh account. The command reports p50/p95/p99
+    latency, error count and SQL queries per request for every step,
+    plus the overall throughput, and saves them with the revision,
+    versions and database to ``--json``. Requests answered with an
+    unexpected status only count as errors, not in the latencies, and
+    make the command fail after the report. Pass a previous result as
+    ``--compare`` to print the change of every step, e.g. between two
+    commits.
+
+    By default the requests go through Django's in-process WSGI handler
+    with throttling disabled; ``--fast-hashing`` swaps PBKDF2 for MD5 so
+    that the password hasher does not dominate. With ``--target`` they
+    are sent to a running server instead (start it with
+    ``THROTTLING_ENABLED=False``), in which case the server's settings
+    apply and queries cannot be counted. Accounts are deleted afterwards
+    through this process's database, which is the server's too when it
+    runs from the same checkout.
+    """
+    help = "Load tests the auth API flow and reports latency percentiles."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clients", type=int, default=10)
+        parser.add_argument(
+            "--iterations",
+            type=int,
+            default=10,
+            help="Flows run by every client.",
+        )
+        parser.add_argument(
+            "--target",
+            help="Base URL of a running server, e.g. http://localhost:8000.",
+        )
+        parser.add_argument(
+            "--fast-hashing",
+            action="store_true",
+            help="Hash passwords with MD5 (in-process only).",
+        )
+        parser.add_argument(
+            "--json",
+            dest="json_path",
+            help="Write the results to this file as JSON.",
+        )
+        parser.add_argument(
+            "--compare",
+            dest="baseline_path",
+            help="Compare with the results of an earlier --json run.",
+        )
+
+    def handle(self, *args, **options):
+        if options["clients"] < 1 or options["iterations"] < 1:
+            raise CommandError("--clients and --iterations must be positive.")
+        if options["target"] and options["fast_hashing"]:
+            raise CommandError(
+                "--fast-hashing only applies to in-process runs."
+            )
+
+        overrides = {}
+        if not options["target"]:
+            overrides["THROTTLING"] = {**settings.THROTTLING, "ENABLED": False}
+            overrides["ALLOWED_HOSTS"] = in_process_hosts()
+        if options["fast_hashing"]:
+            overrides["PASSWORD_HASHERS"] = FAST_HASHERS
+        with override_settings(**overrides):
+            get_token_bucket.cache_clear()
+            try:
+                results = self.run(options)
+            finally:
+                get_token_bucket.cache_clear()
+
+        self.report(results, options["baseline_path"])
+        if options["json_path"]:
+            with open(options["json_path"], "w") as f:
+                json.dump(results, f, indent=2)
+
+        errors = sum(step["errors"] for step in results["steps"].values())
+        if errors:
+            raise CommandError(
+                f"{errors} requests returned an unexpected status; "
+                "the latencies only cover the others."
+            )
+
+    def run(self, options) -> dict:
+        target = options["target"]
+        run_id = f"benchmark-{uuid.uuid4().hex[:8]}"
+        counter = QueryCounter()
+
+        def make_client():
+            return RemoteClient(target) if target else InProcessClient(counter)
+
+        def worker(index: int) -> Dict[str, list]:
+            samples = defaultdict(list)
+            client = make_client()
+            try:
+                for iteration in range(options["iterations"]):
+                    self.run_flow(
+                        client,
+                        f"{run_id}-{index}-{iteration}",
+                        samples
+                    )
+            finally:
+                client.close()
+            return samples
+
+        try:
+            warm_up = make_client()
+            self.run_flow(warm_up, f"{run_id}-warmup", defaultdict(list))
+            warm_up.close()
+
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options["clients"]) as executor:
+                per_client = list(executor.map(worker, range(options["clients"])))
+            elapsed = time.perf_counter() - start
+        finally:
+            CustomUsers.objects.filter(username__startswith=run_id).delete()
+
+        steps = {}
+        for step, _, _, expected in FLOW:
+            samples = [s for client in per_client for s in client[step]]
+            # Failed requests are counted, but kept out of the latencies
+            # and queries: an early 4xx/5xx is not the cost of the step.
+            passed = [s for s in samples if s[1] == expected]
+            queries = [q for _, _, q in passed if q is not None]
+            steps[step] = {
+                "requests": len(samples),
+                "errors": len(samples) - len(passed),
+                **summarize_latencies([seconds for seconds, _, _ in passed]),
+                "queries": sum(queries) / len(queries) if queries else None,
+            }
+
+        requests_sent = sum(step["requests"] for step in steps.values())
+        return {
+            "environment": environment(),
+            "options": {
+                "mode": target or "in-process",
+                "clients": options["clients"],
+                "iterations": options["iterations"],
+                "fast_hashing": options["fast_hashing"],
+            },
+            "throughput": {
+                "seconds": elapsed,
+                "requests": requests_sent,
+                "rps": requests_sent / elapsed,
+                "flows_per_second": (
+                    options["clients"] * options["iterations"] / elapsed
+                ),
+            },
+            "steps": steps,
+        }
+
+    @staticmethod
+    def run_flow(client, name: str, samples: Dict[str, list]) -> None:
+        email = f"{name}@example.com"
+        password = f"{name}-password"
+        payloads: Dict[str, Callable[[], dict]] = {
+            "register": lambda: {"json_data": {
+                "email": email, "username": name, "password": password
+            }},
+            "login": lambda: {"json_data": {
+                "email": email, "password": password
+            }},
+            "users_put": lambda: {"form_data": {"first_name": name[-30:]}},
+        }
+        for step, method, url, _ in FLOW:
+            kwargs = payloads[step]() if step in payloads else {}
+            start = time.perf_counter()
+            status_code, queries = client.send(method, url, **kwargs)
+            samples[step].append(
+                (time.perf_counter() - start, status_code, queries)
+            )
+
+    def report(self, results: dict, baseline_path: Optional[str]) -> None:
+        env = results["environment"]
+        self.stdout.write(
+            f"revision {env['revision']}  database {env['database']}  "
+            f"hasher {env['password_hasher']}  mode {results['options']['mode']}"
+        )
+        self.stdout.write(
+            f"{'step':<12}{'requests':>9}{'errors':>8}"
+            f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'queries':>9}"
+        )
+        for step, result in results["steps"].items():
+            queries = result["queries"]
+            self.stdout.write(
+                f"{step:<12}{result['requests']:>9}{result['errors']:>8}"
+                f"{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}"
+                f"{result['p99_ms']:>10.2f}"
+                f"{'-' if queries is None else f'{queries:.1f}':>9}"
+            )
+        throughput = results["throughput"]
+        self.stdout.write(
+            f"throughput {throughput['rps']:.1f} req/s, "
+            f"{throughput['flows_per_second']:.1f} flows/s "
+            f"({throughput['requests']} requests in "
+            f"{throughput['seconds']:.2f} s)"
+        )
+
+        if baseline_path:
+            with open(baseline_path) as f:
+                baseline = json.load(f)
+            self.stdout.write(
+                f"compared with {baseline_path} "
+                f"(revision {baseline['environment']['revision']}):"
+            )
+            for line in compare(results["steps"], baseline["steps"], COMPARED_KEYS):
+                self.stdout.write(f"  {line}")
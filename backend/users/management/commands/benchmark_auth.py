@@ -0,0 +1,177 @@
+import json
+import time
+from statistics import mean
+
+from django.contrib.auth import authenticate
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from users.authentication import CookieJWTAuthentication
+from users.management.benchmarks import (
+    environment,
+    summarize_latencies,
+    in_process_hosts,
+)
+from users.models import CustomUsers
+from users.serializers import RefreshSerializer, UserSerializer
+from users.tokens import UserRefreshToken
+
+
+BENCH_EMAIL = "benchmark@example.com"
+BENCH_PASSWORD = "benchmark-password"
+
+
+class BenchmarkContext:
+    """What the scenarios run against: the benchmark user and its tokens."""
+    def __init__(self, user, iterations: int) -> None:
+        self.user = user
+        self.access_token = str(UserRefreshToken.for_user(user).access_token)
+        self.client = Client()
+        self.client.cookies["access_token"] = self.access_token
+        self.request = RequestFactory().get("/api/auth/v1/users/")
+        self.request.COOKIES["access_token"] = self.access_token
+        # Refresh tokens are single use, so every call gets its own.
+        self.refresh_tokens = iter([
+            str(UserRefreshToken.for_user(user))
+            for _ in range(iterations + 1)
+        ])
+
+
+def login_success(context):
+    return authenticate(email=BENCH_EMAIL, password=BENCH_PASSWORD)
+
+
+def login_wrong_password(context):
+    return authenticate(email=BENCH_EMAIL, password="wrong-password")
+
+
+def login_unknown_email(context):
+    return authenticate(email="unknown@example.com", password=BENCH_PASSWORD)
+
+
+def verify_endpoint(context):
+    return context.client.get("/api/auth/v1/verify/")
+
+
+def users_endpoint(context):
+    return context.client.get("/api/auth/v1/users/")
+
+
+def cookie_authentication(context):
+    return CookieJWTAuthentication().authenticate(context.request)
+
+
+def refresh_validation(context):
+    serializer = RefreshSerializer(
+        data={"refresh": next(context.refresh_tokens)}
+    )
+    serializer.is_valid(raise_exception=True)
+    return serializer.validated_data
+
+
+def user_serialization(context):
+    return UserSerializer(
+        context.user,
+        context={"request": context.request}
+    ).data
+
+
+SCENARIOS = {
+    "login_success": login_success,
+    "login_wrong_password": login_wrong_password,
+    "login_unknown_email": login_unknown_email,
+    "verify_endpoint": verify_endpoint,
+    "users_endpoint": users_endpoint,
+    "cookie_authentication": cookie_authentication,
+    "refresh_validation": refresh_validation,
+    "user_serialization": user_serialization,
+}
+
+
+class Command(BaseCommand):
+    """
+    Measures the per-call cost of the authentication hot paths.
+
+    Besides logins and endpoint calls, the micro-benchmarks time
+    ``CookieJWTAuthentication.authenticate``, ``RefreshSerializer``
+    validation (a rotation) and ``UserSerializer`` output on their own.
+    Results include the revision and environment, so runs of
+    different commits can be compared. The benchmark user is created
+    inside a transaction that is rolled back at the end, so the command
+    leaves the database untouched.
+    """
+    help = "Runs authentication micro-benchmarks."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "scenarios",
+            nargs="*",
+            help=f"Scenarios to run (default: all): {', '.join(SCENARIOS)}.",
+        )
+        parser.add_argument("--iterations", type=int, default=20)
+        parser.add_argument(
+            "--json",
+            dest="json_path",
+            help="Write the results to this file as JSON.",
+        )
+
+    def handle(self, *args, **options):
+        names = options["scenarios"] or list(SCENARIOS)
+        unknown = set(names) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+        iterations = options["iterations"]
+        results = {}
+
+        with (
+            override_settings(ALLOWED_HOSTS=in_process_hosts()),
+            transaction.atomic()
+        ):
+            user = CustomUsers.objects.create_user(
+                email=BENCH_EMAIL,
+                username="benchmark",
+                password=BENCH_PASSWORD
+            )
+            context = BenchmarkContext(user, iterations)
+            for name in names:
+                results[name] = self.run_scenario(
+                    SCENARIOS[name],
+                    context,
+                    iterations
+                )
+                self.stdout.write(
+                    f"{name:<24} cpu {results[name]['cpu_ms']:8.3f} ms  "
+                    f"wall {results[name]['wall_ms']:8.3f} ms  "
+                    f"p99 {results[name]['p99_ms']:8.3f} ms  "
+                    f"queries {results[name]['queries']:.1f}"
+                )
+            transaction.set_rollback(True)
+
+        if options["json_path"]:
+            with open(options["json_path"], "w") as f:
+                json.dump(
+                    {"environment": environment(), **results},
+                    f,
+                    indent=2
+                )
+
+    def run_scenario(self, func, context, iterations: int) -> dict:
+        func(context)  # warm up
+        cpu, wall, queries = [], [], []
+        for _ in range(iterations):
+            with CaptureQueriesContext(connection) as ctx:
+                cpu_start = time.process_time()
+                wall_start = time.perf_counter()
+                func(context)
+                wall.append(time.perf_counter() - wall_start)
+                cpu.append(time.process_time() - cpu_start)
+            queries.append(len(ctx))
+        return {
+            "iterations": iterations,
+            "cpu_ms": mean(cpu) * 1000,
+            "wall_ms": mean(wall) * 1000,
+            **summarize_latencies(wall),
+            "queries": mean(queries),
+        }
@@ -0,0 +1,209 @@
+import json
+import os
+import resource
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from users.bulk import (
+    EXPORT_FIELDS,
+    RecordWriter,
+    UserImporter,
+    hash_raw_password,
+    iter_user_rows,
+    read_records,
+)
+from users.management.benchmarks import environment
+from users.models import CustomUsers
+
+
+def peak_memory_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Command(BaseCommand):
+    """
+    Benchmarks ``import_users`` and ``export_users`` on synthetic users.
+
+    Writes ``--users`` synthetic records (one million by default) to a
+    temporary JSON Lines file, imports them, exports them to CSV and
+    compares keyset pagination with OFFSET pagination at the end of the
+    table. The records carry a pre-computed password hash, since hashing
+    a million passwords with PBKDF2 takes days of CPU time; the cost of
+    raw passwords is measured separately on ``--hash-sample`` passwords,
+    hashed serially and on the process pool. Peak memory is reported to
+    show that it does not grow with the number of users.
+
+    Everything runs in a transaction that is rolled back at the end.
+    """
+    help = "Benchmarks the bulk user import and export."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1_000_000)
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+        parser.add_argument("--hash-sample", type=int, default=32)
+        parser.add_argument(
+            "--json",
+            dest="json_path",
+            help="Write the results to this file as JSON.",
+        )
+
+    def handle(self, *args, **options):
+        if options["users"] < 1:
+            raise CommandError("--users must be positive.")
+        if settings.DEBUG:
+            self.stderr.write(
+                "DEBUG is on: Django keeps the last 9000 queries, which "
+                "inflates the peak memory."
+            )
+        results = {"environment": environment(), "users": options["users"]}
+
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, "users.jsonl")
+            start = time.perf_counter()
+            self.generate(source, options["users"])
+            results["generate_seconds"] = time.perf_counter() - start
+
+            with ProcessPoolExecutor(
+                max(1, options["workers"]),
+                initializer=django.setup
+            ) as executor:
+                results["hashing"] = self.measure_hashing(
+                    executor,
+                    options["hash_sample"],
+                    options["users"]
+                )
+                with transaction.atomic():
+                    results["import"] = self.measure_import(
+                        source,
+                        executor,
+                        options["batch_size"]
+                    )
+                    results["export"] = self.measure_export(
+                        os.path.join(directory, "users.csv"),
+                        options["batch_size"]
+                    )
+                    results["pagination"] = self.measure_pagination(
+                        options["batch_size"]
+                    )
+                    transaction.set_rollback(True)
+
+        self.report(results)
+        if options["json_path"]:
+            with open(options["json_path"], "w") as f:
+                json.dump(results, f, indent=2)
+
+    @staticmethod
+    def generate(path: str, users: int) -> None:
+        password_hash = make_password("benchmark-password")
+        with open(path, "w") as f:
+            for i in range(users):
+                f.write(json.dumps({
+                    "email": f"bulk-{i}@example.com",
+                    "username": f"bulk-{i}",
+                    "first_name": "Bulk",
+                    "last_name": str(i),
+                    "password_hash": password_hash,
+                }) + "\n")
+
+    @staticmethod
+    def measure_hashing(executor, sample: int, users: int) -> dict:
+        passwords = [f"password-{i}" for i in range(sample)]
+        start = time.perf_counter()
+        for password in passwords:
+            hash_raw_password(password, "default")
+        serial = sample / (time.perf_counter() - start)
+
+        list(executor.map(hash_raw_password, passwords[:1], ["default"]))
+        start = time.perf_counter()
+        list(executor.map(hash_raw_password, passwords, ["default"] * sample))
+        pooled = sample / (time.perf_counter() - start)
+        return {
+            "serial_per_second": serial,
+            "pool_per_second": pooled,
+            "pool_hours_for_all_users": users / pooled / 3600,
+        }
+
+    @staticmethod
+    def measure_import(path: str, executor, batch_size: int) -> dict:
+        importer = UserImporter(executor=executor, batch_size=batch_size)
+        start = time.perf_counter()
+        with open(path) as f:
+            result = importer.run(read_records(f, "jsonl"))
+        elapsed = time.perf_counter() - start
+        return {
+            **result.as_dict(),
+            "seconds": elapsed,
+            "per_second": result.read / elapsed,
+            "peak_memory_mb": peak_memory_mb(),
+        }
+
+    @staticmethod
+    def measure_export(path: str, batch_size: int) -> dict:
+        start = time.perf_counter()
+        count = 0
+        with open(path, "w", newline="") as f:
+            writer = RecordWriter(f, "csv", EXPORT_FIELDS)
+            for record in iter_user_rows(batch_size=batch_size):
+                writer.write(record)
+                count += 1
+        elapsed = time.perf_counter() - start
+        return {
+            "exported": count,
+            "seconds": elapsed,
+            "per_second": count / elapsed,
+            "peak_memory_mb": peak_memory_mb(),
+        }
+
+    @staticmethod
+    def measure_pagination(batch_size: int) -> dict:
+        """Times fetching the last page by OFFSET and by primary key."""
+        queryset = CustomUsers.objects.order_by("pk").values_list("pk", "email")
+        total = queryset.count()
+        offset = max(0, total - batch_size)
+
+        start = time.perf_counter()
+        page = list(queryset[offset:offset + batch_size])
+        offset_ms = (time.perf_counter() - start) * 1000
+
+        # The export knows where the previous page ended.
+        start = time.perf_counter()
+        list(queryset.filter(pk__gte=page[0][0])[:batch_size])
+        keyset_ms = (time.perf_counter() - start) * 1000
+        return {"last_page_offset_ms": offset_ms, "last_page_keyset_ms": keyset_ms}
+
+    def report(self, results: dict) -> None:
+        imported, exported = results["import"], results["export"]
+        hashing, pagination = results["hashing"], results["pagination"]
+        self.stdout.write(
+            f"database {results['environment']['database']}, "
+            f"{results['users']} users"
+        )
+        self.stdout.write(
+            f"import   {imported['seconds']:8.1f} s  "
+            f"{imported['per_second']:9.0f} users/s  "
+            f"created {imported['created']}  "
+            f"peak memory {imported['peak_memory_mb']:.0f} MB"
+        )
+        self.stdout.write(
+            f"export   {exported['seconds']:8.1f} s  "
+            f"{exported['per_second']:9.0f} users/s  "
+            f"peak memory {exported['peak_memory_mb']:.0f} MB"
+        )
+        self.stdout.write(
+            f"last page  OFFSET {pagination['last_page_offset_ms']:.1f} ms, "
+            f"keyset {pagination['last_page_keyset_ms']:.1f} ms"
+        )
+        self.stdout.write(
+            f"raw password hashing  serial {hashing['serial_per_second']:.1f}/s, "
+            f"pool {hashing['pool_per_second']:.1f}/s "
+            f"({hashing['pool_hours_for_all_users']:.1f} h for all users)"
+        )
@@ -0,0 +1,308 @@
+import asyncio
+import json
+import multiprocessing
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncClient, Client, override_settings
+
+from users.management.benchmarks import FAST_HASHERS, describe_database
+from users.models import CustomUsers
+from users.throttling import get_token_bucket
+from users.tokens import UserRefreshToken
+
+
+SYNC_URL = "/api/auth/v1/users/"
+ASYNC_URL = "/api/auth/v1/async/users/"
+REFRESH_URL = "/api/auth/v1/refresh/"
+LOGIN_URL = "/api/auth/v1/login/"
+REGISTER_URL = "/api/auth/v1/register/"
+
+
+def fire_refreshes(
+    refresh_token: str,
+    clients: int,
+    start=None
+) -> List[Tuple[int, Optional[str]]]:
+    """
+    Sends ``clients`` simultaneous refreshes of one token from threads.
+
+    ``start`` is called by one thread once all of them are ready, e.g.
+    to wait for the other processes of the stampede.
+    """
+    barrier = threading.Barrier(clients, action=start)
+
+    def refresh(_):
+        client = Client()
+        client.cookies["refresh_token"] = refresh_token
+        barrier.wait()
+        response = client.post(REFRESH_URL)
+        cookie = response.cookies.get("refresh_token")
+        return response.status_code, cookie.value if cookie else None
+
+    try:
+        with ThreadPoolExecutor(max_workers=clients) as executor:
+            return list(executor.map(refresh, range(clients)))
+    finally:
+        connections.close_all()
+
+
+def fire_refreshes_in_process(
+    refresh_token: str,
+    clients: int,
+    process_barrier,
+    overrides: dict
+) -> List[Tuple[int, Optional[str]]]:
+    """Runs ``fire_refreshes`` in a worker process of the stampede."""
+    with override_settings(**overrides):
+        get_token_bucket.cache_clear()
+        return fire_refreshes(refresh_token, clients, process_barrier.wait)
+
+
+class Command(BaseCommand):
+    """
+    Load tests the auth endpoints under concurrent clients.
+
+    The ``users`` scenario compares throughput of the sync and async
+    user endpoints. The ``refresh`` scenario fires ``--clients`` parallel
+    refreshes of the same refresh token, like a multi-tab stampede, and
+    reports how many distinct token pairs were minted. With
+    ``--processes`` the refreshes are spread over several processes,
+    like requests landing on different server workers, which only
+    coalesce through a shared ``GRACE_CACHE_ALIAS``. The ``login`` and
+    ``register`` scenarios send concurrent logins (a read plus a refresh
+    token insert) and registrations (an insert each), which shows how the
+    configured database copes with concurrent writers, e.g. SQLite with
+    and without WAL. ``--fast-hashing`` swaps PBKDF2 for MD5 so the
+    database rather than the password hasher is the bottleneck.
+    Throttling is disabled for the run.
+
+    Requests go through Django's in-process WSGI and ASGI handlers,
+    so the numbers reflect the framework and view cost without any
+    network or server overhead. A temporary user is created for the
+    run and deleted afterwards.
+    """
+    help = "Load tests the auth endpoints under concurrent clients."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scenario",
+            choices=["users", "refresh", "login", "register"],
+            default="users",
+        )
+        parser.add_argument(
+            "--fast-hashing",
+            action="store_true",
+            help="Hash passwords with MD5 to isolate the database cost.",
+        )
+        parser.add_argument("--clients", type=int, default=20)
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=1,
+            help="Processes sharing the clients (refresh scenario).",
+        )
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument(
+            "--json",
+            dest="json_path",
+            help="Write the results to this file as JSON.",
+        )
+
+    def handle(self, *args, **options):
+        if not 1 <= options["processes"] <= options["clients"]:
+            raise CommandError("--processes must be between 1 and --clients.")
+        overrides = {"THROTTLING": {**settings.THROTTLING, "ENABLED": False}}
+        if options["fast_hashing"]:
+            overrides["PASSWORD_HASHERS"] = FAST_HASHERS
+        with override_settings(**overrides):
+            get_token_bucket.cache_clear()
+            try:
+                self.run(options, overrides)
+            finally:
+                get_token_bucket.cache_clear()
+
+    def run(self, options, overrides: dict):
+        clients = options["clients"]
+        total = options["requests"]
+        run_id = f"benchmark-{uuid.uuid4().hex[:8]}"
+        password = uuid.uuid4().hex
+
+        user = CustomUsers.objects.create_user(
+            email=f"{run_id}@example.com",
+            username=run_id,
+            password=password
+        )
+        refresh = UserRefreshToken.for_user(user)
+        access_token = str(refresh.access_token)
+
+        try:
+            if options["scenario"] == "refresh":
+                results = {
+                    "refresh": self.run_refresh_stampede(
+                        str(refresh),
+                        clients,
+                        options["processes"],
+                        overrides
+                    )
+                }
+            elif options["scenario"] == "login":
+                results = {
+                    "login": self.run_wsgi_posts(
+                        LOGIN_URL,
+                        lambda i: {"email": user.email, "password": password},
+                        clients,
+                        total
+                    )
+                }
+            elif options["scenario"] == "register":
+                results = {
+                    "register": self.run_wsgi_posts(
+                        REGISTER_URL,
+                        lambda i: {
+                            "email": f"{run_id}-{i}@example.com",
+                            "username": f"{run_id}-{i}",
+                            "password": password,
+                        },
+                        clients,
+                        total
+                    )
+                }
+            else:
+                results = {
+                    "wsgi_sync": self.run_wsgi(access_token, clients, total),
+                    "asgi_sync": asyncio.run(
+                        self.run_asgi(SYNC_URL, access_token, clients, total)
+                    ),
+                    "asgi_async": asyncio.run(
+                        self.run_asgi(ASYNC_URL, access_token, clients, total)
+                    ),
+                }
+        finally:
+            CustomUsers.objects.filter(username__startswith=run_id).delete()
+
+        self.stdout.write(f"database     {describe_database()}")
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<12} {result['rps']:10.1f} req/s  "
+                f"errors {result['errors']}"
+                + (f"  distinct pairs {result['distinct_pairs']}"
+                   if "distinct_pairs" in result else "")
+            )
+
+        if options["json_path"]:
+            with open(options["json_path"], "w") as f:
+                json.dump(
+                    {"clients": clients, "requests": total,
+                     "database": describe_database(), **results},
+                    f,
+                    indent=2
+                )
+
+    def run_wsgi(self, access_token: str, clients: int, total: int) -> dict:
+        def fetch(_) -> int:
+            client = Client()
+            client.cookies["access_token"] = access_token
+            return client.get(SYNC_URL).status_code
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as executor:
+            statuses = list(executor.map(fetch, range(total)))
+        elapsed = time.perf_counter() - start
+        return self.summarize(statuses, elapsed)
+
+    def run_wsgi_posts(self, url: str, payload, clients: int, total: int) -> dict:
+        def post(i: int) -> int:
+            return Client().post(
+                url,
+                payload(i),
+                content_type="application/json"
+            ).status_code
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as executor:
+            statuses = list(executor.map(post, range(total)))
+        elapsed = time.perf_counter() - start
+        return self.summarize(statuses, elapsed, ok=(200, 201))
+
+    async def run_asgi(
+        self,
+        url: str,
+        access_token: str,
+        clients: int,
+        total: int
+    ) -> dict:
+        semaphore = asyncio.Semaphore(clients)
+
+        async def fetch() -> int:
+            async with semaphore:
+                client = AsyncClient()
+                client.cookies["access_token"] = access_token
+                return (await client.get(url)).status_code
+
+        start = time.perf_counter()
+        statuses = await asyncio.gather(*(fetch() for _ in range(total)))
+        elapsed = time.perf_counter() - start
+        return self.summarize(statuses, elapsed)
+
+    def run_refresh_stampede(
+        self,
+        refresh_token: str,
+        clients: int,
+        processes: int,
+        overrides: dict
+    ) -> dict:
+        start = time.perf_counter()
+        if processes == 1:
+            responses = fire_refreshes(refresh_token, clients)
+        else:
+            # Forked workers must not share the parent's connections.
+            connections.close_all()
+            shares = [
+                clients // processes + (i < clients % processes)
+                for i in range(processes)
+            ]
+            with multiprocessing.Manager() as manager:
+                barrier = manager.Barrier(processes)
+                with ProcessPoolExecutor(
+                    processes,
+                    initializer=django.setup
+                ) as executor:
+                    futures = [
+                        executor.submit(
+                            fire_refreshes_in_process,
+                            refresh_token,
+                            share,
+                            barrier,
+                            overrides
+                        )
+                        for share in shares
+                    ]
+                    responses = [
+                        response
+                        for future in futures
+                        for response in future.result()
+                    ]
+        elapsed = time.perf_counter() - start
+
+        result = self.summarize([code for code, _ in responses], elapsed)
+        result["processes"] = processes
+        result["distinct_pairs"] = len(
+            {token for _, token in responses if token}
+        )
+        return result
+
+    @staticmethod
+    def summarize(statuses, elapsed: float, ok=(200,)) -> dict:
+        return {
+            "seconds": elapsed,
+            "rps": len(statuses) / elapsed,
+            "errors": sum(1 for code in statuses if code not in ok),
+        }
@@ -0,0 +1,167 @@
+import json
+import time
+from io import BytesIO
+from statistics import median
+from typing import Callable, Dict, Optional, Tuple
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from users.avatars import get_avatar_processor
+from users.management.benchmarks import compare, environment
+from users.models import CustomUsers
+from users.parsers import FastJSONParser
+from users.renderers import FastJSONRenderer, orjson
+from users.serializers import UserSerializer
+from users.views import LOGIN_SUCCESS
+
+COMPARED_KEYS = ["best_us", "median_us"]
+LOGIN_BODY = json.dumps({
+    "email": "benchmark@example.com",
+    "password": "benchmark-password",
+}).encode()
+
+
+def encoder_name() -> str:
+    return f"orjson {orjson.__version__}" if orjson is not None else "json"
+
+
+def user_payload() -> dict:
+    """``UserSerializer`` output of a user with an avatar, as views render it."""
+    user = CustomUsers(
+        id=123456,
+        email="benchmark@example.com",
+        username="benchmark",
+        first_name="Benchmark",
+        last_name="User",
+    )
+    user.avatar.name = get_avatar_processor().default_name("0" * 64)
+    request = RequestFactory().get("/api/auth/v1/users/")
+    return UserSerializer(user, context={"request": request}).data
+
+
+def build_cases() -> Dict[str, Tuple[str, Callable[[], object]]]:
+    """Maps every case to its baseline case and the call to time."""
+    drf, fast = JSONRenderer(), FastJSONRenderer()
+    drf_parser, fast_parser = JSONParser(), FastJSONParser()
+    user = user_payload()
+    success = dict(LOGIN_SUCCESS)
+    return {
+        "user_drf": ("user_drf", lambda: drf.render(user)),
+        "user_fast": ("user_drf", lambda: fast.render(user)),
+        "success_drf": ("success_drf", lambda: drf.render(success)),
+        "success_fast": ("success_drf", lambda: fast.render(success)),
+        "success_preencoded": (
+            "success_drf",
+            lambda: fast.render(LOGIN_SUCCESS)
+        ),
+        "login_body_drf": (
+            "login_body_drf",
+            lambda: drf_parser.parse(BytesIO(LOGIN_BODY))
+        ),
+        "login_body_fast": (
+            "login_body_drf",
+            lambda: fast_parser.parse(BytesIO(LOGIN_BODY))
+        ),
+    }
+
+
+class Command(BaseCommand):
+    """
+    Measures the per-response cost of encoding and decoding JSON.
+
+    Compares DRF's ``JSONRenderer``/``JSONParser`` with
+    ``FastJSONRenderer``/``FastJSONParser`` on ``UserSerializer``
+    output, on a fixed success payload (encoded on every call and
+    pre-encoded as ``EncodedJSON``) and on a login request body. Every
+    case runs ``--iterations`` calls ``--repeat`` times; the best and
+    median microseconds per call are reported, with the speedup over
+    DRF's classes. Without orjson installed the fast classes measure
+    the standard library fallback.
+    """
+    help = "Benchmarks JSON rendering and parsing of the auth API."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=20_000)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument(
+            "--json",
+            dest="json_path",
+            help="Write the results to this file as JSON.",
+        )
+        parser.add_argument(
+            "--compare",
+            dest="baseline_path",
+            help="Compare with the results of an earlier --json run.",
+        )
+
+    def handle(self, *args, **options):
+        if options["iterations"] < 1 or options["repeat"] < 1:
+            raise CommandError("--iterations and --repeat must be positive.")
+
+        cases = build_cases()
+        results = {}
+        for name, (_, func) in cases.items():
+            results[name] = self.measure(
+                func,
+                options["iterations"],
+                options["repeat"]
+            )
+        for name, (baseline, _) in cases.items():
+            results[name]["speedup"] = (
+                results[baseline]["best_us"] / results[name]["best_us"]
+            )
+
+        self.report(results, options["baseline_path"])
+        if options["json_path"]:
+            with open(options["json_path"], "w") as f:
+                json.dump(
+                    {
+                        "environment": environment(),
+                        "encoder": encoder_name(),
+                        "cases": results,
+                    },
+                    f,
+                    indent=2
+                )
+
+    @staticmethod
+    def measure(func, iterations: int, repeat: int) -> dict:
+        output = func()  # warm up
+        runs = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(iterations):
+                func()
+            runs.append((time.perf_counter() - start) / iterations * 1e6)
+        result = {"best_us": min(runs), "median_us": median(runs)}
+        if isinstance(output, bytes):
+            result["bytes"] = len(output)
+        return result
+
+    def report(self, results: dict, baseline_path: Optional[str]) -> None:
+        self.stdout.write(f"encoder {encoder_name()}")
+        self.stdout.write(
+            f"{'case':<20}{'best us':>10}{'median us':>11}"
+            f"{'speedup':>9}{'bytes':>8}"
+        )
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<20}{result['best_us']:>10.2f}"
+                f"{result['median_us']:>11.2f}"
+                f"{result['speedup']:>8.1f}x"
+                f"{result.get('bytes', '-'):>8}"
+            )
+
+        if baseline_path:
+            with open(baseline_path) as f:
+                baseline = json.load(f)
+            self.stdout.write(
+                f"compared with {baseline_path} "
+                f"(revision {baseline['environment']['revision']}, "
+                f"encoder {baseline['encoder']}):"
+            )
+            for line in compare(results, baseline["cases"], COMPARED_KEYS):
+                self.stdout.write(f"  {line}")
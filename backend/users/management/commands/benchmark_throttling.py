@@ -0,0 +1,163 @@
+import json
+import logging
+import time
+import uuid
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import Client, override_settings
+
+from users.models import CustomUsers
+from users.throttling import TokenBucket, get_token_bucket
+
+
+LOGIN_URL = "/api/auth/v1/login/"
+BENCH_EMAIL = "benchmark@example.com"
+BENCH_PASSWORD = "benchmark-password"
+
+
+def one_ip(i: int) -> tuple:
+    """Password spraying: one address tries many accounts."""
+    return "203.0.113.1", f"victim-{i}@example.com"
+
+
+def one_email(i: int) -> tuple:
+    """Distributed guessing: many addresses try one account."""
+    return f"198.51.{i // 250 % 250}.{i % 250 + 1}", BENCH_EMAIL
+
+
+def legitimate(i: int) -> tuple:
+    """One attempt per address and account, which is never throttled."""
+    address = f"10.{i // 62500 % 250}.{i // 250 % 250}.{i % 250 + 1}"
+    return address, f"user-{i}@example.com"
+
+
+ATTACKS = {
+    "one_ip": one_ip,
+    "one_email": one_email,
+    "legitimate": legitimate,
+}
+
+
+class Command(BaseCommand):
+    """
+    Measures how much password hashing the login throttles shed.
+
+    Every pattern sends ``--attempts`` failed logins, once with
+    throttling enabled and once with it disabled. Each attempt that is
+    not throttled costs one password hash (unknown emails are hashed
+    against a dummy password too), so ``hashed`` is the work an attacker
+    gets out of the server. ``legitimate`` traffic is never throttled
+    and shows the overhead of the buckets themselves, which is also
+    measured directly as the cost of one in-process bucket check.
+
+    The benchmark user is created inside a transaction that is rolled
+    back at the end, so the command leaves the database untouched.
+    """
+    help = "Measures the password hashing shed by the login throttles."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "attacks",
+            nargs="*",
+            help=f"Traffic patterns to run (default: all): {', '.join(ATTACKS)}.",
+        )
+        parser.add_argument("--attempts", type=int, default=100)
+        parser.add_argument(
+            "--json",
+            dest="json_path",
+            help="Write the results to this file as JSON.",
+        )
+
+    def handle(self, *args, **options):
+        names = options["attacks"] or list(ATTACKS)
+        unknown = set(names) - set(ATTACKS)
+        if unknown:
+            raise CommandError(f"Unknown attacks: {', '.join(sorted(unknown))}")
+        attempts = options["attempts"]
+        results = {}
+
+        with transaction.atomic():
+            CustomUsers.objects.create_user(
+                email=BENCH_EMAIL,
+                username="benchmark",
+                password=BENCH_PASSWORD
+            )
+            for name in names:
+                results[name] = {}
+                for enabled in (True, False):
+                    mode = "throttled" if enabled else "unthrottled"
+                    result = self.run_attack(ATTACKS[name], attempts, enabled)
+                    results[name][mode] = result
+                    self.stdout.write(
+                        f"{name:<12} {mode:<12} "
+                        f"hashed {result['hashed']:5d}  "
+                        f"shed {result['throttled']:5d}  "
+                        f"cpu {result['cpu_seconds']:8.3f} s  "
+                        f"wall {result['wall_seconds']:8.3f} s"
+                    )
+            transaction.set_rollback(True)
+
+        check_us = self.time_bucket_check()
+        self.stdout.write(f"bucket check {check_us:8.3f} us")
+
+        if options["json_path"]:
+            with open(options["json_path"], "w") as f:
+                json.dump(
+                    {"attempts": attempts, "bucket_check_us": check_us,
+                     **results},
+                    f,
+                    indent=2
+                )
+
+    def run_attack(self, attack, attempts: int, enabled: bool) -> dict:
+        config = {**settings.THROTTLING, "ENABLED": enabled}
+        # Every failed login is logged as a warning otherwise.
+        request_logger = logging.getLogger("django.request")
+        level = request_logger.level
+        request_logger.setLevel(logging.ERROR)
+        try:
+            return self._run_attack(attack, attempts, config)
+        finally:
+            request_logger.setLevel(level)
+            get_token_bucket.cache_clear()
+
+    def _run_attack(self, attack, attempts: int, config: dict) -> dict:
+        with override_settings(THROTTLING=config):
+            get_token_bucket.cache_clear()
+            client = Client()
+            statuses = []
+            cpu_start = time.process_time()
+            wall_start = time.perf_counter()
+            for i in range(attempts):
+                address, email = attack(i)
+                response = client.post(
+                    LOGIN_URL,
+                    {"email": email, "password": uuid.uuid4().hex},
+                    content_type="application/json",
+                    REMOTE_ADDR=address,
+                )
+                statuses.append(response.status_code)
+            wall = time.perf_counter() - wall_start
+            cpu = time.process_time() - cpu_start
+
+        throttled = statuses.count(429)
+        return {
+            "attempts": attempts,
+            "throttled": throttled,
+            "hashed": attempts - throttled,
+            "cpu_seconds": cpu,
+            "wall_seconds": wall,
+            "cpu_ms_per_attempt": cpu * 1000 / attempts,
+        }
+
+    @staticmethod
+    def time_bucket_check(keys: int = 100_000) -> float:
+        """Returns the cost of one in-process bucket check in microseconds."""
+        bucket = TokenBucket("benchmark", "30/min", 10, max_keys=keys // 2)
+        names = [f"203.0.{i // 250 % 250}.{i % 250}" for i in range(keys)]
+        start = time.perf_counter()
+        for name in names:
+            bucket.consume(name)
+        return (time.perf_counter() - start) / keys * 1_000_000
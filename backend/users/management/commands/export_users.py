@@ -0,0 +1,63 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from users.bulk import (
+    EXPORT_FIELDS,
+    FORMATS,
+    RecordWriter,
+    detect_format,
+    iter_user_rows,
+)
+
+
+class Command(BaseCommand):
+    """
+    Exports all users to a CSV or JSON Lines file (``-`` for stdout).
+
+    Users are read page by page in primary key order, so the export runs
+    in constant memory and at a constant cost per page on any table
+    size. ``--with-password-hashes`` adds the encoded password hashes,
+    which ``import_users`` accepts to move accounts between databases.
+    """
+    help = "Exports users to CSV or JSON Lines in constant memory."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to write, or - for stdout.")
+        parser.add_argument("--format", dest="file_format", choices=FORMATS)
+        parser.add_argument("--batch-size", type=int, default=2000)
+        parser.add_argument(
+            "--with-password-hashes",
+            action="store_true",
+            help="Include the password hashes (handle the file as a secret).",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        if path == "-" and not options["file_format"]:
+            raise CommandError("Pass --format when writing to stdout.")
+        try:
+            file_format = detect_format(path, options["file_format"])
+        except ValueError as e:
+            raise CommandError(e)
+
+        fields = list(EXPORT_FIELDS)
+        if options["with_password_hashes"]:
+            fields.append("password_hash")
+
+        target = sys.stdout if path == "-" else open(path, "w", newline="")
+        try:
+            writer = RecordWriter(target, file_format, fields)
+            count = 0
+            for record in iter_user_rows(
+                batch_size=options["batch_size"],
+                with_password_hashes=options["with_password_hashes"]
+            ):
+                writer.write(record)
+                count += 1
+        finally:
+            if target is not sys.stdout:
+                target.close()
+
+        if path != "-":
+            self.stdout.write(f"Exported {count} users to {path}.")
@@ -0,0 +1,52 @@
+from datetime import date
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519, rsa
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    """
+    Generates a private key for asymmetric token signing.
+
+    The key is written to ``JWT_KEYS["KEYS_DIR"]/<kid>.pem``. To rotate,
+    generate a new key, point JWT_ACTIVE_KID at it and delete the old
+    file once the refresh token lifetime has passed.
+    """
+    help = "Generates a kid-tagged JWT signing key."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--algorithm",
+            choices=["RS256", "EdDSA"],
+            default="RS256",
+        )
+        parser.add_argument(
+            "--kid",
+            default=date.today().isoformat(),
+            help="Key id (default: today's date).",
+        )
+
+    def handle(self, *args, **options):
+        keys_dir = settings.JWT_KEYS["KEYS_DIR"]
+        path = keys_dir / f"{options['kid']}.pem"
+        if path.exists():
+            raise CommandError(f"{path} already exists")
+
+        if options["algorithm"] == "EdDSA":
+            private_key = ed25519.Ed25519PrivateKey.generate()
+        else:
+            private_key = rsa.generate_private_key(
+                public_exponent=65537,
+                key_size=2048
+            )
+
+        keys_dir.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(private_key.private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption(),
+        ))
+        path.chmod(0o600)
+        self.stdout.write(f"Wrote {path}")
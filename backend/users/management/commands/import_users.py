@@ -0,0 +1,130 @@
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.contrib.auth.hashers import get_hashers_by_algorithm
+from django.core.management.base import BaseCommand, CommandError
+
+from users.bulk import (
+    FORMATS,
+    PASSWORD_FIELDS,
+    RecordWriter,
+    UserImporter,
+    detect_format,
+    read_records,
+)
+
+
+class Command(BaseCommand):
+    """
+    Imports users from a CSV or JSON Lines file (``-`` for stdin).
+
+    Records are streamed and inserted in batches with ``bulk_create``, so
+    memory use does not grow with the file. Raw passwords are hashed on a
+    pool of ``--workers`` processes while the previous batch is inserted.
+    Records with an invalid value or an email/username that is already
+    taken are skipped and, with ``--rejects``, written to a file of the
+    same format with the reason in an ``error`` column, without their
+    ``password`` and ``password_hash``. See
+    ``users.bulk.UserImporter`` for the accepted columns.
+    """
+    help = "Imports users from CSV or JSON Lines in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="File to read, or - for stdin.")
+        parser.add_argument("--format", dest="file_format", choices=FORMATS)
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=os.cpu_count() or 1,
+            help="Processes hashing raw passwords (0 hashes inline).",
+        )
+        parser.add_argument(
+            "--hasher",
+            default="default",
+            help="Algorithm of PASSWORD_HASHERS to hash raw passwords with.",
+        )
+        parser.add_argument(
+            "--rejects",
+            help="Write skipped records and the reason to this file.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Validate and check for conflicts without inserting.",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        if path == "-" and not options["file_format"]:
+            raise CommandError("Pass --format when reading from stdin.")
+        try:
+            file_format = detect_format(path, options["file_format"])
+        except ValueError as e:
+            raise CommandError(e)
+        if options["hasher"] != "default" and (
+            options["hasher"] not in get_hashers_by_algorithm()
+        ):
+            raise CommandError(
+                f"Unknown hasher '{options['hasher']}', it must be listed "
+                f"in PASSWORD_HASHERS."
+            )
+
+        source = sys.stdin if path == "-" else open(path, newline="")
+        rejects_file = (
+            open(options["rejects"], "w", newline="")
+            if options["rejects"] else None
+        )
+        executor = (
+            ProcessPoolExecutor(options["workers"], initializer=django.setup)
+            if options["workers"] > 0 else None
+        )
+        try:
+            rejects = None
+            if rejects_file is not None:
+                writer = None
+
+                def rejects(record, reason):
+                    nonlocal writer
+                    record = {
+                        key: value for key, value in record.items()
+                        if key not in PASSWORD_FIELDS
+                    }
+                    if writer is None:
+                        writer = RecordWriter(
+                            rejects_file,
+                            file_format,
+                            [*record, "error"]
+                        )
+                    writer.write({**record, "error": reason})
+
+            importer = UserImporter(
+                executor=executor,
+                batch_size=options["batch_size"],
+                hasher=options["hasher"],
+                dry_run=options["dry_run"],
+                reject=rejects
+            )
+            start = time.perf_counter()
+            try:
+                result = importer.run(read_records(source, file_format))
+            except ValueError as e:
+                raise CommandError(e)
+            elapsed = time.perf_counter() - start
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+            if source is not sys.stdin:
+                source.close()
+            if rejects_file is not None:
+                rejects_file.close()
+
+        self.stdout.write(
+            f"{'Validated' if options['dry_run'] else 'Imported'} "
+            f"{result.created} of {result.read} users in {elapsed:.1f} s "
+            f"({result.read / elapsed if elapsed else 0:.0f} records/s); "
+            f"{result.invalid} invalid, {result.conflicts} conflicts."
+        )
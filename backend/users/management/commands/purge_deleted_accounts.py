@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from users.deletion import AccountDeleter
+
+
+class Command(BaseCommand):
+    """
+    Purges accounts whose deletion was requested but not finished.
+
+    Accounts are normally purged by the background pool right after the
+    request; this drains whatever is left, e.g. after a restart. Meant
+    to run periodically (cron, systemd timer). Related rows are deleted
+    in chunks, so the command can run against a live database.
+    """
+    help = "Purges deactivated accounts that are pending deletion."
+
+    def add_arguments(self, parser):
+        config = getattr(settings, "ACCOUNT_DELETION", {})
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=config.get("BATCH_SIZE", 1000)
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=config.get("PAUSE", 0.0),
+            help="Seconds to sleep between batches.",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            help="Purge at most this many accounts.",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive.")
+        deleter = AccountDeleter(
+            batch_size=options["batch_size"],
+            pause=options["pause"],
+            workers=0
+        )
+        purged = deleter.purge_pending(limit=options["limit"])
+        self.stdout.write(f"Purged {purged} deleted accounts.")
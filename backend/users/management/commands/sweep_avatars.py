@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from users.avatars import get_avatar_processor
+
+
+class Command(BaseCommand):
+    """
+    Deletes avatar files that no user references any more.
+
+    Meant to run periodically (cron, systemd timer). ``MEDIA_ROOT/avatars``
+    is scanned incrementally and checked against the users table in
+    batches, so the command runs in constant memory however many users
+    and files there are.
+    """
+    help = "Deletes unreferenced avatar files in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--min-age",
+            type=float,
+            default=3600,
+            help="Keep files modified less than this many seconds ago.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report how many avatars would be deleted.",
+        )
+
+    def handle(self, *args, **options):
+        deleted = get_avatar_processor().sweep(
+            batch_size=options["batch_size"],
+            min_age=options["min_age"],
+            dry_run=options["dry_run"]
+        )
+        if options["dry_run"]:
+            self.stdout.write(f"Found {deleted} unreferenced avatars.")
+        else:
+            self.stdout.write(f"Deleted {deleted} unreferenced avatars.")
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from users.token_store import get_refresh_token_store
+
+
+class Command(BaseCommand):
+    """
+    Deletes expired refresh token records.
+
+    Meant to run periodically (cron, systemd timer). Rows are deleted in
+    chunks so the command can run against a live database of any size.
+    """
+    help = "Deletes expired refresh token records in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=10_000)
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0.0,
+            help="Seconds to sleep between batches.",
+        )
+
+    def handle(self, *args, **options):
+        deleted = get_refresh_token_store().sweep(
+            batch_size=options["batch_size"],
+            pause=options["pause"]
+        )
+        self.stdout.write(f"Deleted {deleted} expired refresh tokens.")
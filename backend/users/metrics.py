@@ -0,0 +1,271 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+from users.cache import get_token_cache, get_user_cache
+from users.hashing import get_hashing_pool
+
+
+DEFAULT_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar(
+    "request_timings",
+    default=None
+)
+
+
+class PhaseTimer:
+    """Context manager returned by ``timed``."""
+    __slots__ = ("phase", "timings", "start")
+
+    def __init__(self, phase: str) -> None:
+        self.phase = phase
+
+    def __enter__(self) -> None:
+        self.timings = _timings.get()
+        if self.timings is not None:
+            self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info) -> None:
+        timings = self.timings
+        if timings is not None:
+            timings[self.phase] = (
+                timings.get(self.phase, 0.0)
+                + time.perf_counter() - self.start
+            )
+
+
+def timed(phase: str) -> PhaseTimer:
+    """
+    Adds the time spent in the block to ``phase`` of the current request.
+
+    Outside of a request handled by ServerTimingMiddleware (management
+    commands, worker threads) this only costs a context variable lookup.
+    """
+    return PhaseTimer(phase)
+
+
+class Histogram:
+    """
+    Cumulative histogram in the Prometheus exposition format.
+
+    Observing is a bisect over the bucket bounds and a few additions
+    under an uncontended lock, so it can stay enabled in production.
+    Like every in-process metric, the values are per worker process.
+    """
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Tuple[str, ...],
+        buckets: Iterable[float] = DEFAULT_BUCKETS
+    ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Tuple[str, ...], value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [
+                    [0] * (len(self.buckets) + 1), 0.0, 0
+                ]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def expose(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            snapshot = [
+                (labels, list(counts), total, count)
+                for labels, (counts, total, count) in self._series.items()
+            ]
+        for labels, counts, total, count in sorted(snapshot):
+            label_text = ",".join(
+                f'{name}="{value}"'
+                for name, value in zip(self.label_names, labels)
+            )
+            cumulative = 0
+            for bound, bucket_count in zip(
+                [*map(str, self.buckets), "+Inf"],
+                counts
+            ):
+                cumulative += bucket_count
+                yield (
+                    f'{self.name}_bucket{{{label_text},le="{bound}"}} '
+                    f"{cumulative}"
+                )
+            yield f"{self.name}_sum{{{label_text}}} {total}"
+            yield f"{self.name}_count{{{label_text}}} {count}"
+
+
+class AuthMetrics:
+    """Request and phase duration histograms of the auth endpoints."""
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS) -> None:
+        self.request_duration = Histogram(
+            "auth_request_duration_seconds",
+            "Time spent handling requests.",
+            ("endpoint", "method", "status"),
+            buckets,
+        )
+        self.phase_duration = Histogram(
+            "auth_phase_duration_seconds",
+            "Time spent in each phase of a request.",
+            ("endpoint", "phase"),
+            buckets,
+        )
+
+    def observe(
+        self,
+        endpoint: str,
+        method: str,
+        status: int,
+        duration: float,
+        timings: Dict[str, float]
+    ) -> None:
+        self.request_duration.observe(
+            (endpoint, method, str(status // 100) + "xx"),
+            duration
+        )
+        for phase, seconds in timings.items():
+            self.phase_duration.observe((endpoint, phase), seconds)
+
+    def expose(self) -> Iterator[str]:
+        yield from self.request_duration.expose()
+        yield from self.phase_duration.expose()
+
+
+def expose_stats() -> Iterator[str]:
+    """Exposes the counters of the caches and the hashing pool as gauges."""
+    sources = (
+        ("user_cache", get_user_cache()),
+        ("token_cache", get_token_cache()),
+        ("hashing_pool", get_hashing_pool()),
+    )
+    for name, source in sources:
+        if source is None:
+            continue
+        for key, value in source.stats().items():
+            yield f"# TYPE auth_{name}_{key} gauge"
+            yield f"auth_{name}_{key} {value}"
+
+
+@lru_cache(maxsize=None)
+def get_metrics() -> Optional[AuthMetrics]:
+    """
+    Returns the process-wide metrics configured by ``settings.METRICS``,
+    or None when they are disabled.
+    """
+    config = getattr(settings, "METRICS", {})
+    if not config.get("ENABLED", False):
+        return None
+    return AuthMetrics(buckets=config.get("BUCKETS", DEFAULT_BUCKETS))
+
+
+class ServerTimingMiddleware:
+    """
+    Times every request and the phases recorded with ``timed``.
+
+    Phases are ``token_decode``, ``user_fetch``, ``password_check`` and
+    ``token_mint`` from the auth hooks, ``db`` for the time spent in SQL
+    queries (sync requests only, async ones run their queries on other
+    threads) and ``render`` for rendering the response plus the response
+    phase of the inner middleware (cookies, sessions). The timings are
+    added to the histograms served on ``/metrics`` and, with
+    ``METRICS["SERVER_TIMING"]``, sent in a ``Server-Timing`` header.
+
+    Should be the first middleware, so that ``total`` covers the others.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response) -> None:
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        timings: Dict[str, float] = {}
+        token = _timings.set(timings)
+        start = time.perf_counter()
+        try:
+            with self.time_queries(timings):
+                response = self.get_response(request)
+        finally:
+            _timings.reset(token)
+        return self.finish(request, response, timings, start)
+
+    async def __acall__(self, request):
+        timings: Dict[str, float] = {}
+        token = _timings.set(timings)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _timings.reset(token)
+        return self.finish(request, response, timings, start)
+
+    def process_template_response(self, request, response):
+        # Called right before a DRF/template response is rendered.
+        request._render_started = time.perf_counter()
+        return response
+
+    @staticmethod
+    @contextmanager
+    def time_queries(timings: Dict[str, float]):
+        def wrapper(execute, sql, params, many, context):
+            with timed("db"):
+                return execute(sql, params, many, context)
+
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(connections[alias].execute_wrapper(wrapper))
+            yield
+
+    @staticmethod
+    def finish(request, response, timings: Dict[str, float], start: float):
+        end = time.perf_counter()
+        render_started = getattr(request, "_render_started", None)
+        if render_started is not None:
+            timings["render"] = end - render_started
+        duration = end - start
+
+        metrics = get_metrics()
+        if metrics is not None:
+            match = request.resolver_match
+            metrics.observe(
+                match.route if match is not None else "unmatched",
+                request.method,
+                response.status_code,
+                duration,
+                timings
+            )
+
+        if settings.METRICS.get("SERVER_TIMING", False):
+            response["Server-Timing"] = ", ".join(
+                [f"{phase};dur={seconds * 1000:.2f}"
+                 for phase, seconds in timings.items()]
+                + [f"total;dur={duration * 1000:.2f}"]
+            )
+        return response
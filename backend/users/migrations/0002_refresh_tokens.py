@@ -0,0 +1,32 @@
+# Generated by Django 5.1.4 on 2026-10-18 12:16
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RefreshTokenRecord',
+            fields=[
+                ('jti', models.CharField(max_length=64, primary_key=True, serialize=False, verbose_name='JTI')),
+                ('family', models.UUIDField(verbose_name='Family')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Date of creation')),
+                ('expires_at', models.DateTimeField(db_index=True, verbose_name='Expires at')),
+                ('revoked_at', models.DateTimeField(blank=True, null=True, verbose_name='Revoked at')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='refresh_tokens', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Refresh token',
+                'verbose_name_plural': 'Refresh tokens',
+                'db_table': 'refresh_tokens',
+                'indexes': [models.Index(condition=models.Q(('revoked_at__isnull', True)), fields=['family'], name='refresh_tokens_live_family')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 12:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_refresh_tokens'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customusers',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Date of update'),
+        ),
+    ]
@@ -0,0 +1,78 @@
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+CONSTRAINT = models.UniqueConstraint(
+    django.db.models.functions.text.Lower('email'),
+    name='users_email_lower_uniq',
+    violation_error_message='User with this Email already exists.',
+)
+
+
+def check_duplicates(apps, schema_editor):
+    """Refuses to migrate while emails differing only in case exist."""
+    CustomUsers = apps.get_model('users', 'CustomUsers')
+    duplicates = list(
+        CustomUsers.objects.using(schema_editor.connection.alias)
+        .values(email_lower=django.db.models.functions.text.Lower('email'))
+        .annotate(count=models.Count('id'))
+        .filter(count__gt=1)
+        .values_list('email_lower', flat=True)[:20]
+    )
+    if duplicates:
+        raise RuntimeError(
+            'Merge or rename the accounts whose emails differ only in case '
+            f'before migrating: {", ".join(duplicates)}'
+        )
+
+
+def create_index(apps, schema_editor):
+    # On PostgreSQL the index is built without locking the table
+    # against writes, which matters on large user tables.
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS '
+            '"users_email_lower_uniq" ON "users" (LOWER("email"))'
+        )
+    else:
+        schema_editor.add_constraint(
+            apps.get_model('users', 'CustomUsers'),
+            CONSTRAINT
+        )
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'DROP INDEX CONCURRENTLY IF EXISTS "users_email_lower_uniq"'
+        )
+    else:
+        schema_editor.remove_constraint(
+            apps.get_model('users', 'CustomUsers'),
+            CONSTRAINT
+        )
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('users', '0003_users_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicates, migrations.RunPython.noop),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(create_index, drop_index),
+            ],
+            state_operations=[
+                migrations.AddConstraint(
+                    model_name='customusers',
+                    constraint=CONSTRAINT,
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,59 @@
+from django.db import migrations, models
+
+
+INDEX = models.Index(
+    fields=['deletion_requested_at'],
+    condition=models.Q(deletion_requested_at__isnull=False),
+    name='users_pending_deletion',
+)
+
+
+def create_index(apps, schema_editor):
+    # Like users_email_lower_uniq, built without locking the table
+    # against writes on PostgreSQL.
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS "users_pending_deletion" '
+            'ON "users" ("deletion_requested_at") '
+            'WHERE "deletion_requested_at" IS NOT NULL'
+        )
+    else:
+        schema_editor.add_index(apps.get_model('users', 'CustomUsers'), INDEX)
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'DROP INDEX CONCURRENTLY IF EXISTS "users_pending_deletion"'
+        )
+    else:
+        schema_editor.remove_index(apps.get_model('users', 'CustomUsers'), INDEX)
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('users', '0004_users_email_lower_uniq'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customusers',
+            name='deletion_requested_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Deletion requested at'),
+        ),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(create_index, drop_index),
+            ],
+            state_operations=[
+                migrations.AddIndex(
+                    model_name='customusers',
+                    index=INDEX,
+                ),
+            ],
+        ),
+    ]
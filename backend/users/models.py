@@ -3,6 +3,8 @@ from typing import Optional
 
 from django.conf import settings
 from django.db import models
+from django.db.models import Q
+from django.db.models.functions import Lower
 from django.contrib.auth.models import (
     AbstractBaseUser,
     BaseUserManager,
@@ -10,6 +12,14 @@ from django.contrib.auth.models import (
 )
 from django.utils.translation import gettext_lazy as _
 
+from users.avatars import variant_name
+from users.hashing import (
+    ahash_password,
+    averify_password,
+    hash_password,
+    verify_password
+)
+
 
 class BaseModel(models.Model):
     """
@@ -28,11 +38,57 @@ class BaseModel(models.Model):
         abstract = True
 
 
-class CustomUsersManager(BaseUserManager):
+def prefix_upper_bound(prefix: str) -> str:
+    """Returns the smallest string greater than every ``prefix*`` string."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class CustomUsersQuerySet(models.QuerySet):
+    """Queryset of users with case-insensitive email lookups."""
+    def filter_by_email(self, email: str) -> "CustomUsersQuerySet":
+        """
+        Filters users by email, ignoring case.
+
+        Compares ``LOWER(email)``, which is served by the
+        ``users_email_lower_uniq`` index; ``email__iexact`` would
+        scan the whole table instead.
+        """
+        return self.alias(email_lower=Lower("email")).filter(
+            email_lower=email.lower()
+        )
+
+    def filter_by_prefix(self, prefix: str) -> "CustomUsersQuerySet":
+        """
+        Filters users whose email (ignoring case) or username starts
+        with ``prefix``.
+
+        The prefix is expressed as a range (``>= 'ab' AND < 'ac'``), which
+        the ``users_email_lower_uniq`` and username indexes can serve,
+        unlike ``LIKE`` patterns on most databases and collations.
+        """
+        prefix_lower = prefix.lower()
+        return self.alias(email_lower=Lower("email")).filter(
+            Q(
+                email_lower__gte=prefix_lower,
+                email_lower__lt=prefix_upper_bound(prefix_lower),
+                email_lower__startswith=prefix_lower,
+            )
+            | Q(
+                username__gte=prefix,
+                username__lt=prefix_upper_bound(prefix),
+                username__startswith=prefix,
+            )
+        )
+
+
+class CustomUsersManager(BaseUserManager.from_queryset(CustomUsersQuerySet)):
     """
         Custom handler for the user"s model
         for the correct operation of email authorization.
     """
+    def get_by_natural_key(self, username: str) -> "CustomUsers":
+        return self.filter_by_email(username).get()
+
     def create_user(
         self,
         email: str,
@@ -87,6 +143,12 @@ class CustomUsers(AbstractBaseUser, PermissionsMixin):
 
     is_active = models.BooleanField(_("Active"), default=True)  # pyright: ignore
     is_staff = models.BooleanField(_("Staff"), default=False)  # pyright: ignore
+    updated_at = models.DateTimeField(_("Date of update"), auto_now=True)
+    deletion_requested_at = models.DateTimeField(
+        _("Deletion requested at"),
+        blank=True,
+        null=True
+    )
 
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["username"]
@@ -97,11 +159,184 @@ class CustomUsers(AbstractBaseUser, PermissionsMixin):
         db_table = "users"
         verbose_name = _("User") 
         verbose_name_plural = _("Users") 
+        constraints = [
+            models.UniqueConstraint(
+                Lower("email"),
+                name="users_email_lower_uniq",
+                violation_error_message=_("User with this Email already exists."),
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["deletion_requested_at"],
+                condition=models.Q(deletion_requested_at__isnull=False),
+                name="users_pending_deletion",
+            ),
+        ]
 
     def __str__(self) -> str:
         return f"{self.email}"
 
-    def get_avatar_url(self):
+    def set_password(self, raw_password: Optional[str]) -> None:
+        """Hashes the password on the password hashing pool."""
+        if raw_password is None:
+            super().set_password(raw_password)
+            return
+        self.password = hash_password(raw_password)
+        self._password = raw_password
+
+    def check_password(self, raw_password: str) -> bool:
+        """
+        Checks the password on the password hashing pool.
+
+        A hash that needs an upgrade is re-hashed and saved
+        on the calling thread, like Django's own implementation.
+        """
+        is_correct, must_update = verify_password(raw_password, self.password)
+        if is_correct and must_update:
+            self.set_password(raw_password)
+            # Password hash upgrades shouldn't be considered password changes.
+            self._password = None
+            self.save(update_fields=["password"])
+        return is_correct
+
+    async def aset_password(self, raw_password: str) -> None:
+        """Async counterpart of ``set_password``."""
+        self.password = await ahash_password(raw_password)
+        self._password = raw_password
+
+    async def acheck_password(self, raw_password: str) -> bool:
+        """Async counterpart of ``check_password``."""
+        is_correct, must_update = await averify_password(
+            raw_password,
+            self.password
+        )
+        if is_correct and must_update:
+            await self.aset_password(raw_password)
+            # Password hash upgrades shouldn't be considered password changes.
+            self._password = None
+            await self.asave(update_fields=["password"])
+        return is_correct
+
+    @property
+    def etag(self) -> str:
+        """
+        Strong validator of the user's representation.
+
+        Changes on every full ``save()``; saves limited to fields that
+        are not serialized (``last_login``, ``password``) keep it.
+        """
+        return f'"{self.pk}-{int(self.updated_at.timestamp() * 1_000_000)}"'
+
+    def get_avatar_url(
+        self,
+        size: Optional[int] = None,
+        image_format: str = "jpeg"
+    ) -> str:
         if self.avatar:
-            return f"{settings.MEDIA_URL}{self.avatar}"
+            name = self.avatar.name
+            if size is not None:
+                name = variant_name(name, size, image_format)
+            return f"{settings.MEDIA_URL}{name}"
         return "/default-avatar.png"
+
+
+class RefreshTokenRecord(models.Model):
+    """
+    Issued refresh token, as tracked by ``users.token_store``.
+
+    The ``jti`` is the primary key, so lookups and revocations are single
+    index operations. Tokens rotated from the same login share a
+    ``family``; the partial index only covers live tokens, which keeps
+    revoking a family cheap however many rotations it went through.
+    """
+    jti = models.CharField("JTI", max_length=64, primary_key=True)
+    family = models.UUIDField(_("Family"))
+    user = models.ForeignKey(
+        CustomUsers,
+        on_delete=models.CASCADE,
+        related_name="refresh_tokens"
+    )
+    created_at = models.DateTimeField(_("Date of creation"), auto_now_add=True)
+    expires_at = models.DateTimeField(_("Expires at"), db_index=True)
+    revoked_at = models.DateTimeField(_("Revoked at"), blank=True, null=True)
+
+    class Meta:
+        db_table = "refresh_tokens"
+        verbose_name = _("Refresh token")
+        verbose_name_plural = _("Refresh tokens")
+        indexes = [
+            models.Index(
+                fields=["family"],
+                condition=models.Q(revoked_at__isnull=True),
+                name="refresh_tokens_live_family",
+            ),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.jti}"
+
+
+class ClaimsUser:
+    """
+    Lightweight user built from the claims of a validated access token.
+
+    Exposes the id and the flags embedded by ``UserRefreshToken`` without
+    touching the database. Any other attribute (``first_name``, ``avatar``,
+    ``save()``, ...) transparently loads the real ``CustomUsers`` row once
+    and delegates to it.
+    """
+    __slots__ = ("id", "email", "username", "is_staff", "is_active", "_user")
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(
+        self,
+        id,
+        email: str,
+        username: str,
+        is_staff: bool = False,
+        is_active: bool = True
+    ) -> None:
+        set_slot = object.__setattr__
+        set_slot(self, "_user", None)
+        set_slot(self, "id", id)
+        set_slot(self, "email", email)
+        set_slot(self, "username", username)
+        set_slot(self, "is_staff", is_staff)
+        set_slot(self, "is_active", is_active)
+
+    @property
+    def pk(self):
+        return self.id
+
+    def get_user(self) -> CustomUsers:
+        """Loads and memoizes the underlying model instance."""
+        if self._user is None:
+            object.__setattr__(
+                self, "_user", CustomUsers.objects.get(pk=self.id)
+            )
+        return self._user
+
+    def __getattr__(self, name: str):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(self.get_user(), name)
+
+    def __setattr__(self, name: str, value) -> None:
+        if name in ClaimsUser.__slots__:
+            object.__setattr__(self, name, value)
+        if name != "_user":
+            setattr(self.get_user(), name, value)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, (ClaimsUser, CustomUsers)):
+            return self.pk == other.pk
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash(self.pk)
+
+    def __str__(self) -> str:
+        return f"{self.email}"
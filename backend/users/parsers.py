@@ -0,0 +1,26 @@
+import codecs
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+
+from users.renderers import orjson
+
+
+class FastJSONParser(JSONParser):
+    """
+    JSONParser decoding with orjson when it is installed.
+
+    orjson rejects ``NaN`` and ``Infinity`` like DRF's ``STRICT_JSON``
+    mode. Bodies in a charset other than UTF-8, or without orjson, are
+    handed to the parent class.
+    """
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        if orjson is None or codecs.lookup(encoding).name != "utf-8":
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f"JSON parse error - {exc}")
@@ -0,0 +1,120 @@
+import json
+import math
+from decimal import Decimal
+from typing import Any
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# DRF escapes these so that its JSON is also valid JavaScript.
+LINE_SEPARATORS = ((b"\xe2\x80\xa8", b"\\u2028"), (b"\xe2\x80\xa9", b"\\u2029"))
+
+_encoder = encoders.JSONEncoder()
+
+
+def has_non_finite(data: Any) -> bool:
+    """Whether ``data`` contains a NaN or infinite float or Decimal."""
+    if isinstance(data, float):
+        return not math.isfinite(data)
+    if isinstance(data, Decimal):
+        return not data.is_finite()
+    if isinstance(data, dict):
+        return any(has_non_finite(value) for value in data.values())
+    if isinstance(data, (list, tuple)):
+        return any(has_non_finite(value) for value in data)
+    return False
+
+
+def dumps(data: Any) -> bytes:
+    """
+    Encodes ``data`` like DRF's ``JSONRenderer`` with its default
+    settings: compact, UTF-8, the types of DRF's encoder.
+
+    Uses orjson when it is installed and the standard library otherwise.
+    Datetimes go through DRF's encoder in both cases, so they keep the
+    ``Z`` suffix instead of orjson's ``+00:00``, and non-string keys
+    (e.g. the avatar sizes) become strings like with ``json``. orjson
+    writes NaN and infinities as ``null``, so output containing ``null``
+    is checked for them and, if it has any, encoded by the standard
+    library, which raises ``ValueError`` under ``STRICT_JSON`` like DRF.
+
+    Raises:
+        ValueError: If ``data`` holds NaN or infinities and
+                    ``STRICT_JSON`` is enabled.
+    """
+    content = None
+    if orjson is not None:
+        content = orjson.dumps(
+            data,
+            default=_encoder.default,
+            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        )
+        if b"null" in content and has_non_finite(data):
+            content = None
+    if content is None:
+        content = json.dumps(
+            data,
+            cls=encoders.JSONEncoder,
+            ensure_ascii=False,
+            allow_nan=not api_settings.STRICT_JSON,
+            separators=(",", ":")
+        ).encode()
+    for character, escaped in LINE_SEPARATORS:
+        if character in content:
+            content = content.replace(character, escaped)
+    return content
+
+
+class EncodedJSON(dict):
+    """
+    Response payload encoded once, when it is created.
+
+    Meant for constant bodies such as ``{"success": true, ...}``, which
+    ``FastJSONRenderer`` returns as is. It is still a dict, so any other
+    renderer encodes it as usual. It cannot be changed, since
+    ``content`` would no longer match; copy it with ``dict()`` instead.
+    """
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.content = dumps(self)
+
+    def _immutable(self, *args, **kwargs):
+        raise TypeError("EncodedJSON is immutable, copy it with dict()")
+
+    __setitem__ = __delitem__ = __ior__ = _immutable
+    clear = pop = popitem = setdefault = update = _immutable
+
+    def __reduce__(self):
+        return type(self), (dict(self),)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer encoding with ``dumps`` (orjson when it is installed).
+
+    ``EncodedJSON`` payloads are returned without encoding. Requests for
+    indented output (``Accept: application/json; indent=4``) and
+    non-default ``UNICODE_JSON``/``COMPACT_JSON``/``STRICT_JSON``
+    settings are handed to the parent class.
+    """
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if (
+            self.get_indent(accepted_media_type, renderer_context or {})
+            or self.ensure_ascii
+            or not self.compact
+            or not self.strict
+            or self.encoder_class is not encoders.JSONEncoder
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        if isinstance(data, EncodedJSON):
+            return data.content
+        return dumps(data)
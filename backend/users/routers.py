@@ -0,0 +1,102 @@
+import random
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+
+
+PIN_KEY_PREFIX = "users:db-pin:"
+
+_replica_reads: ContextVar[bool] = ContextVar("replica_reads", default=False)
+
+
+def get_replicas() -> list:
+    return getattr(settings, "DATABASE_ROUTING", {}).get("REPLICAS", [])
+
+
+def get_pin_cache():
+    config = getattr(settings, "DATABASE_ROUTING", {})
+    return caches[config.get("PIN_CACHE_ALIAS", "default")]
+
+
+def pin_to_primary(user_id: Any) -> None:
+    """
+    Sends the user's reads to the primary for
+    ``DATABASE_ROUTING["PIN_SECONDS"]``, so they see their own writes
+    while the replicas catch up.
+
+    The pin is only seen by every worker process if
+    ``DATABASE_ROUTING["PIN_CACHE_ALIAS"]`` is a shared cache.
+    """
+    if not get_replicas():
+        return
+    seconds = settings.DATABASE_ROUTING.get("PIN_SECONDS", 5)
+    get_pin_cache().set(f"{PIN_KEY_PREFIX}{user_id}", True, seconds)
+
+
+@contextmanager
+def read_from_replica(user_id: Optional[Any] = None):
+    """
+    Routes the reads made inside the block to a replica, unless the
+    user is pinned to the primary after a recent write.
+
+    Without replicas this is a no-op. With replicas, the pin costs one
+    ``PIN_CACHE_ALIAS`` read per call, which is a query on the primary
+    when that cache is the database-backed one, so a Redis or Memcached
+    alias suits it better.
+    """
+    if not get_replicas() or (
+        user_id is not None
+        and get_pin_cache().get(f"{PIN_KEY_PREFIX}{user_id}")
+    ):
+        yield
+        return
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+@asynccontextmanager
+async def aread_from_replica(user_id: Optional[Any] = None):
+    """Async counterpart of ``read_from_replica``."""
+    if not get_replicas() or (
+        user_id is not None
+        and await get_pin_cache().aget(f"{PIN_KEY_PREFIX}{user_id}")
+    ):
+        yield
+        return
+    token = _replica_reads.set(True)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Sends opted-in reads to a read replica and everything else to the
+    primary.
+
+    Reads only go to a replica inside ``read_from_replica``, which wraps
+    the read-only lookups of the authentication path and the current
+    user endpoint. All other queries, including those made through an
+    instance that was loaded from a replica, use the primary, so code
+    that writes never acts on replicated (possibly stale) data.
+    """
+    def db_for_read(self, model, **hints) -> str:
+        replicas = get_replicas()
+        if replicas and _replica_reads.get():
+            return random.choice(replicas)
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints) -> str:
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints) -> bool:
+        # Replicas hold the same data as the primary.
+        return True
@@ -1,17 +1,44 @@
-from typing import Any
+from typing import Any, Optional
 
+from django.conf import settings
 from django.contrib.auth import authenticate, get_user_model
+from django.db import IntegrityError
+from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.exceptions import TokenError, InvalidToken
 from rest_framework.exceptions import AuthenticationFailed
 
+from users.avatars import get_avatar_processor, is_image
+from users.metrics import timed
 from users.models import CustomUsers
+from users.tokens import UserRefreshToken
+from users.token_store import (
+    get_refresh_grace_window,
+    get_refresh_token_store
+)
 
 
 User = get_user_model()
 
 
+class UniqueEmailValidator:
+    """
+    Case-insensitive counterpart of DRF's ``UniqueValidator``
+    for the email field, backed by the ``users_email_lower_uniq`` index.
+    """
+    requires_context = True
+    message = _("User with this Email already exists.")
+
+    def __call__(self, value: str, serializer_field) -> None:
+        queryset = CustomUsers.objects.filter_by_email(value)
+        instance = getattr(serializer_field.parent, "instance", None)
+        if instance is not None:
+            queryset = queryset.exclude(pk=instance.pk)
+        if queryset.exists():
+            raise serializers.ValidationError(self.message, code="unique")
+
+
 class RegistrationSerializer(serializers.ModelSerializer):
     """
     Serializer for user registration.
@@ -23,15 +50,25 @@ class RegistrationSerializer(serializers.ModelSerializer):
     class Meta:
         model = CustomUsers
         fields = ["email", "username", "password", "first_name", "last_name"]
+        extra_kwargs = {"email": {"validators": [UniqueEmailValidator()]}}
 
     def create(self, validated_data):
-        user = CustomUsers.objects.create_user(
-            email=validated_data["email"],
-            username=validated_data["username"],
-            password=validated_data["password"],
-            first_name=validated_data.get("first_name", ""),
-            last_name=validated_data.get("last_name", "")
-        )
+        try:
+            user = CustomUsers.objects.create_user(
+                email=validated_data["email"],
+                username=validated_data["username"],
+                password=validated_data["password"],
+                first_name=validated_data.get("first_name", ""),
+                last_name=validated_data.get("last_name", "")
+            )
+        except IntegrityError:
+            # Lost a race with a concurrent registration.
+            email = validated_data["email"]
+            if not CustomUsers.objects.filter_by_email(email).exists():
+                raise
+            raise serializers.ValidationError(
+                {"email": [UniqueEmailValidator.message]}
+            )
         return user
 
 
@@ -61,13 +98,12 @@ class LoginSerializer(serializers.Serializer):
         else:
             raise AuthenticationFailed("Email and password is required")
         
-        refresh: RefreshToken = RefreshToken.for_user(user)  # pyright: ignore
-        access_token = refresh.access_token
-        
-        return {
-            "refresh": str(refresh),
-            "access": access_token,
-        }
+        with timed("token_mint"):
+            refresh: RefreshToken = UserRefreshToken.for_user(user)
+            return {
+                "refresh": str(refresh),
+                "access": str(refresh.access_token),
+            }
 
 
 class RefreshSerializer(serializers.Serializer):
@@ -76,27 +112,53 @@ class RefreshSerializer(serializers.Serializer):
 
     This serializer takes a refresh token and validates it. If valid,
     it generates a new access token and refresh token for the user.
+    The presented token is rotated in the refresh token store, so it
+    cannot be used again.
     """
     refresh = serializers.CharField()
     
     def validate(self, attrs: Any) -> dict:
         refresh_token = attrs.get("refresh")
         try:
-            refresh: RefreshToken = RefreshToken(refresh_token)
-            refresh.verify()
-            
-            user_id = refresh.get("user_id")
-            user = User.objects.get(id=user_id)
-
-            access_token: str = str(refresh.access_token)
-            new_refresh = RefreshToken.for_user(user)
+            with timed("token_decode"):
+                refresh: RefreshToken = UserRefreshToken(refresh_token)  # pyright: ignore
+                refresh.verify()
+            return get_refresh_grace_window().run(
+                refresh,
+                lambda: self.rotate(refresh)
+            )
         except TokenError as e:
             raise InvalidToken(e.args[0])
-        
-        return {
-            "access": access_token,
-            "refresh": str(new_refresh),
-        }
+
+    @staticmethod
+    def rotate(refresh: RefreshToken) -> dict:
+        """
+        Rotates the refresh token in the store and mints a new pair.
+
+        Concurrent refreshes of the same token within the grace window
+        share the result of a single rotation.
+        """
+        store = get_refresh_token_store()
+        store.rotate(refresh)
+
+        user_id = refresh.get("user_id")
+        with timed("user_fetch"):
+            try:
+                user = User.objects.get(id=user_id)
+            except User.DoesNotExist:
+                raise AuthenticationFailed("User not found")
+        if not user.is_active:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+
+        with timed("token_mint"):
+            new_refresh = UserRefreshToken.for_user(
+                user,
+                family=refresh.get(store.family_claim)
+            )
+            return {
+                "access": str(new_refresh.access_token),
+                "refresh": str(new_refresh),
+            }
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -105,20 +167,62 @@ class UserSerializer(serializers.ModelSerializer):
 
     This serializer converts user model instances into JSON format
     and vice versa. It includes fields for basic user information.
+    An uploaded avatar is handed to the avatar processor, which replaces
+    ``avatar`` once its thumbnails are ready; ``avatar_urls`` lists
+    every size and format of the current one.
     """
-    avatar = serializers.ImageField(required=False, allow_null=True)
+    # A plain FileField, so the request thread never decodes the image.
+    avatar = serializers.FileField(required=False, allow_null=True)
+    avatar_urls = serializers.SerializerMethodField()
 
     class Meta:
         model = User
         fields = [
             "id", "email", "username",
-            "first_name", "last_name", "avatar"
+            "first_name", "last_name", "avatar", "avatar_urls"
         ]
+        extra_kwargs = {"email": {"validators": [UniqueEmailValidator()]}}
+
+    def validate_avatar(self, value):
+        if value is None:
+            return value
+        max_size = settings.AVATARS["MAX_UPLOAD_SIZE"]
+        if value.size > max_size:
+            raise serializers.ValidationError(
+                f"Avatar must not exceed {max_size // (1024 * 1024)} MB."
+            )
+        if not is_image(value):
+            raise serializers.ValidationError(
+                "Upload a valid image. The file you uploaded was either "
+                "not an image or a corrupted image."
+            )
+        return value
 
-    def get_avatar(self, obj):
-        request = self.context.get("request")
-        if not request:
+    def get_avatar_urls(self, obj) -> Optional[dict]:
+        if not obj.avatar:
             return None
-        if obj.avatar:
-            return request.build_absolute_uri(obj.avatar.url)
-        return request.build_absolute_uri("/default-avatar.png")
+        request = self.context.get("request")
+        processor = get_avatar_processor()
+        urls = {}
+        for size in processor.sizes:
+            urls[size] = {}
+            for image_format in processor.formats:
+                url = obj.get_avatar_url(size, image_format)
+                urls[size][image_format] = (
+                    request.build_absolute_uri(url) if request else url
+                )
+        return urls
+
+    def update(self, instance, validated_data):
+        # An explicit null clears the avatar right away.
+        upload = validated_data.get("avatar")
+        if upload is not None:
+            del validated_data["avatar"]
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        # The instance may come from the user cache, so only the submitted
+        # columns are written: the others can be stale.
+        instance.save(update_fields=[*validated_data, "updated_at"])
+        if upload is not None:
+            get_avatar_processor().submit(instance.pk, upload)
+        return instance
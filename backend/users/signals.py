@@ -0,0 +1,85 @@
+from django.contrib.auth.models import Group, Permission
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from users.cache import get_permission_cache, get_user_cache
+from users.models import CustomUsers
+from users.routers import pin_to_primary
+
+
+def invalidate_after_commit(func) -> None:
+    """
+    Runs ``func`` now and, inside a transaction, again after commit, so
+    that a request reading the old rows before the commit cannot cache
+    them for good.
+    """
+    func()
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(func)
+
+
+@receiver(post_save, sender=CustomUsers)
+@receiver(post_delete, sender=CustomUsers)
+def invalidate_cached_user(sender, instance, **kwargs):
+    """
+    Drops a user from the user cache whenever its row changes.
+
+    Covers profile updates, account deletion and edits made in the admin.
+    The user's reads are also pinned to the primary database for a few
+    seconds, so they are not served stale rows by a lagging replica.
+    The cached permissions are dropped as well, since ``is_superuser``
+    may have changed.
+    """
+    user_id = instance.pk
+    pin_to_primary(user_id)
+    cache = get_user_cache()
+    if cache is not None:
+        # Only post_save passes "created"; deleted users match no version.
+        cache.invalidate(
+            user_id,
+            instance.updated_at if "created" in kwargs else None
+        )
+    permission_cache = get_permission_cache()
+    if permission_cache is not None:
+        invalidate_after_commit(lambda: permission_cache.invalidate([user_id]))
+
+
+@receiver(m2m_changed, sender=CustomUsers.groups.through)
+@receiver(m2m_changed, sender=CustomUsers.user_permissions.through)
+def invalidate_user_permissions(sender, instance, action, reverse, pk_set,
+                                **kwargs):
+    """
+    Drops the cached permissions of users whose groups or direct
+    permissions changed, from either side of the relation.
+    """
+    cache = get_permission_cache()
+    if cache is None or action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        user_ids = [instance.pk]
+    elif pk_set is not None:
+        user_ids = list(pk_set)
+    else:
+        # group.user_set.clear() does not report the affected users.
+        invalidate_after_commit(cache.invalidate_all)
+        return
+    invalidate_after_commit(lambda: cache.invalidate(user_ids))
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+@receiver(post_delete, sender=Group)
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+def invalidate_all_permissions(sender, action=None, **kwargs):
+    """
+    Invalidates every cached permission set after changes that may
+    affect many users: a group's permissions, or deleted groups and
+    permissions (whose relations are removed without m2m signals).
+    """
+    cache = get_permission_cache()
+    if cache is None or action not in (
+        None, "post_add", "post_remove", "post_clear"
+    ):
+        return
+    invalidate_after_commit(cache.invalidate_all)
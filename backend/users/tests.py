@@ -0,0 +1,846 @@
+import io
+import json
+import os
+import tempfile
+import uuid
+from datetime import timedelta
+from unittest import mock
+
+import jwt
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from django.conf import settings
+from django.contrib import admin
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from users.admin import CustomUsersAdmin
+from users.authentication import CookieJWTAuthentication
+from users.avatars import AVATAR_DIR
+from users.backends import EmailBackend
+from users.bulk import UserImporter, read_records
+from users.cache import PermissionCache, UserCache, get_user_cache
+from users.deletion import AccountDeleter
+from users.models import CustomUsers, RefreshTokenRecord
+from users.renderers import EncodedJSON, FastJSONRenderer
+from users.routers import PIN_KEY_PREFIX, get_pin_cache
+from users.throttling import TokenBucket, get_token_bucket
+from users.tokens import UserRefreshToken
+from users.verifier import JWKSVerifier
+from users.token_store import (
+    RefreshTokenStore,
+    get_refresh_grace_window,
+    get_refresh_token_store
+)
+
+
+class EmailIndexTests(TestCase):
+    """
+    Checks with EXPLAIN that every email lookup uses the
+    case-insensitive ``users_email_lower_uniq`` index.
+
+    On PostgreSQL sequential scans are disabled for the test transaction,
+    so the planner's choice does not depend on how many rows the table
+    currently holds.
+    """
+    index_name = "users_email_lower_uniq"
+    email = "Someone@Example.com"
+
+    def setUp(self):
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def assertUsesIndex(self, queryset):
+        plan = queryset.explain()
+        self.assertIn(self.index_name, plan, plan)
+
+    def test_backend_lookup(self):
+        """The query of EmailBackend.authenticate (``.first()``)."""
+        self.assertUsesIndex(
+            CustomUsers.objects.filter_by_email(self.email).order_by("pk")[:1]
+        )
+
+    def test_registration_check(self):
+        """The query of UniqueEmailValidator (``.exists()``)."""
+        self.assertUsesIndex(
+            CustomUsers.objects.filter_by_email(self.email).values("pk")[:1]
+        )
+
+    def test_admin_search(self):
+        """The query of an email search in the admin changelist."""
+        queryset, _ = CustomUsersAdmin(
+            CustomUsers,
+            admin.site
+        ).get_search_results(None, CustomUsers.objects.all(), self.email)
+        self.assertUsesIndex(queryset)
+
+
+# The routing tests tell the primary and the replica apart by their
+# data, so they need a second test database even where no replica is
+# configured.
+if "replica" not in connections:
+    settings.DATABASES["replica"] = connections.settings["replica"] = {
+        **connections.settings["default"],
+        "NAME": f"{connections.settings['default']['NAME']}_replica",
+        "TEST": {**connections.settings["default"]["TEST"], "NAME": None},
+    }
+
+
+@override_settings(DATABASE_ROUTING={
+    "REPLICAS": ["replica"],
+    "PIN_SECONDS": 5,
+    "PIN_CACHE_ALIAS": "shared",
+})
+class ReplicaRoutingTests(TestCase):
+    """
+    Checks which database serves the read-only lookups of the auth path.
+
+    The user's row differs between the primary and the replica (its
+    first name), so every assertion tells where the user was read from.
+    """
+    databases = {"default", "replica"}
+    url = "/api/auth/v1/users/"
+
+    def setUp(self):
+        self.user = CustomUsers.objects.create_user(
+            email="someone@example.com",
+            username="someone",
+            password="password",
+            first_name="Primary"
+        )
+        replica = CustomUsers.objects.get(pk=self.user.pk)
+        replica.first_name = "Replica"
+        replica.save(using="replica", force_insert=True)
+        # Creating the user pinned its reads to the primary.
+        self.unpin()
+        self.reset_caches()
+        self.access_token = UserRefreshToken.for_user(self.user).access_token
+        self.client.cookies["access_token"] = str(self.access_token)
+
+    def reset_caches(self):
+        """Forgets cached users and representations, but not the pins."""
+        caches["default"].clear()
+        get_user_cache().clear()
+
+    def unpin(self):
+        get_pin_cache().delete(f"{PIN_KEY_PREFIX}{self.user.pk}")
+
+    def test_authentication_reads_from_replica(self):
+        user = CookieJWTAuthentication().get_user(self.access_token)
+        self.assertEqual(user.first_name, "Replica")
+
+    def test_backend_reads_from_replica(self):
+        user = EmailBackend().get_user(self.user.pk)
+        self.assertEqual(user.first_name, "Replica")
+
+    def test_current_user_reads_from_replica(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["first_name"], "Replica")
+
+    def test_reads_go_to_primary_after_update(self):
+        response = self.client.put(
+            self.url,
+            encode_multipart(BOUNDARY, {"first_name": "Updated"}),
+            content_type=MULTIPART_CONTENT
+        )
+        self.assertEqual(response.status_code, 200)
+        self.reset_caches()
+
+        response = self.client.get(self.url)
+        self.assertEqual(response.json()["first_name"], "Updated")
+        self.assertEqual(
+            CookieJWTAuthentication().get_user(self.access_token).first_name,
+            "Updated"
+        )
+        self.assertEqual(
+            EmailBackend().get_user(self.user.pk).first_name,
+            "Updated"
+        )
+
+        # Once the pin expires, reads go back to the (stale) replica.
+        self.unpin()
+        self.reset_caches()
+        self.assertEqual(
+            EmailBackend().get_user(self.user.pk).first_name,
+            "Replica"
+        )
+
+
+class UserCacheTests(TestCase):
+    def setUp(self):
+        self.user = CustomUsers.objects.create_user(
+            email="someone@example.com",
+            username="someone",
+            password="password"
+        )
+        self.client.cookies["access_token"] = str(
+            UserRefreshToken.for_user(self.user).access_token
+        )
+
+    def tearDown(self):
+        get_user_cache().clear()
+        caches["shared"].clear()
+
+    def test_update_keeps_columns_changed_elsewhere(self):
+        """A PUT through a cached copy only writes the submitted fields."""
+        self.assertEqual(self.client.get("/api/auth/v1/users/").status_code, 200)
+        # No signal: this process still caches the active non-staff user.
+        CustomUsers.objects.filter(pk=self.user.pk).update(
+            is_active=False,
+            is_staff=True
+        )
+        self.client.put(
+            "/api/auth/v1/users/",
+            encode_multipart(BOUNDARY, {"first_name": "Updated"}),
+            content_type=MULTIPART_CONTENT
+        )
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.first_name, "Updated")
+        self.assertFalse(self.user.is_active)
+        self.assertTrue(self.user.is_staff)
+
+    def test_save_reaches_other_processes(self):
+        saving = UserCache(version_alias="shared")
+        other = UserCache(version_alias="shared")
+        saving.set(self.user.pk, self.user)
+        other.set(self.user.pk, self.user)
+        self.assertIsNotNone(other.get(self.user.pk))
+
+        self.user.save(update_fields=["is_staff", "updated_at"])
+        saving.invalidate(self.user.pk, self.user.updated_at)
+        self.assertIsNone(other.get(self.user.pk))
+
+        other.set(self.user.pk, self.user)
+        self.assertIsNotNone(other.get(self.user.pk))
+        saving.invalidate(self.user.pk)
+        self.assertIsNone(other.get(self.user.pk))
+
+
+class AsyncViewTests(TestCase):
+    def test_non_object_json_body_is_rejected(self):
+        for body in ("[1]", '"x"', "1", "null"):
+            with self.subTest(body=body):
+                response = self.client.post(
+                    "/api/auth/v1/async/login/",
+                    body,
+                    content_type="application/json"
+                )
+                self.assertEqual(response.status_code, 400)
+
+
+class PermissionCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.cache = PermissionCache()
+        self.cache.cache.clear()
+        self.updated_at = timezone.now()
+
+    def get(self, permissions, updated_at):
+        return self.cache.get_or_set(
+            1,
+            lambda: {"user": set(permissions), "group": set()},
+            updated_at=updated_at
+        )["user"]
+
+    def test_entry_is_reused(self):
+        self.get({"users.view_customusers"}, self.updated_at)
+        self.assertEqual(
+            self.get(set(), self.updated_at),
+            {"users.view_customusers"}
+        )
+
+    def test_saved_user_is_recomputed(self):
+        """Revocations by a save apply even if no invalidation arrived."""
+        self.get({"users.view_customusers"}, self.updated_at)
+        later = self.updated_at + timedelta(seconds=1)
+        self.assertEqual(self.get(set(), later), set())
+
+    def test_invalidate_all(self):
+        self.get({"users.view_customusers"}, self.updated_at)
+        self.cache.invalidate_all()
+        self.assertEqual(self.get(set(), self.updated_at), set())
+
+
+class RefreshTokenStoreTests(TestCase):
+    """
+    Rotation and reuse detection through the refresh and logout endpoints,
+    with the grace window and throttling disabled.
+    """
+    refresh_url = "/api/auth/v1/refresh/"
+
+    def setUp(self):
+        self.overrides = override_settings(
+            REFRESH_TOKEN_STORE={
+                **settings.REFRESH_TOKEN_STORE,
+                "GRACE_WINDOW": 0,
+            },
+            THROTTLING={**settings.THROTTLING, "ENABLED": False},
+        )
+        self.overrides.enable()
+        self.clear_singletons()
+        self.user = CustomUsers.objects.create_user(
+            email="someone@example.com",
+            username="someone",
+            password="password"
+        )
+
+    def tearDown(self):
+        self.overrides.disable()
+        self.clear_singletons()
+
+    @staticmethod
+    def clear_singletons():
+        get_refresh_grace_window.cache_clear()
+        get_refresh_token_store.cache_clear()
+        get_token_bucket.cache_clear()
+
+    def refresh(self, token):
+        """Refreshes with ``token``; returns the status and new token."""
+        self.client.cookies.clear()
+        self.client.cookies["refresh_token"] = str(token)
+        response = self.client.post(self.refresh_url)
+        rotated = response.cookies.get("refresh_token")
+        return response.status_code, rotated.value if rotated else None
+
+    def assertFamilyRevoked(self, family):
+        self.assertFalse(
+            RefreshTokenRecord.objects.filter(
+                family=family,
+                revoked_at__isnull=True
+            ).exists()
+        )
+
+    def test_rotation(self):
+        token = UserRefreshToken.for_user(self.user)
+        status_code, rotated = self.refresh(token)
+        self.assertEqual(status_code, 200)
+
+        old = RefreshTokenRecord.objects.get(jti=token["jti"])
+        new = RefreshTokenRecord.objects.get(
+            jti=UserRefreshToken(rotated)["jti"]
+        )
+        self.assertIsNotNone(old.revoked_at)
+        self.assertIsNone(new.revoked_at)
+        self.assertEqual(new.family, old.family)
+
+    def test_replay_revokes_descendants(self):
+        token = UserRefreshToken.for_user(self.user)
+        _, rotated = self.refresh(token)
+
+        self.assertEqual(self.refresh(token)[0], 401)
+        self.assertEqual(self.refresh(rotated)[0], 401)
+        self.assertFamilyRevoked(uuid.UUID(token["family"]))
+
+    def test_replay_in_another_process(self):
+        """Reuse is detected from the database, not just in memory."""
+        token = UserRefreshToken.for_user(self.user)
+        _, rotated = self.refresh(token)
+
+        get_refresh_token_store.cache_clear()
+        self.assertEqual(self.refresh(token)[0], 401)
+        get_refresh_token_store.cache_clear()
+        self.assertEqual(self.refresh(rotated)[0], 401)
+
+    def test_token_issued_before_the_store(self):
+        token = RefreshToken.for_user(self.user)
+        self.assertFalse(RefreshTokenRecord.objects.exists())
+
+        status_code, rotated = self.refresh(token)
+        self.assertEqual(status_code, 200)
+        record = RefreshTokenRecord.objects.get(jti=token["jti"])
+        self.assertIsNotNone(record.revoked_at)
+
+        self.assertEqual(self.refresh(token)[0], 401)
+        self.assertEqual(self.refresh(rotated)[0], 401)
+        self.assertFamilyRevoked(record.family)
+
+    def test_logout_revokes_family(self):
+        token = UserRefreshToken.for_user(self.user)
+        _, rotated = self.refresh(token)
+
+        # The access token is not needed, e.g. when it already expired.
+        self.client.cookies.clear()
+        self.client.cookies["refresh_token"] = rotated
+        response = self.client.post("/api/auth/v1/logout/")
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self.refresh(rotated)[0], 401)
+        self.assertFamilyRevoked(uuid.UUID(token["family"]))
+
+    def test_async_logout_revokes_family(self):
+        token = UserRefreshToken.for_user(self.user)
+
+        self.client.cookies.clear()
+        self.client.cookies["refresh_token"] = str(token)
+        response = self.client.post("/api/auth/v1/async/logout/")
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self.refresh(token)[0], 401)
+
+    def test_logout_of_token_issued_before_the_store(self):
+        token = RefreshToken.for_user(self.user)
+
+        self.client.cookies["refresh_token"] = str(token)
+        self.client.post("/api/auth/v1/logout/")
+
+        self.assertEqual(self.refresh(token)[0], 401)
+
+    def test_sweep(self):
+        UserRefreshToken.for_user(self.user)
+        RefreshTokenRecord.objects.create(
+            jti="expired",
+            family=uuid.uuid4(),
+            user=self.user,
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+
+        self.assertEqual(get_refresh_token_store().sweep(batch_size=1), 1)
+        self.assertEqual(RefreshTokenRecord.objects.count(), 1)
+        self.assertFalse(RefreshTokenRecord.objects.filter(jti="expired").exists())
+
+
+class AccountDeletionTests(TestCase):
+    """Tokens of a deleted account are rejected before it is purged."""
+    def setUp(self):
+        self.user = CustomUsers.objects.create_user(
+            email="someone@example.com",
+            username="someone",
+            password="password"
+        )
+        self.refresh_token = UserRefreshToken.for_user(self.user)
+        self.client.cookies["access_token"] = str(
+            self.refresh_token.access_token
+        )
+
+    def tearDown(self):
+        # User ids are reused by the next tests.
+        get_refresh_token_store.cache_clear()
+        caches["default"].clear()
+        caches["shared"].clear()
+
+    def test_tokens_are_revoked(self):
+        self.assertEqual(self.client.get("/api/auth/v1/verify/").status_code, 204)
+
+        response = self.client.delete("/api/auth/v1/users/delete/")
+        self.assertEqual(response.status_code, 204)
+
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/auth/v1/verify/")
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(self.client.get("/api/auth/v1/users/").status_code, 401)
+        self.assertFalse(
+            RefreshTokenRecord.objects.filter(
+                user=self.user,
+                revoked_at__isnull=True
+            ).exists()
+        )
+
+    def test_revocation_reaches_other_processes(self):
+        deleting = RefreshTokenStore(revocation_cache_alias="shared")
+        other = RefreshTokenStore(revocation_cache_alias="shared")
+
+        deleting.revoke_user(self.user.pk)
+        self.assertFalse(other.is_user_revoked(self.user.pk))
+        other.load_revoked_users()
+        self.assertTrue(other.is_user_revoked(self.user.pk))
+
+    def test_concurrent_revocations_are_kept(self):
+        first = RefreshTokenStore(revocation_cache_alias="shared")
+        second = RefreshTokenStore(revocation_cache_alias="shared")
+        other = RefreshTokenStore(
+            revocation_cache_alias="shared",
+            sync_interval=0
+        )
+        other.load_revoked_users()
+
+        first.revoke_user(1001)
+        # As if the second process read the head before the first wrote.
+        caches["shared"].set(RefreshTokenStore.revoked_users_head_key, 0)
+        second.revoke_user(1002)
+        other.load_revoked_users()
+        self.assertTrue(other.is_user_revoked(1001))
+        self.assertTrue(other.is_user_revoked(1002))
+
+        # The log starts over when the cache loses it.
+        caches["shared"].clear()
+        first.revoke_user(1003)
+        other.load_revoked_users()
+        self.assertTrue(other.is_user_revoked(1003))
+
+    def test_purge_pending_skips_failures(self):
+        users = [self.user] + [
+            CustomUsers.objects.create_user(
+                email=f"user{i}@example.com",
+                username=f"user{i}",
+                password="password"
+            )
+            for i in range(3)
+        ]
+        CustomUsers.objects.update(deletion_requested_at=timezone.now())
+        deleter = AccountDeleter(batch_size=1, workers=0)
+        purge = deleter.purge
+
+        def failing_purge(user_id):
+            if user_id == users[1].pk:
+                raise RuntimeError("Purge failed")
+            return purge(user_id)
+
+        with mock.patch.object(deleter, "purge", failing_purge):
+            with self.assertLogs("users.deletion", "ERROR"):
+                self.assertEqual(deleter.purge_pending(), 3)
+        self.assertEqual(
+            list(CustomUsers.objects.values_list("pk", flat=True)),
+            [users[1].pk]
+        )
+
+
+class FastJSONRendererTests(SimpleTestCase):
+    def assertRendersLikeDRF(self, data):
+        self.assertEqual(
+            FastJSONRenderer().render(data),
+            JSONRenderer().render(data)
+        )
+
+    def test_output_matches_drf(self):
+        self.assertRendersLikeDRF({
+            "id": 1,
+            "name": "Zo\u00eb \u2028",
+            "avatar": None,
+            "sizes": {64: "a.webp"},
+            "joined": timezone.now(),
+            "score": 1.5,
+        })
+
+    def test_non_finite_floats_are_rejected(self):
+        for value in (float("nan"), float("inf"), -float("inf")):
+            with self.subTest(value=value):
+                with self.assertRaises(ValueError):
+                    JSONRenderer().render({"value": value})
+                with self.assertRaises(ValueError):
+                    FastJSONRenderer().render({"value": value})
+
+    def test_encoded_json_is_immutable(self):
+        data = EncodedJSON({"success": True})
+        mutations = [
+            lambda: data.__setitem__("success", False),
+            lambda: data.__delitem__("success"),
+            lambda: data.update(success=False),
+            lambda: data.setdefault("message", ""),
+            lambda: data.pop("success"),
+            data.popitem,
+            data.clear,
+        ]
+        for mutate in mutations:
+            with self.assertRaises(TypeError):
+                mutate()
+        with self.assertRaises(TypeError):
+            data |= {"success": False}
+        self.assertEqual(data, {"success": True})
+        self.assertEqual(FastJSONRenderer().render(data), b'{"success":true}')
+
+
+class JWKSVerifierTests(SimpleTestCase):
+    def setUp(self):
+        self.private_key = rsa.generate_private_key(
+            public_exponent=65537,
+            key_size=2048
+        )
+        jwk = json.loads(
+            jwt.algorithms.RSAAlgorithm.to_jwk(self.private_key.public_key())
+        )
+        self.jwks = {"keys": [{**jwk, "kid": "k1", "alg": "RS256"}]}
+
+    def sign(self, token_type, kid="k1"):
+        return jwt.encode(
+            {"user_id": 1, "token_type": token_type},
+            self.private_key,
+            algorithm="RS256",
+            headers={"kid": kid}
+        )
+
+    def test_accepts_access_tokens_only(self):
+        verifier = JWKSVerifier(jwks=self.jwks)
+        self.assertEqual(verifier.verify(self.sign("access"))["user_id"], 1)
+        with self.assertRaises(jwt.InvalidTokenError):
+            verifier.verify(self.sign("refresh"))
+
+    def test_fetch_errors_are_invalid_token_errors(self):
+        verifier = JWKSVerifier("http://127.0.0.1:9/jwks.json", timeout=1)
+        with self.assertRaises(jwt.InvalidTokenError):
+            verifier.verify(self.sign("access"))
+
+    def test_known_keys_survive_failed_refresh(self):
+        verifier = JWKSVerifier(
+            "http://127.0.0.1:9/jwks.json",
+            jwks=self.jwks,
+            max_age=0,
+            timeout=1
+        )
+        self.assertEqual(verifier.verify(self.sign("access"))["user_id"], 1)
+
+
+class JWKSViewTests(SimpleTestCase):
+    url = "/.well-known/jwks.json"
+
+    def test_conditional_requests(self):
+        etag = self.client.get(self.url)["ETag"]
+        cases = [
+            (etag, 304),
+            (f'"other", {etag}', 304),
+            ("*", 304),
+            ('"other"', 200),
+            (f'"{etag}"', 200),
+        ]
+        for if_none_match, status_code in cases:
+            with self.subTest(if_none_match=if_none_match):
+                response = self.client.get(
+                    self.url,
+                    headers={"If-None-Match": if_none_match}
+                )
+                self.assertEqual(response.status_code, status_code)
+                self.assertEqual(response["ETag"], etag)
+
+
+class AvatarViewTests(SimpleTestCase):
+    content = bytes(range(256)) * 1024
+
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        os.makedirs(os.path.join(media_root.name, AVATAR_DIR))
+        with open(
+            os.path.join(media_root.name, AVATAR_DIR, "a.bin"),
+            "wb"
+        ) as f:
+            f.write(self.content)
+        overrides = override_settings(MEDIA_ROOT=media_root.name)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.url = f"{settings.MEDIA_URL}{AVATAR_DIR}/a.bin"
+
+    def test_range_is_streamed(self):
+        cases = [
+            ("bytes=10-99999", 10, 99999),
+            ("bytes=-5", len(self.content) - 5, len(self.content) - 1),
+            ("bytes=0-", 0, len(self.content) - 1),
+        ]
+        for range_header, start, end in cases:
+            with self.subTest(range_header=range_header):
+                response = self.client.get(
+                    self.url,
+                    headers={"Range": range_header}
+                )
+                self.assertEqual(response.status_code, 206)
+                self.assertTrue(response.streaming)
+                body = b"".join(response.streaming_content)
+                self.assertEqual(body, self.content[start:end + 1])
+                self.assertEqual(
+                    response["Content-Length"],
+                    str(end - start + 1)
+                )
+                self.assertEqual(
+                    response["Content-Range"],
+                    f"bytes {start}-{end}/{len(self.content)}"
+                )
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(
+            self.url,
+            headers={"Range": f"bytes={len(self.content)}-"}
+        )
+        self.assertEqual(response.status_code, 416)
+
+
+class TokenBucketTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch("users.throttling.time")
+        self.time = patcher.start()
+        self.time.time.return_value = 1000.0
+        self.addCleanup(patcher.stop)
+        caches["default"].clear()
+
+    def test_burst_then_rate(self):
+        bucket = TokenBucket("test", "60/min", burst=3)
+        self.assertEqual([bucket.consume("a") for _ in range(3)], [0, 0, 0])
+        self.assertEqual(bucket.consume("a"), 1.0)
+        # Denied requests do not push the bucket further back.
+        self.assertEqual(bucket.consume("a"), 1.0)
+        self.assertEqual(bucket.consume("b"), 0)
+
+        self.time.time.return_value = 1001.0
+        self.assertEqual(bucket.consume("a"), 0)
+        self.assertEqual(bucket.consume("a"), 1.0)
+
+        # An idle bucket refills up to the burst and no further.
+        self.time.time.return_value = 2000.0
+        self.assertEqual([bucket.consume("a") for _ in range(3)], [0, 0, 0])
+        self.assertGreater(bucket.consume("a"), 0)
+
+    def test_shared_level_spans_processes(self):
+        first = TokenBucket("test", "60/min", burst=2, cache_alias="default")
+        second = TokenBucket("test", "60/min", burst=2, cache_alias="default")
+        self.assertEqual([first.consume("a") for _ in range(2)], [0, 0])
+        self.assertEqual(second.consume("a"), 1.0)
+
+
+class ThrottleEndpointTests(TestCase):
+    login_url = "/api/auth/v1/login/"
+    refresh_url = "/api/auth/v1/refresh/"
+
+    def setUp(self):
+        overrides = override_settings(
+            THROTTLING={
+                **settings.THROTTLING,
+                "ENABLED": True,
+                "CACHE_ALIAS": None,
+                "RATES": {
+                    "login_ip": {"RATE": "1/min", "BURST": 2},
+                    "login_email": {"RATE": "100/min", "BURST": 100},
+                    "registration_ip": {"RATE": "1/min", "BURST": 1},
+                    "refresh_ip": {"RATE": "1/min", "BURST": 1},
+                },
+            },
+            REST_FRAMEWORK={**settings.REST_FRAMEWORK, "NUM_PROXIES": 0},
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        get_token_bucket.cache_clear()
+        self.addCleanup(get_token_bucket.cache_clear)
+
+    def login(self, url=login_url, **headers):
+        return self.client.post(
+            url,
+            {"email": "someone@example.com", "password": "wrong"},
+            content_type="application/json",
+            **headers
+        )
+
+    def assertThrottled(self, response):
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response["Retry-After"]), 0)
+
+    def test_login_is_throttled(self):
+        for url in (self.login_url, "/api/auth/v1/async/login/"):
+            with self.subTest(url=url):
+                get_token_bucket.cache_clear()
+                for _ in range(2):
+                    self.assertNotEqual(self.login(url).status_code, 429)
+                self.assertThrottled(self.login(url))
+
+    def test_refresh_is_throttled(self):
+        for url in (self.refresh_url, "/api/auth/v1/async/refresh/"):
+            with self.subTest(url=url):
+                get_token_bucket.cache_clear()
+                self.assertNotEqual(self.client.post(url).status_code, 429)
+                self.assertThrottled(self.client.post(url))
+
+    def test_forwarded_for_is_ignored_without_proxies(self):
+        for i in range(2):
+            self.login(HTTP_X_FORWARDED_FOR=f"203.0.113.{i}")
+        self.assertThrottled(self.login(HTTP_X_FORWARDED_FOR="203.0.113.9"))
+        response = self.login(REMOTE_ADDR="198.51.100.1")
+        self.assertNotEqual(response.status_code, 429)
+
+
+class BulkUserTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def call(self, *args):
+        call_command(*args, stdout=io.StringIO())
+
+    def test_round_trip(self):
+        for i in range(3):
+            CustomUsers.objects.create_user(
+                email=f"user{i}@example.com",
+                username=f"user{i}",
+                password=f"password{i}",
+                first_name=f"First {i}"
+            )
+        for file_format in ("csv", "jsonl"):
+            with self.subTest(file_format=file_format):
+                path = self.path(f"users.{file_format}")
+                self.call("export_users", path, "--with-password-hashes")
+                CustomUsers.objects.all().delete()
+
+                self.call("import_users", path, "--workers", "0")
+                for i in range(3):
+                    user = CustomUsers.objects.get(username=f"user{i}")
+                    self.assertEqual(user.email, f"user{i}@example.com")
+                    self.assertEqual(user.first_name, f"First {i}")
+                    self.assertTrue(user.check_password(f"password{i}"))
+
+    def test_rejects_leave_out_passwords(self):
+        CustomUsers.objects.create_user(
+            email="taken@example.com",
+            username="taken",
+            password="password"
+        )
+        source = self.path("users.jsonl")
+        with open(source, "w") as f:
+            for record in [
+                {"email": "TAKEN@example.com", "username": "other",
+                 "password": "secret"},
+                {"email": "not-an-email", "username": "invalid",
+                 "password_hash": "pbkdf2_sha256$1$salt$hash"},
+                {"email": "new@example.com", "username": "new",
+                 "password": "secret"},
+            ]:
+                f.write(json.dumps(record) + "\n")
+        rejects = self.path("rejects.jsonl")
+        self.call(
+            "import_users", source, "--workers", "0", "--rejects", rejects
+        )
+
+        self.assertTrue(CustomUsers.objects.filter(username="new").exists())
+        with open(rejects) as f:
+            records = list(read_records(f, "jsonl"))
+        self.assertCountEqual(
+            [record["username"] for record in records],
+            ["other", "invalid"]
+        )
+        for record in records:
+            self.assertTrue(record["error"])
+            self.assertNotIn("password", record)
+            self.assertNotIn("password_hash", record)
+
+    def test_rows_created_during_the_import_are_rejected(self):
+        CustomUsers.objects.create_user(
+            email="taken@example.com",
+            username="taken",
+            password="password"
+        )
+        rejected = []
+        importer = UserImporter(
+            reject=lambda record, reason: rejected.append(record["username"])
+        )
+        # As if the row appeared after each uniqueness check.
+        with mock.patch.object(
+            UserImporter,
+            "_taken",
+            return_value=(set(), set())
+        ):
+            result = importer.run([
+                {"email": "first@example.com", "username": "first"},
+                {"email": "taken@example.com", "username": "other"},
+                {"email": "last@example.com", "username": "last"},
+            ])
+
+        self.assertEqual(rejected, ["other"])
+        self.assertEqual((result.created, result.conflicts), (2, 1))
+        self.assertEqual(
+            set(CustomUsers.objects.values_list("username", flat=True)),
+            {"taken", "first", "last"}
+        )
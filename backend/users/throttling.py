@@ -0,0 +1,231 @@
+import hashlib
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.throttling import BaseThrottle
+
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_rate(rate: str) -> float:
+    """Parses a DRF style rate such as ``"20/min"`` into seconds per request."""
+    num, _, period = rate.partition("/")
+    try:
+        return PERIODS[period[0]] / int(num)
+    except (KeyError, IndexError, ValueError, ZeroDivisionError):
+        raise ImproperlyConfigured(f"Invalid throttle rate '{rate}'")
+
+
+class TokenBucket:
+    """
+    Token bucket limiter for one throttle scope.
+
+    Each key may spend up to ``burst`` requests at once, refilled at
+    ``rate``. The bucket is stored in its GCRA form, as the single
+    timestamp at which it will be full again, so a check is one read and
+    one write whatever the key.
+
+    The in-process level is an LRU used without a lock: each OrderedDict
+    operation is atomic under the GIL and a lost update between them
+    only lets through one extra request, which is harmless for a limiter. Keys
+    denied locally never reach the shared level, so an attack from one
+    client is shed without any network round trip. The optional shared
+    level is any Django cache backend and enforces the limit across
+    processes; its get/set is not atomic either, with the same outcome.
+    """
+    key_prefix = "users:throttle:"
+
+    def __init__(
+        self,
+        scope: str,
+        rate: str,
+        burst: int,
+        max_keys: int = 100_000,
+        cache_alias: Optional[str] = None,
+    ) -> None:
+        self.scope = scope
+        self.interval = parse_rate(rate)
+        self.tolerance = self.interval * (burst - 1)
+        self.max_keys = max_keys
+        self.cache_alias = cache_alias
+        self._buckets: "OrderedDict[str, float]" = OrderedDict()
+
+    @property
+    def shared(self):
+        if self.cache_alias is None:
+            return None
+        return caches[self.cache_alias]
+
+    def _shared_key(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode()).hexdigest()[:32]
+        return f"{self.key_prefix}{self.scope}:{digest}"
+
+    def _take(
+        self,
+        full_at: Optional[float],
+        now: float
+    ) -> Tuple[float, float]:
+        """
+        Returns the new full-at timestamp and the seconds to wait,
+        which is 0 when the request is allowed.
+        """
+        full_at = max(full_at or now, now)
+        wait = full_at - self.tolerance - now
+        if wait > 0:
+            return full_at, wait
+        return full_at + self.interval, 0.0
+
+    def _consume_local(self, key: str, now: float) -> float:
+        full_at, wait = self._take(self._buckets.get(key), now)
+        self._buckets[key] = full_at
+        try:
+            self._buckets.move_to_end(key)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        except KeyError:
+            # Evicted or cleared by another thread in the meantime.
+            pass
+        return wait
+
+    def consume(self, key: str) -> float:
+        """
+        Spends one request from the key's bucket.
+
+        Returns:
+            float: 0 if the request is allowed, otherwise the number
+                   of seconds until it would be.
+        """
+        now = time.time()
+        wait = self._consume_local(key, now)
+        shared = self.shared
+        if wait or shared is None:
+            return wait
+
+        shared_key = self._shared_key(key)
+        full_at, wait = self._take(shared.get(shared_key), now)
+        shared.set(shared_key, full_at, int(full_at - now) + 1)
+        return wait
+
+    async def aconsume(self, key: str) -> float:
+        """Async counterpart of ``consume``."""
+        now = time.time()
+        wait = self._consume_local(key, now)
+        shared = self.shared
+        if wait or shared is None:
+            return wait
+
+        shared_key = self._shared_key(key)
+        full_at, wait = self._take(await shared.aget(shared_key), now)
+        await shared.aset(shared_key, full_at, int(full_at - now) + 1)
+        return wait
+
+    def clear(self) -> None:
+        """Empties the in-process level."""
+        self._buckets.clear()
+
+
+@lru_cache(maxsize=None)
+def get_token_bucket(scope: str) -> Optional[TokenBucket]:
+    """
+    Returns the process-wide bucket for a scope of
+    ``settings.THROTTLING``, or None when throttling is disabled.
+    """
+    config = getattr(settings, "THROTTLING", {})
+    if not config.get("ENABLED", False):
+        return None
+    try:
+        rate = config["RATES"][scope]
+    except KeyError:
+        raise ImproperlyConfigured(f"No throttle rate set for '{scope}'")
+    return TokenBucket(
+        scope,
+        rate["RATE"],
+        rate["BURST"],
+        max_keys=config.get("MAX_KEYS", 100_000),
+        cache_alias=config.get("CACHE_ALIAS"),
+    )
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    DRF throttle backed by the ``TokenBucket`` of its ``scope``.
+
+    Subclasses choose what a bucket is keyed by; requests without
+    a key are not throttled.
+    """
+    scope: str = ""
+
+    def __init__(self) -> None:
+        self._wait = 0.0
+
+    def get_key(self, request, view) -> Optional[str]:
+        raise NotImplementedError
+
+    def allow_request(self, request, view) -> bool:
+        bucket = get_token_bucket(self.scope)
+        key = self.get_key(request, view) if bucket is not None else None
+        if key is None:
+            return True
+        self._wait = bucket.consume(key)
+        return not self._wait
+
+    async def aallow_request(self, request, view) -> bool:
+        """Async counterpart of ``allow_request``."""
+        bucket = get_token_bucket(self.scope)
+        key = self.get_key(request, view) if bucket is not None else None
+        if key is None:
+            return True
+        self._wait = await bucket.aconsume(key)
+        return not self._wait
+
+    def wait(self) -> Optional[float]:
+        return self._wait or None
+
+
+class IPThrottle(TokenBucketThrottle):
+    """
+    Throttles by client address.
+
+    ``REST_FRAMEWORK["NUM_PROXIES"]`` is set (0 by default), so the
+    address is ``REMOTE_ADDR`` or the one added to X-Forwarded-For by
+    the trusted proxies, never a value chosen by the client.
+    """
+    def get_key(self, request, view) -> Optional[str]:
+        return self.get_ident(request)
+
+
+class EmailThrottle(TokenBucketThrottle):
+    """
+    Throttles by the submitted email, which keeps one account from
+    being guessed at from many addresses.
+    """
+    def get_key(self, request, view) -> Optional[str]:
+        data = getattr(request, "data", None)
+        if data is None:
+            data = view.get_data(request)
+        email = data.get("email") if hasattr(data, "get") else None
+        if not isinstance(email, str) or not email:
+            return None
+        return email.strip().lower()
+
+
+class LoginIPThrottle(IPThrottle):
+    scope = "login_ip"
+
+
+class LoginEmailThrottle(EmailThrottle):
+    scope = "login_email"
+
+
+class RegistrationIPThrottle(IPThrottle):
+    scope = "registration_ip"
+
+
+class RefreshIPThrottle(IPThrottle):
+    scope = "refresh_ip"
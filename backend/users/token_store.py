@@ -0,0 +1,450 @@
+import asyncio
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Awaitable, Callable, Optional, Tuple
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from users.checks import is_process_local
+from users.models import RefreshTokenRecord
+
+
+class RevocationCache:
+    """
+    Bounded in-process set of revoked JTIs and token families.
+
+    Keys are kept until the token they describe expires, so a replayed
+    token is rejected without touching the database. The database stays
+    the source of truth; a miss here only means one indexed query.
+    """
+    def __init__(self, max_size: int = 100_000) -> None:
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+
+    def add(self, key: str, expires_at: float) -> None:
+        with self._lock:
+            self._entries[key] = expires_at
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            expires_at = self._entries.get(key)
+            if expires_at is None:
+                return False
+            if expires_at <= time.time():
+                del self._entries[key]
+                return False
+            self.hits += 1
+            return True
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RefreshTokenStore:
+    """
+    Server-side registry of issued refresh tokens.
+
+    Every refresh token is recorded when it is minted. Using it to
+    refresh marks it as rotated; presenting a rotated token again is
+    treated as theft and revokes its whole family, i.e. every token
+    descending from the same login. Logging out revokes the family too.
+
+    ``revoke_user`` revokes all refresh tokens of a user and rejects its
+    access tokens until they expire. Those revocations are published in
+    the ``revocation_cache_alias`` cache, which every process copies
+    into its ``RevocationCache`` at most once per ``sync_interval``
+    seconds, so access tokens are checked in memory.
+
+    The published revocations form an append-only log: each one claims
+    the next free numbered slot with ``add``, which never overwrites a
+    slot taken by another process, and a head key records the last
+    claimed slot. Readers remember the next slot they have not read.
+    """
+    family_claim = "family"
+    revoked_user_prefix = "users:revoked-user:"
+    revoked_users_head_key = "users:revoked-users:head"
+    scan_size = 100
+
+    def __init__(
+        self,
+        negative_cache_size: int = 100_000,
+        revocation_cache_alias: str = "default",
+        sync_interval: float = 1.0
+    ) -> None:
+        self.revoked = RevocationCache(max_size=negative_cache_size)
+        self.revocation_cache_alias = revocation_cache_alias
+        self.sync_interval = sync_interval
+        self._next_sync = 0.0
+        self._next_slot: Optional[int] = None
+
+    @property
+    def revocation_cache(self):
+        return caches[self.revocation_cache_alias]
+
+    def issue(self, token, user) -> None:
+        """Records a freshly minted refresh token."""
+        RefreshTokenRecord.objects.create(**self._record_fields(token, user))
+
+    async def aissue(self, token, user) -> None:
+        """Async counterpart of ``issue``."""
+        await RefreshTokenRecord.objects.acreate(
+            **self._record_fields(token, user)
+        )
+
+    def _record_fields(self, token, user) -> dict:
+        if self.family_claim not in token:
+            token[self.family_claim] = uuid.uuid4().hex
+        return {
+            "jti": token["jti"],
+            "family": token[self.family_claim],
+            "user": user,
+            "expires_at": datetime_from_epoch(token["exp"]),
+        }
+
+    def rotate(self, token) -> None:
+        """
+        Marks a refresh token as used.
+
+        Raises:
+            TokenError: If the token was already rotated or revoked. A
+                        rotated token being reused revokes its family.
+        """
+        jti = token["jti"]
+        family = token.get(self.family_claim)
+        if family is None:
+            # Issued before the store existed: accept it once,
+            # the rotated token continues its recorded family.
+            family, replayed = self._record_untracked(token)
+            if replayed:
+                self._revoke(family, token["exp"])
+                raise TokenError("Token is revoked")
+            return
+
+        if f"family:{family}" in self.revoked:
+            raise TokenError("Token is revoked")
+        if f"jti:{jti}" in self.revoked:
+            self.revoke_family(token)
+            raise TokenError("Token is revoked")
+
+        rotated = RefreshTokenRecord.objects.filter(
+            jti=jti,
+            revoked_at__isnull=True
+        ).update(revoked_at=timezone.now())
+
+        if not rotated:
+            # Unknown, rotated or revoked: a replayed token either way.
+            self.revoke_family(token)
+            raise TokenError("Token is revoked")
+
+        self.revoked.add(f"jti:{jti}", token["exp"])
+
+    def revoke_family(self, token) -> int:
+        """Revokes every live token of the token's family."""
+        family = token.get(self.family_claim)
+        if family is None:
+            family, _ = self._record_untracked(token)
+        return self._revoke(family, token["exp"])
+
+    def _revoke(self, family: str, expires_at: float) -> int:
+        self.revoked.add(f"family:{family}", expires_at)
+        return RefreshTokenRecord.objects.filter(
+            family=family,
+            revoked_at__isnull=True
+        ).update(revoked_at=timezone.now())
+
+    def _record_untracked(self, token) -> Tuple[str, bool]:
+        """
+        Records a token issued before the store existed, as revoked.
+
+        The token gets a new family, which the token rotated from it
+        continues, so replaying it revokes its descendants.
+
+        Returns:
+            Tuple[str, bool]: The token's family and whether it had
+                              been recorded before, i.e. is replayed.
+        """
+        jti = token["jti"]
+        self.revoked.add(f"jti:{jti}", token["exp"])
+        family = uuid.uuid4().hex
+        try:
+            with transaction.atomic():
+                RefreshTokenRecord.objects.create(
+                    jti=jti,
+                    family=family,
+                    user_id=token[api_settings.USER_ID_CLAIM],
+                    expires_at=datetime_from_epoch(token["exp"]),
+                    revoked_at=timezone.now()
+                )
+        except IntegrityError:
+            recorded = (
+                RefreshTokenRecord.objects
+                .filter(jti=jti)
+                .values_list("family", flat=True)
+                .first()
+            )
+            if recorded is not None:
+                return recorded.hex, True
+            raise TokenError("Token is revoked")
+        token[self.family_claim] = family
+        return family, False
+
+    def revoke_user(self, user_id: Any) -> int:
+        """
+        Revokes every refresh token of a user and, until they expire,
+        its access tokens.
+
+        Returns:
+            int: The number of revoked refresh tokens.
+        """
+        lifetime = api_settings.ACCESS_TOKEN_LIFETIME.total_seconds()
+        expires_at = time.time() + lifetime
+        self.revoked.add(f"user:{user_id}", expires_at)
+        cache = self.revocation_cache
+        slot = (cache.get(self.revoked_users_head_key) or 0) + 1
+        while not cache.add(
+            self._slot_key(slot),
+            (user_id, expires_at),
+            lifetime
+        ):
+            slot += 1
+        # Only a hint for readers; it may briefly lag behind the slots.
+        cache.set(self.revoked_users_head_key, slot, None)
+        return RefreshTokenRecord.objects.filter(
+            user_id=user_id,
+            revoked_at__isnull=True
+        ).update(revoked_at=timezone.now())
+
+    def is_user_revoked(self, user_id: Any) -> bool:
+        """Whether ``revoke_user`` was called for the user, in memory."""
+        return f"user:{user_id}" in self.revoked
+
+    def _slot_key(self, slot: int) -> str:
+        return f"{self.revoked_user_prefix}{slot}"
+
+    def _sync_due(self) -> bool:
+        if is_process_local(self.revocation_cache_alias):
+            # Every revocation was added to this process's cache.
+            return False
+        now = time.monotonic()
+        if now < self._next_sync:
+            return False
+        self._next_sync = now + self.sync_interval
+        return True
+
+    def _read_slots(self, cache, slots: range) -> dict:
+        """Copies the given slots into memory and returns those found."""
+        entries = cache.get_many([self._slot_key(slot) for slot in slots])
+        for user_id, expires_at in entries.values():
+            self.revoked.add(f"user:{user_id}", expires_at)
+        return entries
+
+    def _sync_revoked_users(self) -> None:
+        cache = self.revocation_cache
+        head = cache.get(self.revoked_users_head_key)
+        if head is None:
+            self._next_slot = None
+            return
+
+        if self._next_slot is None or head < self._next_slot - 1:
+            # First sync, or the log was restarted: read back from the
+            # head until the slots have expired.
+            end = head
+            while end > 0:
+                slots = range(max(end - self.scan_size, 0) + 1, end + 1)
+                if len(self._read_slots(cache, slots)) < len(slots):
+                    break
+                end = slots.start - 1
+            self._next_slot = head + 1
+
+        # Then forward up to the first free slot past the head. Free
+        # slots before it have expired.
+        while True:
+            slots = range(self._next_slot, self._next_slot + self.scan_size)
+            entries = self._read_slots(cache, slots)
+            for slot in slots:
+                if slot > head and self._slot_key(slot) not in entries:
+                    self._next_slot = slot
+                    return
+            self._next_slot = slots.stop
+
+    def load_revoked_users(self) -> None:
+        """Copies the users revoked by other processes into memory."""
+        if self._sync_due():
+            self._sync_revoked_users()
+
+    async def aload_revoked_users(self) -> None:
+        """Async counterpart of ``load_revoked_users``."""
+        if self._sync_due():
+            await sync_to_async(self._sync_revoked_users)()
+
+    arotate = sync_to_async(rotate)
+    arevoke_family = sync_to_async(revoke_family)
+
+    def sweep(self, batch_size: int = 10_000, pause: float = 0.0) -> int:
+        """
+        Deletes expired token records in bounded chunks.
+
+        Each chunk selects primary keys through the ``expires_at`` index
+        and deletes them by key, so no statement holds locks on more than
+        ``batch_size`` rows.
+
+        Returns:
+            int: The number of deleted records.
+        """
+        deleted = 0
+        now = timezone.now()
+        while True:
+            jtis = list(
+                RefreshTokenRecord.objects
+                .filter(expires_at__lt=now)
+                .values_list("jti", flat=True)[:batch_size]
+            )
+            if not jtis:
+                break
+            count, _ = RefreshTokenRecord.objects.filter(jti__in=jtis).delete()
+            deleted += count
+            if pause:
+                time.sleep(pause)
+        return deleted
+
+
+class RefreshGraceWindow:
+    """
+    Coalesces near-simultaneous refreshes of the same refresh token.
+
+    When an access token expires, every open tab (and the Next.js
+    middleware) refreshes with the same cookie at nearly the same moment.
+    The first request rotates the token and publishes the new pair in a
+    shared cache for ``window`` seconds; the others wait for it and get
+    the same pair back instead of being treated as token reuse. With a
+    shared cache backend (Redis, Memcached) this works across processes.
+    """
+    key_prefix = "users:refresh-grace:"
+
+    def __init__(
+        self,
+        window: float = 10.0,
+        cache_alias: str = "default",
+        poll_interval: float = 0.02
+    ) -> None:
+        self.window = window
+        self.cache_alias = cache_alias
+        self.poll_interval = poll_interval
+        self.coalesced = 0
+
+    @property
+    def cache(self):
+        return caches[self.cache_alias]
+
+    def run(self, token, mint: Callable[[], dict]) -> dict:
+        """
+        Returns the pair minted for ``token`` within the window,
+        or calls ``mint`` to rotate it.
+        """
+        if not self.window:
+            return mint()
+
+        key = f"{self.key_prefix}{token['jti']}"
+        lock_key = f"{key}:lock"
+        cache = self.cache
+
+        result = cache.get(key)
+        if result is not None:
+            self.coalesced += 1
+            return result
+
+        if cache.add(lock_key, 1, self.window):
+            try:
+                result = mint()
+                cache.set(key, result, self.window)
+                return result
+            finally:
+                cache.delete(lock_key)
+
+        deadline = time.monotonic() + self.window
+        while time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            result = cache.get(key)
+            if result is not None:
+                self.coalesced += 1
+                return result
+            if cache.get(lock_key) is None:
+                break
+        # The first request failed or timed out: rotate ourselves so the
+        # store reports the real error (usually a revoked token).
+        return mint()
+
+    async def arun(self, token, mint: Callable[[], Awaitable[dict]]) -> dict:
+        """Async counterpart of ``run``."""
+        if not self.window:
+            return await mint()
+
+        key = f"{self.key_prefix}{token['jti']}"
+        lock_key = f"{key}:lock"
+        cache = self.cache
+
+        result = await cache.aget(key)
+        if result is not None:
+            self.coalesced += 1
+            return result
+
+        if await cache.aadd(lock_key, 1, self.window):
+            try:
+                result = await mint()
+                await cache.aset(key, result, self.window)
+                return result
+            finally:
+                await cache.adelete(lock_key)
+
+        deadline = time.monotonic() + self.window
+        while time.monotonic() < deadline:
+            await asyncio.sleep(self.poll_interval)
+            result = await cache.aget(key)
+            if result is not None:
+                self.coalesced += 1
+                return result
+            if await cache.aget(lock_key) is None:
+                break
+        return await mint()
+
+
+@lru_cache(maxsize=None)
+def get_refresh_token_store() -> RefreshTokenStore:
+    """
+    Returns the process-wide refresh token store configured by
+    ``settings.REFRESH_TOKEN_STORE``.
+    """
+    config = getattr(settings, "REFRESH_TOKEN_STORE", {})
+    return RefreshTokenStore(
+        negative_cache_size=config.get("NEGATIVE_CACHE_SIZE", 100_000),
+        revocation_cache_alias=config.get("REVOCATION_CACHE_ALIAS", "default"),
+        sync_interval=config.get("REVOCATION_SYNC_INTERVAL", 1.0)
+    )
+
+
+@lru_cache(maxsize=None)
+def get_refresh_grace_window() -> RefreshGraceWindow:
+    """
+    Returns the process-wide refresh grace window configured by
+    ``settings.REFRESH_TOKEN_STORE``.
+    """
+    config = getattr(settings, "REFRESH_TOKEN_STORE", {})
+    return RefreshGraceWindow(
+        window=config.get("GRACE_WINDOW", 10),
+        cache_alias=config.get("GRACE_CACHE_ALIAS", "default")
+    )
+
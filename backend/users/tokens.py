@@ -0,0 +1,78 @@
+from typing import Optional
+
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from users.keys import get_token_backend
+from users.token_store import get_refresh_token_store
+
+
+USER_CLAIMS = ("email", "username", "is_staff", "is_active")
+
+
+class UserAccessToken(AccessToken):
+    """
+    Access token signed and verified by the ``users.keys`` token backend,
+    which supports ``kid``-tagged asymmetric keys.
+    """
+    def get_token_backend(self):
+        return get_token_backend()
+
+
+class UserRefreshToken(RefreshToken):
+    """
+    Refresh token that embeds basic user attributes as claims.
+
+    The claims are copied into every access token derived from it,
+    which lets ``CookieJWTClaimsAuthentication`` build the request user
+    without a database query. Every minted token is recorded in the
+    refresh token store, like simplejwt's own blacklist app does.
+    """
+    access_token_class = UserAccessToken
+
+    def get_token_backend(self):
+        return get_token_backend()
+
+    @classmethod
+    def _build(cls, user, family=None) -> "UserRefreshToken":
+        token = super().for_user(user)
+        for claim in USER_CLAIMS:
+            token[claim] = getattr(user, claim)
+        if family is not None:
+            token[get_refresh_token_store().family_claim] = family
+        return token  # pyright: ignore
+
+    @classmethod
+    def for_user(cls, user, family=None) -> "UserRefreshToken":
+        """
+        Returns a recorded refresh token for the user.
+
+        Args:
+            user: The user the token is issued for.
+            family: The family of the rotated token, or None
+                    to start a new family (a new login).
+        """
+        token = cls._build(user, family)
+        get_refresh_token_store().issue(token, user)
+        return token
+
+    @classmethod
+    async def afor_user(cls, user, family=None) -> "UserRefreshToken":
+        """Async counterpart of ``for_user``."""
+        token = cls._build(user, family)
+        await get_refresh_token_store().aissue(token, user)
+        return token
+
+
+def decode_refresh_cookie(request) -> Optional[UserRefreshToken]:
+    """
+    Returns the validated refresh token from the request cookies,
+    or None when it is missing or invalid.
+    """
+    raw_token = request.COOKIES.get("refresh_token")
+    if not raw_token:
+        return None
+    try:
+        return UserRefreshToken(raw_token)  # pyright: ignore
+    except TokenError:
+        return None
@@ -1,11 +1,18 @@
 from django.urls import path
+from users.async_views import (
+    AsyncCurrentUserView,
+    AsyncLoginView,
+    AsyncLogoutView,
+    AsyncRefreshTokenView
+)
 from users.views import (
     DeleteUserView,
     LoginView,
     RefreshTokenView,
     LogoutView,
     CurrentUserView,
-    RegistrationView
+    RegistrationView,
+    VerifyTokenView
 )
 
 
@@ -14,6 +21,17 @@ urlpatterns = [
     path('v1/login/', LoginView.as_view(), name='login'),
     path('v1/refresh/', RefreshTokenView.as_view(), name='refresh_token'),
     path('v1/logout/', LogoutView.as_view(), name='logout'),
+    path('v1/verify/', VerifyTokenView.as_view(), name='verify_token'),
     path('v1/users/', CurrentUserView.as_view(), name='users'),
-    path("v1/users/delete/", DeleteUserView.as_view(), name="delete_user")
+    path("v1/users/delete/", DeleteUserView.as_view(), name="delete_user"),
+
+    # Async endpoints for deployments served through backend.asgi.
+    path('v1/async/login/', AsyncLoginView.as_view(), name='async_login'),
+    path(
+        'v1/async/refresh/',
+        AsyncRefreshTokenView.as_view(),
+        name='async_refresh_token'
+    ),
+    path('v1/async/logout/', AsyncLogoutView.as_view(), name='async_logout'),
+    path('v1/async/users/', AsyncCurrentUserView.as_view(), name='async_users'),
 ]
@@ -0,0 +1,137 @@
+"""
+Standalone verifier for access tokens issued by this app.
+
+Only depends on PyJWT (with cryptography), so downstream Python services
+can copy or import it without Django:
+
+    verifier = JWKSVerifier("https://auth.example.com/.well-known/jwks.json")
+    claims = verifier.verify(token)
+"""
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+from typing import Any, Dict, Iterable, Optional
+
+import jwt
+
+
+class JWKSVerifier:
+    """
+    Verifies JWTs against a JWKS, caching parsed public keys by ``kid``.
+
+    The key set is fetched once and then only refreshed when a token
+    names an unknown ``kid`` (key rotation) or the cache is older than
+    ``max_age``; refreshes are rate-limited by ``min_refresh_interval``
+    so tokens with bogus ``kid`` values cannot trigger a fetch storm.
+    Only tokens whose ``token_type`` claim matches ``token_type`` are
+    accepted, so refresh tokens do not pass as access tokens.
+    """
+    def __init__(
+        self,
+        jwks_url: Optional[str] = None,
+        jwks: Optional[Dict[str, Any]] = None,
+        algorithms: Iterable[str] = ("RS256", "EdDSA"),
+        max_age: float = 3600,
+        min_refresh_interval: float = 30,
+        timeout: float = 5,
+        audience: Optional[str] = None,
+        issuer: Optional[str] = None,
+        token_type: str = "access"
+    ) -> None:
+        if jwks_url is None and jwks is None:
+            raise ValueError("Either jwks_url or jwks must be provided")
+        self.jwks_url = jwks_url
+        self.algorithms = list(algorithms)
+        self.max_age = max_age
+        self.min_refresh_interval = min_refresh_interval
+        self.timeout = timeout
+        self.audience = audience
+        self.issuer = issuer
+        self.token_type = token_type
+        self._keys: Dict[str, Any] = {}
+        self._fetched_at = float("-inf")
+        self._attempted_at = float("-inf")
+        self._lock = threading.Lock()
+        if jwks is not None:
+            self._load(jwks)
+
+    def _load(self, jwks: Dict[str, Any]) -> None:
+        keys = {}
+        for data in jwks.get("keys", []):
+            jwk = jwt.PyJWK.from_dict(data)
+            keys[jwk.key_id] = jwk.key
+        self._keys = keys
+        self._fetched_at = time.monotonic()
+
+    def refresh(self) -> None:
+        """
+        Fetches the key set from ``jwks_url``.
+
+        Raises:
+            jwt.InvalidTokenError: If the key set cannot be fetched
+                                   or parsed.
+        """
+        if self.jwks_url is None:
+            return
+        self._attempted_at = time.monotonic()
+        try:
+            with urllib.request.urlopen(
+                self.jwks_url,
+                timeout=self.timeout
+            ) as r:
+                self._load(json.load(r))
+        except (
+            urllib.error.URLError, OSError, ValueError, jwt.PyJWKError
+        ) as e:
+            raise jwt.InvalidTokenError(f"Cannot fetch the key set: {e}") from e
+
+    def get_key(self, kid: Optional[str]):
+        """
+        Returns the public key for ``kid``, refreshing the set if needed.
+
+        A key that is already known stays usable while the key set
+        cannot be fetched.
+        """
+        age = time.monotonic() - self._fetched_at
+        key = self._keys.get(kid)
+        if key is not None and age < self.max_age:
+            return key
+
+        with self._lock:
+            since_attempt = time.monotonic() - self._attempted_at
+            if since_attempt >= self.min_refresh_interval:
+                try:
+                    self.refresh()
+                except jwt.InvalidTokenError:
+                    if key is None:
+                        raise
+        key = self._keys.get(kid)
+        if key is None:
+            raise jwt.InvalidTokenError(f"Unknown signing key '{kid}'")
+        return key
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        """
+        Verifies the token signature, expiry and type and returns its
+        claims.
+
+        Raises:
+            jwt.InvalidTokenError: If the token is invalid, expired or
+                                   not of ``token_type``.
+        """
+        kid = jwt.get_unverified_header(token).get("kid")
+        claims = jwt.decode(
+            token,
+            self.get_key(kid),
+            algorithms=self.algorithms,
+            audience=self.audience,
+            issuer=self.issuer,
+            options={"verify_aud": self.audience is not None},
+        )
+        if claims.get("token_type") != self.token_type:
+            raise jwt.InvalidTokenError(
+                f"Expected a '{self.token_type}' token"
+            )
+        return claims
@@ -1,13 +1,42 @@
-from typing import Optional, cast
+import hmac
+import mimetypes
+import os
+import stat
+import time
+from typing import Iterator, Optional, Tuple, cast
+from urllib.parse import quote
 
 from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils._os import safe_join
+from django.utils.http import http_date
+from django.views import View
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.parsers import MultiPartParser, FormParser
-
+from rest_framework_simplejwt.exceptions import InvalidToken
+
+from users.authentication import CookieJWTAuthentication
+from users.avatars import AVATAR_DIR, VARIANT_RE
+from users.cache import get_representation_cache
+from users.deletion import get_account_deleter
+from users.keys import get_key_ring
+from users.metrics import expose_stats, get_metrics
+from users.renderers import EncodedJSON
+from users.routers import read_from_replica
+from users.throttling import (
+    LoginEmailThrottle,
+    LoginIPThrottle,
+    RefreshIPThrottle,
+    RegistrationIPThrottle
+)
 from users.types import LoginValidatedData, RefreshValidatedData
+from users.tokens import decode_refresh_cookie
+from users.token_store import get_refresh_token_store
 from users.serializers import (
     RegistrationSerializer,
     LoginSerializer,
@@ -16,6 +45,56 @@ from users.serializers import (
 )
 
 
+EMPTY_JWKS = b'{"keys":[]}'
+EMPTY_JWKS_ETAG = '"empty"'
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Constant response bodies, encoded once.
+REGISTRATION_SUCCESS = EncodedJSON(
+    {"success": True, "message": "Registration successful"}
+)
+LOGIN_SUCCESS = EncodedJSON(
+    {"success": True, "message": "Login successful"}
+)
+REFRESH_SUCCESS = EncodedJSON(
+    {"success": True, "message": "Token successfully refreshed"}
+)
+LOGOUT_SUCCESS = EncodedJSON(
+    {"success": True, "message": "You have successfully logged out"}
+)
+DELETION_SUCCESS = EncodedJSON(
+    {"success": True, "message": "Your account has been deleted"}
+)
+
+
+def set_user_validators(response, user) -> None:
+    """
+    Sets the ETag and Last-Modified headers of a user representation.
+
+    ``no-cache`` lets the browser keep the response but makes it
+    revalidate on every request, which is answered with a 304 as long
+    as the profile has not changed.
+    """
+    response["ETag"] = user.etag
+    response["Last-Modified"] = http_date(user.updated_at.timestamp())
+    patch_cache_control(response, private=True, no_cache=True)
+
+
+def get_not_modified_response(request, user) -> Optional[HttpResponse]:
+    """
+    Returns a body-less 304 response when the request's validators
+    match the user's current version, or None.
+    """
+    response = get_conditional_response(
+        request,
+        etag=user.etag,
+        last_modified=int(user.updated_at.timestamp())
+    )
+    if response is not None:
+        set_user_validators(response, user)
+    return response
+
+
 class RegistrationView(APIView):
     """
     API endpoint for user registration.
@@ -25,6 +104,7 @@ class RegistrationView(APIView):
     """
     authentication_classes = []
     permission_classes = [AllowAny]
+    throttle_classes = [RegistrationIPThrottle]
 
     def post(self, request, *args, **kwargs) -> Response:
         """
@@ -42,7 +122,7 @@ class RegistrationView(APIView):
         if serializer.is_valid():
             serializer.save()
             return Response(
-                {"success": True, "message": "Registration successful"},
+                REGISTRATION_SUCCESS,
                 status=status.HTTP_201_CREATED
             )
         return Response(
@@ -61,6 +141,7 @@ class LoginView(APIView):
     """
     authentication_classes = []
     permission_classes = [AllowAny]
+    throttle_classes = [LoginIPThrottle, LoginEmailThrottle]
     
     def post(self, request, *args, **kwargs) -> Response:
         """
@@ -89,7 +170,7 @@ class LoginView(APIView):
         refresh_token: str = validated_data['refresh']
         
         response = Response(
-            {"success": True, "message": "Login successful"},
+            LOGIN_SUCCESS,
             status=status.HTTP_200_OK
         )
         
@@ -123,6 +204,7 @@ class RefreshTokenView(APIView):
     It updates the HttpOnly cookies with the new tokens.
     """
     permission_classes = [AllowAny]
+    throttle_classes = [RefreshIPThrottle]
     
     def post(self, request, *args, **kwargs) -> Response:
         """
@@ -164,7 +246,7 @@ class RefreshTokenView(APIView):
         new_refresh_token: str = validated_data['refresh']
         
         response = Response(
-            {"success": True, "message": "Token successfully refreshed"},
+            REFRESH_SUCCESS,
             status=status.HTTP_200_OK
         )
         
@@ -192,9 +274,14 @@ class LogoutView(APIView):
     """
     API endpoint for logging out a user.
 
-    This view deletes the 'access_token' and 'refresh_token'
-    cookies to log the user out.
+    This view revokes the refresh token family in the refresh token
+    store and deletes the 'access_token' and 'refresh_token'
+    cookies to log the user out. It relies on the refresh cookie alone,
+    so a client whose access token expired can still log out.
     """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
     def post(self, request) -> Response:
         """
         Logs out the user.
@@ -209,8 +296,12 @@ class LogoutView(APIView):
         Returns:
             Response: A JSON response with a success message and status 200.
         """
+        refresh = decode_refresh_cookie(request)
+        if refresh is not None:
+            get_refresh_token_store().revoke_family(refresh)
+
         response = Response(
-            {"success": True, "message": "You have successfully logged out"},
+            LOGOUT_SUCCESS,
             status=status.HTTP_200_OK
         )
         response.delete_cookie('access_token')
@@ -223,6 +314,9 @@ class CurrentUserView(APIView):
     API endpoint for retrieving the authenticated user's data.
 
     This endpoint returns the details of the currently authenticated user.
+    Responses carry a strong ETag and Last-Modified derived from the
+    user's ``updated_at``, so polling clients revalidate with
+    If-None-Match and receive a 304 without the profile being serialized.
     """
     permission_classes = [IsAuthenticated]
     parser_classes = [MultiPartParser, FormParser]
@@ -232,17 +326,35 @@ class CurrentUserView(APIView):
         Retrieves the authenticated user's data.
 
         This method serializes and returns the currently
-        authenticated user's data.
+        authenticated user's data. The serialized data is cached
+        per user version.
 
         Args:
             request: The HTTP request object.
 
         Returns:
             Response: A JSON response containing
-                      the user's data with status 200.
+                      the user's data with status 200, or an empty
+                      response with status 304 if the client's copy
+                      is still current.
         """
-        serializer = UserSerializer(request.user, context={"request": request})
-        return Response(serializer.data, status=200)
+        user = request.user
+        not_modified = get_not_modified_response(request, user)
+        if not_modified is not None:
+            return not_modified
+
+        def serialize() -> dict:
+            return UserSerializer(user, context={"request": request}).data
+
+        cache = get_representation_cache()
+        with read_from_replica(user.pk):
+            data = (
+                cache.get_or_set(user, request, serialize)
+                if cache is not None else serialize()
+            )
+        response = Response(data, status=200)
+        set_user_validators(response, user)
+        return response
 
     def put(self, request):
         """
@@ -251,7 +363,9 @@ class CurrentUserView(APIView):
         serializer = UserSerializer(request.user, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
         serializer.save()
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        response = Response(serializer.data, status=status.HTTP_200_OK)
+        set_user_validators(response, request.user)
+        return response
 
 
 class DeleteUserView(APIView):
@@ -259,6 +373,9 @@ class DeleteUserView(APIView):
     API endpoint for deleting the authenticated user's account.
 
     This view allows a user to delete their own account permanently.
+    The account is deactivated on the spot and purged in the background
+    (see users/deletion.py), so the response does not depend on how
+    much data the user owns.
     """
     permission_classes = [IsAuthenticated]
 
@@ -272,9 +389,315 @@ class DeleteUserView(APIView):
         Returns:
             Response: A JSON response with a success message and status 204.
         """
-        user = request.user
-        user.delete()
+        get_account_deleter().schedule(request.user)
         return Response(
-            {"success": True, "message": "Your account has been deleted"},
+            DELETION_SUCCESS,
             status=status.HTTP_204_NO_CONTENT
         )
+
+
+class VerifyTokenView(APIView):
+    """
+    API endpoint for checking the access token cookie.
+
+    Intended for edge checks such as the Next.js middleware: the token is
+    validated (usually straight from the token cache) without a database
+    query or a serializer, and the answer is an empty response.
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def get(self, request) -> Response:
+        """
+        Verifies the access token from cookies.
+
+        Args:
+            request: The HTTP request object.
+
+        Returns:
+            Response: An empty response with status 204 and the remaining
+                      token lifetime in seconds in the `X-Token-Expires-In`
+                      header, or status 401 if the token is missing
+                      or invalid.
+        """
+        access_token = request.COOKIES.get('access_token')
+        if not access_token:
+            return Response(status=status.HTTP_401_UNAUTHORIZED)
+
+        try:
+            validated_token = CookieJWTAuthentication().get_validated_token(
+                access_token
+            )
+        except InvalidToken:
+            return Response(status=status.HTTP_401_UNAUTHORIZED)
+
+        expires_in = max(int(validated_token["exp"] - time.time()), 0)
+        return Response(
+            status=status.HTTP_204_NO_CONTENT,
+            headers={
+                "X-Token-Expires-In": str(expires_in),
+                "Cache-Control": "no-store",
+            }
+        )
+
+
+class JWKSView(APIView):
+    """
+    API endpoint publishing the public token signing keys as a JWKS.
+
+    Lets other services verify access tokens locally (for example with
+    ``users.verifier.JWKSVerifier``) instead of sharing the secret or
+    calling back into this app. The body only changes when keys are
+    rotated, so it is served with long-lived caching headers and an ETag.
+    """
+    authentication_classes = []
+    permission_classes = [AllowAny]
+
+    def get(self, request) -> HttpResponse:
+        """
+        Returns the JSON Web Key Set.
+
+        Args:
+            request: The HTTP request object.
+
+        Returns:
+            HttpResponse: The JWKS with status 200, or an empty response
+                          with status 304 if the client's copy is current.
+        """
+        key_ring = get_key_ring()
+        body, etag = (
+            (key_ring.jwks_json, key_ring.jwks_etag)
+            if key_ring is not None else (EMPTY_JWKS, EMPTY_JWKS_ETAG)
+        )
+
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = HttpResponse(body, content_type="application/json")
+        response["ETag"] = etag
+        response["Cache-Control"] = (
+            "public, max-age=3600, stale-while-revalidate=86400"
+        )
+        return response
+
+
+class MetricsView(View):
+    """
+    Serves the request histograms and cache/pool counters of this
+    process in the Prometheus text format.
+
+    Returns 404 while ``METRICS["ENABLED"]`` is off. When
+    ``METRICS["AUTH_TOKEN"]`` is set, scrapers must send it as a
+    bearer token.
+    """
+    def get(self, request) -> HttpResponse:
+        """
+        Returns the metrics exposition.
+
+        Args:
+            request: The HTTP request object.
+
+        Returns:
+            HttpResponse: The metrics with status 200, or status 401 if the
+                          bearer token is missing or wrong.
+
+        Raises:
+            Http404: If metrics are disabled.
+        """
+        metrics = get_metrics()
+        if metrics is None:
+            raise Http404("Metrics are disabled")
+
+        token = settings.METRICS.get("AUTH_TOKEN")
+        if token and not hmac.compare_digest(
+            request.headers.get("Authorization", "").encode(),
+            f"Bearer {token}".encode()
+        ):
+            return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+
+        body = "\n".join([*metrics.expose(), *expose_stats()]) + "\n"
+        response = HttpResponse(body, content_type=PROMETHEUS_CONTENT_TYPE)
+        response["Cache-Control"] = "no-store"
+        return response
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parses a single-range ``Range`` header into inclusive offsets.
+
+    Returns None for headers this view does not support (other units,
+    multiple ranges, malformed values), which are answered with the
+    whole file as RFC 9110 allows.
+
+    Raises:
+        ValueError: If the range cannot be satisfied.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip() != "bytes" or "," in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    try:
+        if not first:
+            # Suffix range: the last N bytes.
+            start, end = max(size - int(last), 0), size - 1
+        else:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+    except ValueError:
+        return None
+    if start > end or start >= size:
+        raise ValueError(header)
+    return start, end
+
+
+def iter_file_range(
+    f,
+    length: int,
+    chunk_size: int = FileResponse.block_size
+) -> Iterator[bytes]:
+    """
+    Yields the next ``length`` bytes of the open file ``f`` in chunks of
+    at most ``chunk_size`` bytes, then closes the file.
+    """
+    try:
+        while length > 0:
+            chunk = f.read(min(chunk_size, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        f.close()
+
+
+class AvatarView(View):
+    """
+    Endpoint serving avatar files from ``MEDIA_ROOT/avatars``.
+
+    With ``MEDIA_SERVING["BACKEND"]`` set to ``"nginx"`` or ``"apache"``
+    the view only resolves the file and checks access, then hands the
+    transfer to the front proxy through ``X-Accel-Redirect`` or
+    ``X-Sendfile``. Without a proxy the file is sent as a FileResponse,
+    which WSGI servers pass to ``sendfile()``, with ETag, Range and
+    long-lived caching support. Content-addressed avatar variants never
+    change, so they are also marked immutable.
+    """
+    def get(self, request, name: str) -> HttpResponse:
+        """
+        Serves an avatar file.
+
+        Args:
+            request: The HTTP request object.
+            name: The path of the file relative to the avatar directory.
+
+        Returns:
+            HttpResponse: The file with status 200 or 206, an empty
+                          response with status 304, 412 or 416 for
+                          conditional and range requests, or status 401
+                          if access requires a valid access token.
+
+        Raises:
+            Http404: If the file does not exist.
+        """
+        config = settings.MEDIA_SERVING
+        if config["REQUIRE_AUTH"] and not self.has_valid_token(request):
+            return HttpResponse(status=status.HTTP_401_UNAUTHORIZED)
+
+        try:
+            path = safe_join(settings.MEDIA_ROOT, AVATAR_DIR, name)
+            file_stat = os.stat(path)
+        except (SuspiciousFileOperation, OSError):
+            raise Http404("Avatar not found")
+        if not stat.S_ISREG(file_stat.st_mode):
+            raise Http404("Avatar not found")
+
+        content_type = (
+            mimetypes.guess_type(path)[0] or "application/octet-stream"
+        )
+        if config["BACKEND"] == "nginx":
+            response = HttpResponse(content_type=content_type)
+            response["X-Accel-Redirect"] = (
+                f"{config['ACCEL_PREFIX']}{AVATAR_DIR}/{quote(name)}"
+            )
+        elif config["BACKEND"] == "apache":
+            response = HttpResponse(content_type=content_type)
+            response["X-Sendfile"] = path
+        else:
+            response = self.serve(request, path, file_stat, content_type)
+
+        cache_control = [
+            "private" if config["REQUIRE_AUTH"] else "public",
+            f"max-age={config['MAX_AGE']}",
+        ]
+        if VARIANT_RE.match(f"{AVATAR_DIR}/{name}"):
+            cache_control.append("immutable")
+        response["Cache-Control"] = ", ".join(cache_control)
+        return response
+
+    @staticmethod
+    def has_valid_token(request) -> bool:
+        access_token = request.COOKIES.get('access_token')
+        if not access_token:
+            return False
+        try:
+            CookieJWTAuthentication().get_validated_token(access_token)
+        except InvalidToken:
+            return False
+        return True
+
+    @staticmethod
+    def serve(
+        request,
+        path: str,
+        file_stat: os.stat_result,
+        content_type: str
+    ) -> HttpResponse:
+        """Sends the file itself, honouring conditional and range requests."""
+        size = file_stat.st_size
+        etag = f'"{file_stat.st_mtime_ns:x}-{size:x}"'
+        last_modified = int(file_stat.st_mtime)
+
+        response = get_conditional_response(
+            request,
+            etag=etag,
+            last_modified=last_modified
+        )
+        if response is not None:
+            response["ETag"] = etag
+            return response
+
+        byte_range = None
+        range_header = request.headers.get("Range")
+        if_range = request.headers.get("If-Range")
+        if range_header and (if_range is None or if_range == etag):
+            try:
+                byte_range = parse_range(range_header, size)
+            except ValueError:
+                response = HttpResponse(
+                    status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+                )
+                response["Content-Range"] = f"bytes */{size}"
+                return response
+
+        if byte_range is None:
+            response = FileResponse(
+                open(path, "rb"),
+                content_type=content_type
+            )
+        else:
+            start, end = byte_range
+            f = open(path, "rb")
+            f.seek(start)
+            # A bounded iterator rather than the file itself: the WSGI
+            # file wrapper would send everything up to the end of file.
+            response = FileResponse(
+                iter_file_range(f, end - start + 1),
+                status=status.HTTP_206_PARTIAL_CONTENT,
+                content_type=content_type
+            )
+            response["Content-Length"] = str(end - start + 1)
+            response["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+        response["Accept-Ranges"] = "bytes"
+        return response
@@ -13,7 +13,7 @@ export async function middleware(req: NextRequest) {
   try {
     if (accessToken) {
       authApi.api.defaults.headers.Cookie = `access_token=${accessToken};`;
-      await authApi.getUser();
+      await authApi.verifyToken();
       return NextResponse.next();
     }
 
@@ -77,6 +77,20 @@ class AuthApi extends BaseApi {
     return response;
   }
 
+  /**
+   * Checks that the access token cookie is valid.
+   *
+   * Cheaper than `getUser()`: the backend only validates the token and
+   * answers with an empty 204 response.
+   *
+   * @throws Will throw an error if the token is missing or invalid.
+   */
+  public async verifyToken(): Promise<void> {
+    await this.get("/api/auth/v1/verify/", {
+      "Cache-Control": "no-store",
+    });
+  }
+
   /**
    * Refreshes the access token using the refresh token stored in cookies.
    *